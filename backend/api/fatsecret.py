@@ -1,22 +1,71 @@
 import logging
-import requests
+import time
+
 from django.conf import settings
+from django.core.cache import cache
+
+from . import http_client
+from .rate_limit import wait_for_slot
 
 logger = logging.getLogger(__name__)
 
+# The access token is shared by every worker through the cache
+TOKEN_CACHE_KEY = "fatsecret:access_token"
+TOKEN_LOCK_KEY = "fatsecret:access_token:lock"
+TOKEN_EXPIRY_MARGIN = 60  # Seconds before expiry at which a cached token is dropped
+TOKEN_LOCK_TIMEOUT = 30  # Seconds a refresh may hold the lock (and others wait for it)
+
 class FatSecretAPI:
-    BASE_URL = "https://platform.fatsecret.com/rest/server.api"
+    MENU_PAGE_SIZE = 50  # foods.search.v3 results per page
 
     def __init__(self):
         self.client_id = settings.FATSECRET_CLIENT_ID
         self.client_secret = settings.FATSECRET_CLIENT_SECRET
         self.access_token = self.get_access_token()
+        # Restaurants whose search results ran past FATSECRET_MAX_MENU_PAGES, so their menu is incomplete
+        self.truncated_menus = set()
 
     def get_access_token(self):
-        """Authenticate with FatSecret and retrieve an access token."""
+        """The current access token: the shared cached one, or a new one on a cache miss."""
+        token = cache.get(TOKEN_CACHE_KEY)
+        if token is None:
+            token = self.refresh_access_token()
+        return token
+
+    def refresh_access_token(self, stale_token=None):
+        """
+        Replace the shared access token (`stale_token`, if it was rejected) with a new one.
+
+        Only the worker holding the cache lock fetches a token; the others wait for it to
+        appear in the cache, and fetch one themselves only if the lock holder times out.
+        """
+        deadline = time.monotonic() + TOKEN_LOCK_TIMEOUT
+        locked = cache.add(TOKEN_LOCK_KEY, True, timeout=TOKEN_LOCK_TIMEOUT)
+        while not locked and time.monotonic() < deadline:
+            time.sleep(0.1)
+            token = cache.get(TOKEN_CACHE_KEY)
+            if token is not None and token != stale_token:
+                return token
+            locked = cache.add(TOKEN_LOCK_KEY, True, timeout=TOKEN_LOCK_TIMEOUT)
+
+        try:
+            token = cache.get(TOKEN_CACHE_KEY)
+            if token is not None and token != stale_token:
+                return token  # Refreshed by another worker in the meantime
+
+            token, expires_in = self.fetch_access_token()
+            if token and expires_in > TOKEN_EXPIRY_MARGIN:
+                cache.set(TOKEN_CACHE_KEY, token, timeout=expires_in - TOKEN_EXPIRY_MARGIN)
+            return token
+        finally:
+            if locked:
+                cache.delete(TOKEN_LOCK_KEY)
+
+    def fetch_access_token(self):
+        """Authenticate with FatSecret and retrieve an access token and its lifetime in seconds."""
         logger.info("Fetching FatSecret access token")
-        response = requests.post(
-            "https://oauth.fatsecret.com/connect/token",
+        response = http_client.post(
+            settings.FATSECRET_TOKEN_URL,
             data={
                 "grant_type": "client_credentials",
                 "client_id": self.client_id,
@@ -28,48 +77,63 @@ class FatSecretAPI:
         response_data = response.json()
         if "access_token" not in response_data:
             logger.error("Failed to retrieve FatSecret access token: %s", response_data)
-        return response_data.get("access_token")
+        return response_data.get("access_token"), int(response_data.get("expires_in", 0))
+
+    def _get(self, params):
+        """
+        GET an API method within the shared rate limit. A 401 means the token expired or
+        was revoked, so it is refreshed and the request sent once more.
+        """
+        wait_for_slot("fatsecret", settings.FATSECRET_MAX_REQUESTS_PER_SECOND)
+        response = http_client.get(
+            settings.FATSECRET_API_URL, params=params, headers={"Authorization": f"Bearer {self.access_token}"}
+        )
+        if response.status_code == 401:
+            logger.info("FatSecret rejected the access token, refreshing it")
+            self.access_token = self.refresh_access_token(stale_token=self.access_token)
+            wait_for_slot("fatsecret", settings.FATSECRET_MAX_REQUESTS_PER_SECOND)
+            response = http_client.get(
+                settings.FATSECRET_API_URL, params=params, headers={"Authorization": f"Bearer {self.access_token}"}
+            )
+        return response
 
     def get_restaurants(self):
         """Fetch restaurant brands from FatSecret."""
         logger.info("Fetching restaurant brands from FatSecret")
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        response = requests.get(
-            self.BASE_URL,
-            params={
-                "method": "food_brands.get.v2",
-                "format": "json",
-                "brand_type": "restaurant"
-            },
-            headers=headers
-        )
+        response = self._get({
+            "method": "food_brands.get.v2",
+            "format": "json",
+            "brand_type": "restaurant"
+        })
         data = response.json()
         if "food_brands" not in data:
             logger.warning("No restaurant brands found in FatSecret response: %s", data)
         return data.get("food_brands", {}).get("food_brand", [])
 
-    def get_menu_items(self, restaurant_name, page=0):
-        """Fetch menu items for a given restaurant using FatSecret v3 foods.search."""
+    def _search_foods(self, restaurant_name, page):
+        """The `foods_search` section of one foods.search.v3 page, or None when it is empty."""
         logger.info(f"Fetching menu items for {restaurant_name}, page {page}")
-        headers = {"Authorization": f"Bearer {self.access_token}"}
         params = {
             "include_sub_categories": True,
             "flag_default_serving": True,
             "method": "foods.search.v3",
             "search_expression": restaurant_name,
             "format": "json",
-            "max_results": 50,
+            "max_results": self.MENU_PAGE_SIZE,
             "page_number": page
         }
 
-        response = requests.get(self.BASE_URL, params=params, headers=headers)
+        response = self._get(params)
         data = response.json()
 
         if not data or "foods_search" not in data or not data["foods_search"]:
             logger.warning(f"No menu items found for {restaurant_name} on page {page}")
-            return []
+            return None
+        return data["foods_search"]
 
-        results = data["foods_search"].get("results")
+    def _brand_items(self, foods_search, restaurant_name, page):
+        """The foods of a search page that belong to the restaurant's brand."""
+        results = foods_search.get("results")
         if results is None:
             logger.warning(f"Results key missing for {restaurant_name} on page {page}")
             return []
@@ -82,3 +146,43 @@ class FatSecretAPI:
         if not menu_items:
             logger.info(f"No matching menu items found for {restaurant_name} on page {page}")
         return menu_items
+
+    def iter_menu_item_pages(self, restaurant_name, max_workers=None, skip_pages=()):
+        """
+        Yield `(page number, menu items)` for every page of the restaurant's search results.
+
+        The first page's `total_results` gives the page count (capped at
+        FATSECRET_MAX_MENU_PAGES); the remaining pages are then fetched concurrently, at most
+        `max_workers` (FATSECRET_MENU_PAGE_WORKERS) at a time, and yielded as they arrive,
+        so not necessarily in order. Requests still go through the shared rate limit.
+        Pages in `skip_pages` (already fetched by an interrupted run) are not fetched or
+        yielded again, except that the first page is always fetched for the page count.
+
+        A later page that fails or comes back empty raises RuntimeError, as the menu would
+        be missing its foods. When the results run past FATSECRET_MAX_MENU_PAGES, the
+        restaurant is added to `truncated_menus`, so callers can tell the menu is partial.
+        """
+        first_page = self._search_foods(restaurant_name, 0)
+        if not first_page:
+            return
+        if 0 not in skip_pages:
+            yield 0, self._brand_items(first_page, restaurant_name, 0)
+
+        total_results = int(first_page.get("total_results", 0))
+        page_count = -(-total_results // self.MENU_PAGE_SIZE)
+        if page_count > settings.FATSECRET_MAX_MENU_PAGES:
+            logger.warning(
+                f"{restaurant_name} has {page_count} pages of results, "
+                f"only reading the first {settings.FATSECRET_MAX_MENU_PAGES}"
+            )
+            self.truncated_menus.add(restaurant_name)
+            page_count = settings.FATSECRET_MAX_MENU_PAGES
+        pages = http_client.fan_out_as_completed(
+            lambda page: self._search_foods(restaurant_name, page),
+            [page for page in range(1, page_count) if page not in skip_pages],
+            max_workers or settings.FATSECRET_MENU_PAGE_WORKERS,
+        )
+        for page, foods_search in pages:
+            if not foods_search:
+                raise RuntimeError(f"No results for {restaurant_name} on page {page} of {page_count}")
+            yield page, self._brand_items(foods_search, restaurant_name, page)
@@ -1,17 +1,16 @@
 import logging
-import requests
 
 from django.conf import settings
 from rapidfuzz import process
 
 from restaurants.models import Restaurant
 
+from . import http_client
+
 
 logger = logging.getLogger(__name__)
 
 class FoursquareAPI:
-    BASE_URL = "https://places-api.foursquare.com/places/search"
-
     def __init__(self):
         self.api_key = settings.FOURSQUARE_API_KEY
 
@@ -23,8 +22,8 @@ class FoursquareAPI:
         BATCH_SIZE = 100
         
         batches = [chain_ids[i:i+BATCH_SIZE] for i in range(0, len(chain_ids), BATCH_SIZE)]
-        
-        for batch in batches:
+
+        def fetch_batch(batch):
             params = {
                 "ll": f"{lat},{lng}",
                 "radius": radius,
@@ -33,9 +32,11 @@ class FoursquareAPI:
                 "fsq_chain_ids": ",".join(batch)
             }
             headers = {"Authorization": self.api_key, "Accept": "application/json", "X-Places-Api-Version": "2025-06-17"}
-            response = requests.get(self.BASE_URL, params=params, headers=headers)
-            data = response.json()
-            
+            return http_client.get(settings.FOURSQUARE_PLACES_URL, params=params, headers=headers).json()
+
+        # Batches are independent, so they are requested concurrently; results are matched
+        # against the database afterwards, on this thread
+        for data in http_client.fan_out(fetch_batch, batches):
             if "results" in data:
                 for place in data["results"]:
                     formatted_address = place.get("location", {}).get("formatted_address", "Unknown Address")
@@ -60,7 +61,7 @@ class FoursquareAPI:
         if exclude_chain_ids:
             params["exclude_chains"] = ",".join(exclude_chain_ids)
         headers = {"Authorization": self.api_key, "Accept": "application/json"}
-        response = requests.get(self.BASE_URL, params=params, headers=headers)
+        response = http_client.get(settings.FOURSQUARE_PLACES_URL, params=params, headers=headers)
         data = response.json()
         
         if "results" in data:
@@ -0,0 +1,126 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Responses worth another attempt: rate limited or a transient upstream failure
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_NO_ARGS = object()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Process-wide requests Session for outbound API calls, created on first use.
+
+    Its connection pool keeps connections to each upstream alive between calls, so only
+    the first request to a host pays for the TCP and TLS handshakes.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=settings.HTTP_CLIENT_POOL_CONNECTIONS,
+                pool_maxsize=settings.HTTP_CLIENT_POOL_MAXSIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def backoff_delay(attempt):
+    """Seconds to wait before retry number `attempt` (from 0): exponential, with full jitter."""
+    ceiling = min(settings.HTTP_CLIENT_BACKOFF_MAX, settings.HTTP_CLIENT_BACKOFF_BASE * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+def request(method, url, timeout=None, retries=None, **kwargs):
+    """
+    Send a request through the shared session.
+
+    Connection errors, timeouts and RETRY_STATUSES responses are retried up to `retries`
+    times (HTTP_CLIENT_RETRIES by default) with jittered exponential backoff; the last
+    response is returned, or the last exception raised, once retries run out.
+    `timeout` defaults to HTTP_CLIENT_TIMEOUT, a (connect, read) pair in seconds.
+    """
+    timeout = settings.HTTP_CLIENT_TIMEOUT if timeout is None else timeout
+    retries = settings.HTTP_CLIENT_RETRIES if retries is None else retries
+
+    for attempt in range(retries + 1):
+        try:
+            response = get_session().request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"{method} {url} failed ({e}), retrying")
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            logger.warning(f"{method} {url} returned {response.status_code}, retrying")
+        time.sleep(backoff_delay(attempt))
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def fan_out(func, args_list, max_workers=None):
+    """
+    Call `func` on every item of `args_list` concurrently, at most `max_workers` at a time
+    (HTTP_CLIENT_MAX_CONCURRENCY by default), and return the results in input order.
+
+    Meant for independent upstream calls; the first exception is raised once all calls
+    have finished. Keep database access out of `func`, since every thread would open
+    its own connection.
+    """
+    args_list = list(args_list)
+    if len(args_list) <= 1:
+        return [func(args) for args in args_list]
+
+    max_workers = min(max_workers or settings.HTTP_CLIENT_MAX_CONCURRENCY, len(args_list))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http-fan-out") as executor:
+        futures = [executor.submit(func, args) for args in args_list]
+    return [future.result() for future in futures]
+
+
+def fan_out_as_completed(func, args_list, max_workers=None):
+    """
+    Like `fan_out`, but a generator yielding `(args, result)` pairs as soon as each call
+    finishes, so the caller can work on early results while later calls are in flight.
+
+    Only `max_workers` calls are submitted at a time, so abandoning the generator early
+    leaves at most that many calls to finish in the background.
+    """
+    pending_args = iter(args_list)
+    max_workers = max_workers or settings.HTTP_CLIENT_MAX_CONCURRENCY
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http-fan-out") as executor:
+        running = {}
+        for args in pending_args:
+            running[executor.submit(func, args)] = args
+            if len(running) >= max_workers:
+                break
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                args = running.pop(future)
+                next_args = next(pending_args, _NO_ARGS)
+                if next_args is not _NO_ARGS:
+                    running[executor.submit(func, next_args)] = next_args
+                yield args, future.result()
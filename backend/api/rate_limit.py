@@ -0,0 +1,33 @@
+import logging
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def wait_for_slot(name, max_per_second):
+    """
+    Block until one more request to the upstream `name` fits within `max_per_second`.
+
+    Requests are counted in one-second windows in the shared cache, so the limit holds
+    across every worker process and host using the same Redis, not per process.
+    A falsy `max_per_second` disables the limit.
+    """
+    if not max_per_second:
+        return
+
+    while True:
+        now = time.time()
+        window = int(now)
+        key = f"rate_limit:{name}:{window}"
+        cache.add(key, 0, timeout=5)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            continue  # The window expired between add() and incr()
+        if count <= max_per_second:
+            return
+
+        logger.debug(f"Rate limit for {name} reached, waiting for the next window")
+        time.sleep(window + 1 - now)
@@ -1,10 +1,16 @@
 import unittest
 from unittest.mock import patch, MagicMock
+from django.core.cache import cache
+from django.test import override_settings
+
 from api.fatsecret import FatSecretAPI
 
 class TestFatSecretAPI(unittest.TestCase):
+    def setUp(self):
+        cache.clear()  # The access token is shared through the cache
+
     
-    @patch("api.fatsecret.requests.post")
+    @patch("api.fatsecret.http_client.post")
     def test_get_access_token(self, mock_post):
         mock_response = MagicMock()
         mock_response.json.return_value = {"access_token": "mock_token"}
@@ -14,7 +20,7 @@ class TestFatSecretAPI(unittest.TestCase):
         self.assertEqual(api.access_token, "mock_token")
         mock_post.assert_called_once()
     
-    @patch("api.fatsecret.requests.get")
+    @patch("api.fatsecret.http_client.get")
     def test_get_restaurants(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {"food_brands": {"food_brand": [{"brand_id": "456", "brand_name": "Subway"}]}}
@@ -28,30 +34,89 @@ class TestFatSecretAPI(unittest.TestCase):
         self.assertEqual(response[0]["brand_name"], "Subway")
         mock_get.assert_called_once()
 
-@patch("api.fatsecret.requests.get")
-def test_get_menu_items(self, mock_get):
-    mock_response = MagicMock()
-    mock_response.json.return_value = {
-        "foods_search": {
-            "results": {
-                "food": [
-                    {
-                        "food_id": "123",
-                        "food_name": "Big Mac",
-                        "brand_name": "McDonald's"
-                    }
-                ]
-            }
-        }
-    }
-    mock_get.return_value = mock_response
-    
-    api = FatSecretAPI()
-    api.access_token = "mock_token"
-    response = api.get_menu_items("McDonald's")
-    
-    self.assertEqual(len(response), 1)
-    self.assertEqual(response[0]["food_id"], "123")
-    self.assertEqual(response[0]["food_name"], "Big Mac")
-    self.assertEqual(response[0]["brand_name"], "McDonald's")
-    mock_get.assert_called_once()
+    @patch("api.fatsecret.http_client.post")
+    def test_access_token_is_shared_until_it_expires(self, mock_post):
+        mock_post.return_value.json.return_value = {"access_token": "shared_token", "expires_in": 86400}
+
+        self.assertEqual(FatSecretAPI().access_token, "shared_token")
+        self.assertEqual(FatSecretAPI().access_token, "shared_token")
+        mock_post.assert_called_once()
+
+        with patch("api.fatsecret.cache.set") as mock_set:
+            cache.clear()
+            FatSecretAPI()
+            mock_set.assert_called_once_with("fatsecret:access_token", "shared_token", timeout=86400 - 60)
+
+    @patch("api.fatsecret.http_client.get")
+    @patch("api.fatsecret.http_client.post")
+    def test_refreshes_rejected_token(self, mock_post, mock_get):
+        mock_post.return_value.json.side_effect = [
+            {"access_token": "old_token", "expires_in": 86400},
+            {"access_token": "new_token", "expires_in": 86400},
+        ]
+        unauthorized, ok = MagicMock(status_code=401), MagicMock(status_code=200)
+        ok.json.return_value = {"food_brands": {"food_brand": ["KFC"]}}
+        mock_get.side_effect = [unauthorized, ok]
+
+        api = FatSecretAPI()
+        self.assertEqual(api.get_restaurants(), ["KFC"])
+        self.assertEqual(api.access_token, "new_token")
+        self.assertEqual(mock_get.call_args.kwargs["headers"], {"Authorization": "Bearer new_token"})
+        # Other workers pick up the refreshed token from the cache
+        self.assertEqual(FatSecretAPI().access_token, "new_token")
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch("api.fatsecret.http_client.get")
+    @patch("api.fatsecret.http_client.post")
+    def test_iter_menu_item_pages(self, mock_post, mock_get):
+        def search_page(url, params, headers):
+            page = params["page_number"]
+            response = MagicMock(status_code=200)
+            response.json.return_value = {"foods_search": {
+                "total_results": "120",
+                "results": {"food": [
+                    {"food_id": str(page), "food_name": f"Item {page}", "brand_name": "KFC"},
+                    {"food_id": f"x{page}", "food_name": "Other", "brand_name": "Other Brand"},
+                ]},
+            }}
+            return response
+
+        mock_get.side_effect = search_page
+        mock_post.return_value.json.return_value = {"access_token": "mock_token", "expires_in": 86400}
+        api = FatSecretAPI()
+        pages = dict(api.iter_menu_item_pages("KFC", max_workers=2))
+
+        self.assertEqual(sorted(pages), [0, 1, 2])
+        self.assertEqual([item["food_name"] for item in pages[2]], ["Item 2"])
+        self.assertEqual(mock_get.call_count, 3)
+
+        # Resuming only fetches the missing pages, plus the first one for the page count
+        pages = dict(api.iter_menu_item_pages("KFC", skip_pages={0, 2}))
+        self.assertEqual(sorted(pages), [1])
+        self.assertEqual(mock_get.call_count, 5)
+        self.assertEqual(api.truncated_menus, set())
+
+    @patch("api.fatsecret.http_client.get")
+    @patch("api.fatsecret.http_client.post")
+    def test_iter_menu_item_pages_incomplete(self, mock_post, mock_get):
+        def search_page(url, params, headers):
+            page = params["page_number"]
+            response = MagicMock(status_code=200)
+            response.json.return_value = {"error": {"code": 12}} if page == 1 else {"foods_search": {
+                "total_results": "120",
+                "results": {"food": [{"food_id": str(page), "food_name": f"Item {page}", "brand_name": "KFC"}]},
+            }}
+            return response
+
+        mock_get.side_effect = search_page
+        mock_post.return_value.json.return_value = {"access_token": "mock_token", "expires_in": 86400}
+        api = FatSecretAPI()
+        # A failed page fails the whole menu instead of coming back empty
+        with self.assertRaises(RuntimeError):
+            list(api.iter_menu_item_pages("KFC", max_workers=1))
+
+        # Pages past the cap are not fetched, and the menu is reported as truncated
+        with override_settings(FATSECRET_MAX_MENU_PAGES=1):
+            pages = dict(api.iter_menu_item_pages("KFC"))
+        self.assertEqual(sorted(pages), [0])
+        self.assertEqual(api.truncated_menus, {"KFC"})
@@ -5,7 +5,7 @@ from api.foursquare import FoursquareAPI
 class TestFoursquareAPI(unittest.TestCase):
 
     @patch("api.foursquare.Restaurant.objects.get")
-    @patch("api.foursquare.requests.get")
+    @patch("api.foursquare.http_client.get")
     def test_fetch_chain_restaurants(self, mock_requests_get, mock_restaurant_get):
         # Create a dummy restaurant to return from the ORM call
         dummy_restaurant = MagicMock()
@@ -35,7 +35,7 @@ class TestFoursquareAPI(unittest.TestCase):
         mock_requests_get.assert_called_once()
     
     @patch("api.foursquare.Restaurant.objects.filter")
-    @patch("api.foursquare.requests.get")
+    @patch("api.foursquare.http_client.get")
     def test_fetch_non_chain_restaurants(self, mock_requests_get, mock_restaurant_filter):
         # Create a dummy restaurant for the filter call
         dummy_restaurant = MagicMock()
@@ -65,7 +65,7 @@ class TestFoursquareAPI(unittest.TestCase):
     
     @patch("api.foursquare.Restaurant.objects.filter")
     @patch("api.foursquare.Restaurant.objects.get")
-    @patch("api.foursquare.requests.get")
+    @patch("api.foursquare.http_client.get")
     def test_fetch_nearby_restaurants(self, mock_requests_get, mock_restaurant_get, mock_restaurant_filter):
         # Dummy for chain fetch
         dummy_restaurant_chain = MagicMock()
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.conf import settings
+
+from api import http_client
+
+
+def response(status_code):
+    mock_response = MagicMock()
+    mock_response.status_code = status_code
+    return mock_response
+
+
+@patch("api.http_client.time.sleep")
+@patch("api.http_client.get_session")
+class TestHttpClient(unittest.TestCase):
+    def test_retries_transient_failures(self, mock_session, mock_sleep):
+        mock_session.return_value.request.side_effect = [requests.ConnectionError(), response(503), response(200)]
+
+        self.assertEqual(http_client.get("https://example.com", timeout=1).status_code, 200)
+        self.assertEqual(mock_session.return_value.request.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        mock_session.return_value.request.assert_called_with("GET", "https://example.com", timeout=1)
+
+    def test_gives_up_after_retries(self, mock_session, mock_sleep):
+        mock_session.return_value.request.side_effect = requests.Timeout()
+        with self.assertRaises(requests.Timeout):
+            http_client.post("https://example.com", retries=2)
+        self.assertEqual(mock_session.return_value.request.call_count, 3)
+
+        mock_session.return_value.request.side_effect = None
+        mock_session.return_value.request.return_value = response(429)
+        self.assertEqual(http_client.get("https://example.com", retries=1).status_code, 429)
+
+    def test_does_not_retry_client_errors(self, mock_session, mock_sleep):
+        mock_session.return_value.request.return_value = response(404)
+        self.assertEqual(http_client.get("https://example.com").status_code, 404)
+        mock_session.return_value.request.assert_called_once()
+        mock_sleep.assert_not_called()
+
+
+class TestFanOut(unittest.TestCase):
+    def test_keeps_input_order(self):
+        self.assertEqual(http_client.fan_out(lambda x: x * x, range(20), max_workers=4), [x * x for x in range(20)])
+
+    def test_raises_first_error(self):
+        def fail_on_three(x):
+            if x == 3:
+                raise ValueError(x)
+            return x
+
+        with self.assertRaises(ValueError):
+            http_client.fan_out(fail_on_three, range(5))
+
+    def test_as_completed_yields_every_result(self):
+        results = list(http_client.fan_out_as_completed(lambda x: x * x, range(10), max_workers=3))
+        self.assertEqual(sorted(results), [(x, x * x) for x in range(10)])
+        self.assertEqual(list(http_client.fan_out_as_completed(lambda x: x, [])), [])
+
+    def test_backoff_is_bounded(self):
+        for attempt in range(10):
+            self.assertLessEqual(http_client.backoff_delay(attempt), settings.HTTP_CLIENT_BACKOFF_MAX)
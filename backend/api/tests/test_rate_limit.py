@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import patch
+
+from django.core.cache import cache
+
+from api.rate_limit import wait_for_slot
+
+
+class TestWaitForSlot(unittest.TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.25
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def test_waits_for_the_next_window_when_full(self):
+        with patch("api.rate_limit.time.time", side_effect=lambda: self.now), \
+                patch("api.rate_limit.time.sleep", side_effect=self.advance) as mock_sleep:
+            wait_for_slot("upstream", 2)
+            wait_for_slot("upstream", 2)
+            mock_sleep.assert_not_called()
+
+            wait_for_slot("upstream", 2)
+            mock_sleep.assert_called_once_with(0.75)
+            self.assertEqual(self.now, 1001)
+
+    def test_no_limit(self):
+        with patch("api.rate_limit.time.sleep") as mock_sleep:
+            for _ in range(10):
+                wait_for_slot("upstream", 0)
+            mock_sleep.assert_not_called()
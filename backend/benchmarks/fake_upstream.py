@@ -0,0 +1,259 @@
+"""
+Local stand-in for the FatSecret and Foursquare APIs, for load tests without API keys.
+
+Serves the endpoints the app calls, replaying the recorded payloads in
+`benchmarks/fixtures` with configurable latency, pagination depth and error rate:
+
+    python -m benchmarks.fake_upstream --port 8900 --latency 80 --pages 4 --error-rate 0.02
+
+then point the app at it through the URLs it prints (FATSECRET_API_URL,
+FATSECRET_TOKEN_URL and FOURSQUARE_PLACES_URL). benchmarks.ingestion_load starts one
+in-process instead.
+
+- `POST /connect/token` returns a token, whatever the credentials.
+- `GET /rest/server.api` answers `food_brands.get.v2` with `--brands` restaurant names
+  (the recorded ones, numbered once they run out), and `foods.search.v3` with
+  `--pages` full pages of 50 foods for each of those brands, built from the recorded
+  foods. Food IDs and names are unique per brand and page, like the real data.
+- `GET /places/search` returns up to `limit` places near any location: places of the
+  requested `fsq_chain_ids`, or otherwise places named after the brands.
+
+Every response is delayed by `--latency` ms (uniformly +/- 50%), and a share
+`--error-rate` of them fails with a 429, 500 or 503 instead.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+PAGE_SIZE = 50  # Foods per foods.search.v3 page, as FatSecretAPI.MENU_PAGE_SIZE
+ERROR_STATUSES = [429, 500, 503]
+
+
+class FakeUpstreamOptions(NamedTuple):
+    latency_ms: float = 50
+    pages: int = 3
+    brands: int = 50
+    error_rate: float = 0.0
+    seed: int = 42
+
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR):
+    fixtures_dir = Path(fixtures_dir)
+    with open(fixtures_dir / "fatsecret_food_brands.json") as f:
+        brands = json.load(f)["food_brands"]["food_brand"]
+    with open(fixtures_dir / "fatsecret_foods_search.json") as f:
+        foods = json.load(f)["foods_search"]["results"]["food"]
+    with open(fixtures_dir / "foursquare_places_search.json") as f:
+        places = json.load(f)["results"]
+    return brands, foods, places
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of `values` (0 when there are none)."""
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, round(fraction * len(values)) - 1))]
+
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+    """
+    The fake API server. Call `start()` to serve from a background thread, and
+    `take_stats()` for the requests served since the previous call.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, options, fixtures_dir=FIXTURES_DIR):
+        super().__init__(address, FakeUpstreamHandler)
+        self.options = options
+        recorded_brands, self.foods, self.places = load_fixtures(fixtures_dir)
+        self.brands = [
+            recorded_brands[i] if i < len(recorded_brands) else f"{recorded_brands[i % len(recorded_brands)]} {i}"
+            for i in range(options.brands)
+        ]
+        self.brand_ids = {brand.lower(): brand_id for brand_id, brand in enumerate(self.brands)}
+        self._rng = random.Random(options.seed)
+        self._lock = threading.Lock()
+        self._durations = defaultdict(list)
+        self._statuses = defaultdict(lambda: defaultdict(int))
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def settings(self):
+        """The Django settings that point the API clients at this server."""
+        return {
+            "FATSECRET_API_URL": f"{self.url}/rest/server.api",
+            "FATSECRET_TOKEN_URL": f"{self.url}/connect/token",
+            "FOURSQUARE_PLACES_URL": f"{self.url}/places/search",
+        }
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def record(self, endpoint, status, duration):
+        with self._lock:
+            self._durations[endpoint].append(duration)
+            self._statuses[endpoint][status] += 1
+
+    def take_stats(self):
+        """Per endpoint: requests served, by status, and their p50/p95 service time in ms."""
+        with self._lock:
+            durations, statuses = self._durations, self._statuses
+            self._durations, self._statuses = defaultdict(list), defaultdict(lambda: defaultdict(int))
+        return {
+            endpoint: {
+                "requests": len(times),
+                "statuses": {str(status): count for status, count in sorted(statuses[endpoint].items())},
+                "p50_ms": percentile(times, 0.50) * 1000,
+                "p95_ms": percentile(times, 0.95) * 1000,
+            }
+            for endpoint, times in sorted(durations.items())
+        }
+
+    def food_brands(self):
+        return {"food_brands": {"food_brand": self.brands}}
+
+    def foods_search(self, search_expression, page):
+        brand_id = self.brand_ids.get(search_expression.lower())
+        page_count = self.options.pages if brand_id is not None else 0
+        foods_search = {
+            "max_results": str(PAGE_SIZE),
+            "total_results": str(page_count * PAGE_SIZE),
+            "page_number": str(page),
+        }
+        if page < page_count:
+            foods = []
+            for n in range(page * PAGE_SIZE, (page + 1) * PAGE_SIZE):
+                food = self.foods[n % len(self.foods)]
+                copy = n // len(self.foods)
+                foods.append(dict(
+                    food,
+                    food_id=f"{brand_id}-{n}",
+                    food_name=f"{food['food_name']} {copy + 1}" if copy else food["food_name"],
+                    brand_name=self.brands[brand_id],
+                ))
+            foods_search["results"] = {"food": foods}
+        return {"foods_search": foods_search}
+
+    def places_search(self, params):
+        limit = int(params.get("limit", 50))
+        # The same location always gets the same places
+        rng = random.Random(params.get("ll", ""))
+        chain_ids = [chain_id for chain_id in params.get("fsq_chain_ids", "").split(",") if chain_id]
+        if chain_ids:
+            names = [(chain_id, None) for chain_id in rng.sample(chain_ids, min(limit, len(chain_ids)))]
+        else:
+            names = [(None, rng.choice(self.brands)) for _ in range(limit)]
+
+        results = []
+        for i, (chain_id, name) in enumerate(names):
+            place = self.places[i % len(self.places)]
+            place = dict(place, fsq_place_id=f"{place['fsq_place_id']}-{i}")
+            if chain_id:
+                place["chains"] = [{"fsq_chain_id": chain_id, "name": place["name"]}]
+            else:
+                place["name"] = name
+                place.pop("chains", None)
+            results.append(place)
+        return {"results": results}
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, as the real APIs
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == "/rest/server.api" and params.get("method") == "food_brands.get.v2":
+            self.respond("food_brands.get.v2", self.server.food_brands)
+        elif url.path == "/rest/server.api" and params.get("method") == "foods.search.v3":
+            page = int(params.get("page_number", 0))
+            self.respond("foods.search.v3", lambda: self.server.foods_search(params.get("search_expression", ""), page))
+        elif url.path == "/places/search":
+            self.respond("places/search", lambda: self.server.places_search(params))
+        else:
+            self.respond("unknown", lambda: {"error": "Unknown endpoint"}, status=404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path == "/connect/token":
+            self.respond("oauth/token", lambda: {"access_token": "fake-token", "token_type": "Bearer", "expires_in": 86400})
+        else:
+            self.respond("unknown", lambda: {"error": "Unknown endpoint"}, status=404)
+
+    def respond(self, endpoint, payload, status=200):
+        start = time.perf_counter()
+        options = self.server.options
+        time.sleep(options.latency_ms / 1000 * (0.5 + self.server.random()))
+        if status == 200 and self.server.random() < options.error_rate:
+            status = ERROR_STATUSES[int(self.server.random() * len(ERROR_STATUSES))]
+            body = {"error": {"code": status, "message": "Injected error"}}
+        else:
+            body = payload()
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.record(endpoint, status, time.perf_counter() - start)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def add_options_arguments(parser):
+    defaults = FakeUpstreamOptions()
+    parser.add_argument("--latency", type=float, default=defaults.latency_ms, help="Mean response latency (ms)")
+    parser.add_argument("--pages", type=int, default=defaults.pages, help="foods.search.v3 pages per brand")
+    parser.add_argument("--brands", type=int, default=defaults.brands, help="Brands listed by food_brands.get.v2")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Share of failed responses")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory of recorded payloads")
+
+
+def options_from_arguments(args):
+    return FakeUpstreamOptions(args.latency, args.pages, args.brands, args.error_rate, args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fake FatSecret and Foursquare APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_options_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = FakeUpstreamServer((args.host, args.port), options_from_arguments(args), args.fixtures)
+    for name, value in server.settings.items():
+        print(f"{name}={value}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        json.dump(server.take_stats(), sys.stderr, indent=2)
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
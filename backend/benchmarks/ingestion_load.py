@@ -0,0 +1,216 @@
+"""
+Load test of menu ingestion and the nearby restaurants endpoint against benchmarks.fake_upstream.
+
+Runs, in a throwaway test database and against an in-process fake FatSecret/Foursquare
+server, the full `update_restaurants_task`, the full `update_menu_items_task` (its
+subtasks run eagerly, in this process), the meal index builds it schedules (timed as a
+phase of their own, as they run on other workers in production) and `--nearby-requests`
+calls to `NearbyRestaurantsView`, `--concurrency` at a time:
+
+    python -m benchmarks.ingestion_load --brands 100 --pages 4 --latency 80 --error-rate 0.02
+    python -m benchmarks.ingestion_load --fatsecret-rps 50 --output load.json
+
+Needs the usual Django environment (DJANGO_SETTINGS_MODULE, database credentials); the
+test database is created and dropped like `manage.py test` does. The cache is replaced
+by a local-memory one, so the run shares no token, rate limit or nearby results with a
+live deployment. Each phase reports its wall time, upstream requests/sec and per
+endpoint p95 latency; the menus phase adds restaurants/sec and the p95 time per
+restaurant, the indexes phase the p95 build time, and the nearby phase the client-side
+requests/sec and p95 latency.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from benchmarks.fake_upstream import FakeUpstreamServer, add_options_arguments, options_from_arguments, percentile
+from benchmarks.meal_recommender import git_revision
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "ingestion-load"}}
+
+
+def run_phase(server, name, func):
+    """Time `func` and collect the upstream requests it made."""
+    start = time.perf_counter()
+    phase = func() or {}
+    wall_time = time.perf_counter() - start
+    upstream = server.take_stats()
+    upstream_requests = sum(endpoint["requests"] for endpoint in upstream.values())
+    phase = {
+        "phase": name,
+        "wall_time_s": wall_time,
+        "upstream_requests": upstream_requests,
+        "upstream_requests_per_s": upstream_requests / wall_time,
+        "upstream": upstream,
+        **phase,
+    }
+    print(
+        f"{name:<12} {wall_time:8.2f} s  {upstream_requests:>6} upstream requests  "
+        f"{phase['upstream_requests_per_s']:8.1f} req/s",
+        file=sys.stderr,
+    )
+    return phase
+
+
+def ingest_restaurants():
+    from restaurants.models import Restaurant
+    from restaurants.tasks import update_restaurants_task
+
+    update_restaurants_task()
+    return {"restaurants": Restaurant.objects.filter(is_active=True).count()}
+
+
+def ingest_menus(index_queue):
+    """Run the menu ingestion, queueing the meal index builds it schedules on `index_queue`."""
+    from menu_items.models import IngestionStatus, MenuIngestionRun, MenuItem
+    from menu_items.tasks import build_meal_index_task, update_menu_items_task
+
+    start = time.perf_counter()
+    with patch.object(build_meal_index_task, "delay", side_effect=index_queue.append):
+        update_menu_items_task()
+    wall_time = time.perf_counter() - start
+
+    run = MenuIngestionRun.objects.order_by("-id").first()
+    progress = list(run.progress.all())
+    durations = [(row.finished_at - row.started_at).total_seconds() for row in progress if row.finished_at]
+    return {
+        "restaurants": len(progress),
+        "failed_restaurants": sum(row.status == IngestionStatus.FAILED.value for row in progress),
+        "menu_items": MenuItem.objects.filter(is_active=True).count(),
+        "restaurants_per_s": len(progress) / wall_time,
+        "restaurant_p50_s": percentile(durations, 0.50),
+        "restaurant_p95_s": percentile(durations, 0.95),
+    }
+
+
+def build_indexes(restaurant_ids):
+    from menu_items.tasks import build_meal_index_task
+
+    durations = []
+    for restaurant_id in restaurant_ids:
+        start = time.perf_counter()
+        build_meal_index_task(restaurant_id)
+        durations.append(time.perf_counter() - start)
+    return {
+        "indexes": len(durations),
+        "index_p50_s": percentile(durations, 0.50),
+        "index_p95_s": percentile(durations, 0.95),
+    }
+
+
+def assign_chain_ids(share):
+    """Give a share of the restaurants a Foursquare chain ID, so both nearby lookups are exercised."""
+    from restaurants.models import Restaurant
+
+    restaurant_ids = list(Restaurant.objects.order_by("id").values_list("id", flat=True))
+    for restaurant_id in restaurant_ids[:round(len(restaurant_ids) * share)]:
+        Restaurant.objects.filter(id=restaurant_id).update(foursquare_chain_id=f"fake-chain-{restaurant_id}")
+
+
+def request_nearby(requests, concurrency, seed):
+    from django.test import Client
+    from django.urls import reverse
+
+    url = reverse("nearby_restaurants")
+    rng = random.Random(seed)
+    # Spread over distinct ~110 m grid cells, so every request misses the nearby cache
+    locations = [(40 + rng.random(), -74 + rng.random()) for _ in range(requests)]
+
+    def get(location):
+        start = time.perf_counter()
+        response = Client().get(url, {"lat": location[0], "lng": location[1]})
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(get, locations))
+    wall_time = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in results]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(status != 200 for _, status in results),
+        "requests_per_s": requests / wall_time,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test ingestion and nearby lookups against a fake upstream.")
+    parser.add_argument("--output", help="Write the JSON report to this file (default: stdout)")
+    add_options_arguments(parser)
+    parser.add_argument("--fatsecret-rps", type=int, help="Override FATSECRET_MAX_REQUESTS_PER_SECOND")
+    parser.add_argument("--nearby-requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent nearby requests")
+    parser.add_argument("--chain-share", type=float, default=0.5, help="Share of restaurants with a chain ID")
+    parser.add_argument("--skip-indexes", action="store_true", help="Do not build the meal indexes")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's logging")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import override_settings, setup_test_environment
+
+    from config.celery import app
+
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+    options = options_from_arguments(args)
+    server = FakeUpstreamServer(("127.0.0.1", 0), options, args.fixtures).start()
+    overrides = dict(server.settings, CACHES=LOCAL_CACHES)
+    if args.fatsecret_rps:
+        overrides["FATSECRET_MAX_REQUESTS_PER_SECOND"] = args.fatsecret_rps
+
+    setup_test_environment()
+    app.conf.task_always_eager = True
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(**overrides):
+            index_queue = []
+            phases = [
+                run_phase(server, "restaurants", ingest_restaurants),
+                run_phase(server, "menus", lambda: ingest_menus(index_queue)),
+            ]
+            if not args.skip_indexes:
+                phases.append(run_phase(server, "indexes", lambda: build_indexes(index_queue)))
+            assign_chain_ids(args.chain_share)
+            phases.append(run_phase(
+                server, "nearby", lambda: request_nearby(args.nearby_requests, args.concurrency, args.seed)
+            ))
+            fatsecret_rps = settings.FATSECRET_MAX_REQUESTS_PER_SECOND
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        server.shutdown()
+        server.server_close()
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "upstream": options._asdict(),
+        "fatsecret_max_requests_per_second": fatsecret_rps,
+        "phases": phases,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
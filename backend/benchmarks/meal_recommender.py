@@ -0,0 +1,204 @@
+"""
+Benchmark harness for `menu_items.meal_recommender`.
+
+Runs the recommender on seeded synthetic menus, no database or Django setup needed:
+
+    python -m benchmarks.meal_recommender --output report.json
+    python -m benchmarks.meal_recommender --quick --compare report.json
+
+Every case records wall time (best of `--repeat` runs), peak traced memory and the
+number of candidate combinations the search evaluated. `--compare` checks the new
+report against an earlier one and exits non-zero when a case got slower by more than
+`--threshold`, so reports can be kept per commit to catch regressions.
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from menu_items.meal_recommender import find_meal_combinations_efficient
+
+MENU_SIZES = [10, 50, 100, 250, 500, 1000, 2500, 5000]
+CALORIE_LIMITS = [500, 800, 1200, 2000]
+MAX_ITEMS = [2, 3, 4]
+MIN_EFFICIENCIES = [0.5, 0.7, 0.9]
+BACKENDS = ["python", "numpy"]
+
+QUICK_MENU_SIZES = [10, 100, 500]
+QUICK_CALORIE_LIMITS = [800]
+QUICK_MIN_EFFICIENCIES = [0.7]
+
+# Rough shape of a FatSecret chain menu: (share of items, median kcal, spread, name)
+MENU_CATEGORIES = [
+    (0.30, 480, 0.45, "Entree"),
+    (0.20, 320, 0.45, "Side"),
+    (0.20, 160, 0.80, "Drink"),
+    (0.15, 380, 0.50, "Dessert"),
+    (0.15, 60, 0.90, "Sauce"),
+]
+
+
+def synthetic_menu(size, seed):
+    """
+    A menu of `size` items with calories drawn per category from a log-normal
+    distribution, rounded to 10 kcal like most published menus. Drinks and sauces
+    include some zero-calorie items (diet sodas, mustard). The same seed and size
+    always give the same menu.
+    """
+    rng = random.Random(f"{seed}:{size}")
+    shares = [share for share, _, _, _ in MENU_CATEGORIES]
+    menu = []
+    for item_id in range(size):
+        _, median, spread, category = rng.choices(MENU_CATEGORIES, weights=shares)[0]
+        if category in ("Drink", "Sauce") and rng.random() < 0.1:
+            calories = 0
+        else:
+            calories = min(int(rng.lognormvariate(0, spread) * median / 10) * 10, 2500)
+        menu.append({"id": item_id, "name": f"{category} {item_id}", "calories": calories})
+    return menu
+
+
+def run_case(menu, calorie_limit, max_items, min_efficiency, backend, repeat):
+    kwargs = {
+        "calorie_limit": calorie_limit,
+        "max_items": max_items,
+        "min_efficiency": min_efficiency,
+        "backend": backend,
+    }
+
+    # Timed runs without tracing, which would slow the search down
+    wall_times = []
+    for _ in range(repeat):
+        stats = {}
+        start = time.perf_counter()
+        meals = find_meal_combinations_efficient(menu, stats=stats, **kwargs)
+        wall_times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        find_meal_combinations_efficient(menu, **kwargs)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_time_s": min(wall_times),
+        "peak_memory_bytes": peak_memory,
+        "combinations_evaluated": stats.get("evaluated", 0),
+        "results": len(meals),
+    }
+
+
+def case_key(case):
+    return (case["menu_size"], case["calorie_limit"], case["max_items"], case["min_efficiency"], case["backend"])
+
+
+def run_benchmarks(menu_sizes, calorie_limits, max_items_values, min_efficiencies, backends, seed, repeat):
+    cases = []
+    for menu_size in menu_sizes:
+        menu = synthetic_menu(menu_size, seed)
+        for calorie_limit, max_items, min_efficiency, backend in itertools.product(
+            calorie_limits, max_items_values, min_efficiencies, backends
+        ):
+            if backend == "numpy" and max_items > 4:
+                continue
+
+            case = {
+                "menu_size": menu_size,
+                "calorie_limit": calorie_limit,
+                "max_items": max_items,
+                "min_efficiency": min_efficiency,
+                "backend": backend,
+            }
+            case.update(run_case(menu, calorie_limit, max_items, min_efficiency, backend, repeat))
+            cases.append(case)
+            print(
+                f"{menu_size:>5} items  {calorie_limit:>4} kcal  max {max_items}  eff {min_efficiency:.2f}  "
+                f"{backend:<6}  {case['wall_time_s'] * 1000:9.2f} ms  "
+                f"{case['peak_memory_bytes'] / 1024:9.1f} KiB  {case['combinations_evaluated']:>10} evaluated",
+                file=sys.stderr,
+            )
+    return cases
+
+
+def compare_reports(baseline, cases, threshold, min_time):
+    """Return a description of every case that is more than `threshold` times slower than the baseline."""
+    baseline_cases = {case_key(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in cases:
+        before = baseline_cases.get(case_key(case))
+        if before is None:
+            continue
+        # Sub-millisecond timings are mostly noise
+        if max(case["wall_time_s"], before["wall_time_s"]) < min_time:
+            continue
+        if case["wall_time_s"] > before["wall_time_s"] * threshold:
+            regressions.append(
+                f"{case_key(case)}: {before['wall_time_s'] * 1000:.2f} ms -> {case['wall_time_s'] * 1000:.2f} ms"
+            )
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the meal recommender on synthetic menus.")
+    parser.add_argument("--output", help="Write the JSON report to this file (default: stdout)")
+    parser.add_argument("--compare", help="Earlier JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio that counts as a regression")
+    parser.add_argument("--min-time", type=float, default=0.001, help="Ignore cases faster than this (seconds)")
+    parser.add_argument("--quick", action="store_true", help="Run a small sweep for a fast sanity check")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Menu sizes to sweep")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    menu_sizes = args.sizes or (QUICK_MENU_SIZES if args.quick else MENU_SIZES)
+    calorie_limits = QUICK_CALORIE_LIMITS if args.quick else CALORIE_LIMITS
+    min_efficiencies = QUICK_MIN_EFFICIENCIES if args.quick else MIN_EFFICIENCIES
+
+    cases = run_benchmarks(
+        menu_sizes, calorie_limits, MAX_ITEMS, min_efficiencies, args.backends, args.seed, args.repeat
+    )
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "cases": cases,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, cases, args.threshold, args.min_time)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
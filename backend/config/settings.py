@@ -188,6 +188,35 @@ REST_FRAMEWORK = {
 CELERY_BROKER_URL = "redis://redis:6379/"
 CELERY_RESULT_BACKEND = "redis://redis:6379/"
 
+# A running menu ingestion run is resumed by the next update_menu_items_task only once
+# none of its restaurants made progress for this long, i.e. its workers are gone
+MENU_INGESTION_STALE_AFTER = 60 * 30  # 30 min
+# ... and only while it is younger than this; an older one is abandoned with its page
+# checkpoints and a fresh run started, so a menu is never pieced together from stale pages
+MENU_INGESTION_RESUME_MAX_AGE = 60 * 60 * 24  # 1 day
+
+# ------------------------------------------------------------------------
+# Upstream APIs
+# ------------------------------------------------------------------------
+# Endpoints; overridden to point at benchmarks.fake_upstream for load tests
+FATSECRET_API_URL = os.environ.get("FATSECRET_API_URL", "https://platform.fatsecret.com/rest/server.api")
+FATSECRET_TOKEN_URL = os.environ.get("FATSECRET_TOKEN_URL", "https://oauth.fatsecret.com/connect/token")
+FOURSQUARE_PLACES_URL = os.environ.get("FOURSQUARE_PLACES_URL", "https://places-api.foursquare.com/places/search")
+
+# Shared across all Celery workers (counted in the cache), to stay within the FatSecret quota
+FATSECRET_MAX_REQUESTS_PER_SECOND = int(os.environ.get("FATSECRET_MAX_REQUESTS_PER_SECOND", 10))
+FATSECRET_MENU_PAGE_WORKERS = 4   # Search result pages fetched concurrently per restaurant
+FATSECRET_MAX_MENU_PAGES = 40     # Upper bound on pages read per restaurant (50 foods each)
+
+# Outbound HTTP client (api.http_client) shared by the FatSecret and Foursquare clients
+HTTP_CLIENT_TIMEOUT = (3.05, 15)    # (connect, read) seconds per attempt
+HTTP_CLIENT_RETRIES = 3             # Retries on connection errors, timeouts, 429 and 5xx
+HTTP_CLIENT_BACKOFF_BASE = 0.5      # Seconds; retry n waits up to base * 2**n (full jitter)
+HTTP_CLIENT_BACKOFF_MAX = 10        # Seconds; cap on a single backoff
+HTTP_CLIENT_POOL_CONNECTIONS = 4    # Hosts with a kept-alive connection pool
+HTTP_CLIENT_POOL_MAXSIZE = 16       # Kept-alive connections per host
+HTTP_CLIENT_MAX_CONCURRENCY = 8     # Concurrent calls per fan_out()
+
 # ------------------------------------------------------------------------
 # Caching (Redis)
 # ------------------------------------------------------------------------
@@ -198,6 +227,29 @@ CACHES = {
     }
 }
 
+# ------------------------------------------------------------------------
+# Meal recommender
+# ------------------------------------------------------------------------
+MEAL_RECOMMENDER_BACKEND = os.environ.get("MEAL_RECOMMENDER_BACKEND", "python")  # "python" (recommended) or "numpy"
+MEAL_RECOMMENDER_PROCESSES = int(os.environ.get("MEAL_RECOMMENDER_PROCESSES", 2))  # Pool for budgeted, batch and nearby searches
+MEAL_RECOMMENDER_MAX_BUDGET_MS = 10000  # Upper bound accepted for ?budget_ms=
+
+# In-process LRU of compact menus the recommender searches directly
+MEAL_MENU_CACHE_MAX_ITEMS = 200_000   # Total menu items held per process (roughly 20 MB)
+
+# Achievable-calorie histograms, cached per restaurant menu version
+MEAL_HISTOGRAM_MAX_CALORIES = 3000
+MEAL_HISTOGRAM_CACHE_TIMEOUT = 60 * 60 * 24   # 1 day; menu changes invalidate entries through the key
+
+# Cached recommendations, keyed by restaurant, menu version and calorie bucket
+MEAL_RECOMMENDATION_CACHE_BUCKET_WIDTH = 10   # kcal per bucket; limits in one bucket share an entry
+MEAL_RECOMMENDATION_CACHE_TIMEOUT = 3600      # 1 h; menu changes invalidate entries through the key
+
+# Precomputed per-restaurant meal index: combinations bucketed by total calories
+MEAL_INDEX_MAX_CALORIES = 2000   # Calorie limits above this fall back to a live search
+MEAL_INDEX_BUCKET_WIDTH = 25     # kcal per bucket; limits on a bucket edge are always served
+MEAL_INDEX_BUCKET_SIZE = 20      # Combinations kept per bucket (the default page size)
+
 # ------------------------------------------------------------------------
 # Internationalisation
 # ------------------------------------------------------------------------
@@ -1,8 +1,25 @@
 from django.contrib import admin
 
-from .models import MenuItem
+from .models import MealCombinationIndex, MenuIngestionProgress, MenuIngestionRun, MenuItem
 
 @admin.register(MenuItem)
 class MenuItemAdmin(admin.ModelAdmin):
     list_display = ('restaurant', 'name', 'calories')
     search_fields = ('restaurant__name', 'name')
+
+@admin.register(MealCombinationIndex)
+class MealCombinationIndexAdmin(admin.ModelAdmin):
+    list_display = ('restaurant', 'menu_version', 'built_at')
+    search_fields = ('restaurant__name',)
+
+class MenuIngestionProgressInline(admin.TabularInline):
+    model = MenuIngestionProgress
+    fields = ('restaurant', 'status', 'attempts', 'error', 'started_at', 'finished_at')
+    readonly_fields = fields
+    extra = 0
+
+@admin.register(MenuIngestionRun)
+class MenuIngestionRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    inlines = (MenuIngestionProgressInline,)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from menu_items.models import IngestionStatus, MenuIngestionRun
+from menu_items.tasks import dispatch_menu_updates
+
+
+class Command(BaseCommand):
+    help = (
+        "Rerun only the restaurants whose menu update failed in a menu ingestion run, "
+        "each from its page checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("run_id", nargs="?", type=int, help="Menu ingestion run ID (default: the latest run)")
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Also update the restaurants the run has not finished (pending or interrupted)",
+        )
+
+    def handle(self, *args, **options):
+        runs = MenuIngestionRun.objects.order_by("-id")
+        run = runs.filter(id=options["run_id"]).first() if options["run_id"] else runs.first()
+        if run is None:
+            raise CommandError("No such menu ingestion run")
+
+        statuses = [IngestionStatus.FAILED.value]
+        if options["resume"]:
+            statuses += [IngestionStatus.PENDING.value, IngestionStatus.RUNNING.value]
+        restaurant_ids = list(
+            run.progress.filter(status__in=statuses).order_by("restaurant_id").values_list("restaurant_id", flat=True)
+        )
+        if not restaurant_ids:
+            self.stdout.write(f"Nothing to rerun in menu ingestion run {run.id}")
+            return
+
+        dispatch_menu_updates(run, restaurant_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f"Scheduled menu updates for {len(restaurant_ids)} restaurants of run {run.id}")
+        )
@@ -1,6 +1,14 @@
-import random
-from itertools import combinations
-from typing import List, Dict, TypedDict, Union, Any
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from heapq import heappush, heapreplace
+from math import ceil, inf
+from time import monotonic
+from typing import (
+    Any, Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, TypedDict, Union
+)
+
+from .roles import AT_MOST_ONE, REQUIRED
 
 class MenuItem(TypedDict):
     id: Union[int, str]  # Could be either int or str depending on source
@@ -10,6 +18,159 @@ class MenuItem(TypedDict):
 class MealCombination(TypedDict):
     items: List[MenuItem]
 
+# Nutrients the recommender can constrain, besides calories, as stored on menu items
+# (grams, except sodium in milligrams)
+NUTRIENTS = ('protein', 'carbohydrate', 'fat', 'sodium')
+
+# Nutrient amounts are searched as integers in 1/NUTRIENT_SCALE units, so sums are exact
+NUTRIENT_SCALE = 100
+
+# Per-nutrient (minimum, maximum) amounts for a whole meal; None leaves that side open
+NutrientLimits = Dict[str, Tuple[Optional[float], Optional[float]]]
+
+# Stands in for a nutrient amount the menu does not list (amounts are never negative)
+UNKNOWN_AMOUNT = -1
+
+def _scaled_nutrient(amount: Optional[float]) -> int:
+    """A nutrient amount in search units, or UNKNOWN_AMOUNT."""
+    return UNKNOWN_AMOUNT if amount is None else round(float(amount) * NUTRIENT_SCALE)
+
+# Where a ranked search stopped: (total calories, item count, positions in calorie order)
+MealCursor = Tuple[int, int, Tuple[int, ...]]
+
+class CompactMenu:
+    """
+    Array-backed menu for the recommender hot path.
+
+    Holds ids and calories in `array`s and interned names, in menu order, together with
+    the calorie-sorted view the search backends need, so a cached menu can be searched
+    again without re-sorting it or building a dict per item. Dicts are only built for
+    the items of the returned combinations. Ids must be integers (database ids).
+    `roles` are the items' role bitmasks (see `roles.py`), all 0 (unknown) if not given.
+    `nutrients` maps nutrient names (from NUTRIENTS) to the items' amounts; they are kept
+    in search units, and amounts of None or of nutrients left out are unknown.
+    """
+    __slots__ = (
+        'ids', 'names', 'calories', 'roles', 'nutrients', 'order', 'sorted_calories', 'repeated_names',
+        'previous_copies', '_positions'
+    )
+
+    def __init__(
+        self,
+        ids: Iterable[int],
+        names: Iterable[str],
+        calories: Iterable[int],
+        roles: Optional[Iterable[int]] = None,
+        nutrients: Optional[Dict[str, Iterable[Optional[float]]]] = None
+    ):
+        self.ids = array('q', ids)
+        self.names = tuple(sys.intern(name) for name in names)
+        self.calories = array('i', calories)
+        self.roles = array('B', roles) if roles is not None else array('B', bytes(len(self.ids)))
+        self.nutrients = {
+            name: array('i', map(_scaled_nutrient, amounts)) for name, amounts in (nutrients or {}).items()
+        }
+        # Stable sort, so items with equal calories keep their menu order
+        self.order = array('i', sorted(range(len(self.calories)), key=self.calories.__getitem__))
+        self.sorted_calories = array('i', (self.calories[i] for i in self.order))
+        self.repeated_names = len(set(self.names)) < len(self.names)
+        self.previous_copies = _previous_copies(self.order, self.identity)
+        self._positions: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def item(self, position: int) -> MenuItem:
+        """The menu item at `position` (in menu order), as a dict."""
+        return {'id': self.ids[position], 'name': self.names[position], 'calories': self.calories[position]}
+
+    def identity(self, position: int) -> Tuple[Any, ...]:
+        """What tells the item at `position` apart from other copies of it: all but its id."""
+        return (
+            self.names[position], self.calories[position], self.roles[position],
+            tuple(amounts[position] for amounts in self.nutrients.values())
+        )
+
+    def position_of(self, item_id: int) -> Optional[int]:
+        """Menu position of the item with id `item_id`, or None if it is not on the menu."""
+        if self._positions is None:
+            self._positions = {item_id: position for position, item_id in enumerate(self.ids)}
+        return self._positions.get(item_id)
+
+Menu = Union[List[MenuItem], CompactMenu]
+
+# How many final-level expansions the pure-Python search runs between deadline checks
+DEADLINE_CHECK_INTERVAL = 64
+
+class SearchDeadlineExceeded(Exception):
+    """Raised by a search backend whose deadline passed; carries the best combinations found so far."""
+
+    def __init__(self, winners: List[Tuple[int, ...]]):
+        super().__init__("Meal search deadline exceeded")
+        self.winners = winners
+
+class RoleRules(NamedTuple):
+    """
+    Meal composition rules over item role bitmasks, applied inside the search backends:
+    every role bit in `at_most_one` may be covered by at most one item of a meal, and every
+    bit in `required` must be covered by some item.
+    """
+    roles: Sequence[int]  # Role bitmask of every searched item, in calorie order
+    at_most_one: int = AT_MOST_ONE
+    required: int = REQUIRED
+    fixed: Tuple[int, ...] = ()  # Role bitmasks of the items fixed into every meal
+
+    def fixed_mask(self) -> Optional[int]:
+        """Roles covered by the fixed items, or None when they already break the at-most-one rule."""
+        mask = 0
+        for role in self.fixed:
+            if role & mask & self.at_most_one:
+                return None
+            mask |= role
+        return mask
+
+class NutrientBounds(NamedTuple):
+    """
+    Nutrient limits for the search backends, in search units: for every constrained
+    nutrient, the amounts of the searched items (in calorie order) and the [low, high]
+    range the searched items of a meal must add up to, i.e. with the fixed items' share
+    already taken off. Open sides are -inf / inf.
+    """
+    amounts: Sequence[Sequence[int]]
+    low: Sequence[float]
+    high: Sequence[float]
+
+    def fixed_alone_fits(self) -> bool:
+        """Whether the fixed items alone are within the limits."""
+        return all(low <= 0 <= high for low, high in zip(self.low, self.high))
+
+def _suffix_extremes(amounts: Sequence[int], max_items: int) -> Tuple[List[List[int]], List[List[int]]]:
+    """
+    Sorted per-nutrient bounds over the menu suffixes: `smallest[j][r]` and `largest[j][r]`
+    are the lowest and highest sums of r items from `amounts[j:]` (for r <= max_items),
+    so whatever r items a search picks after position j, their sum lies between the two.
+    """
+    n = len(amounts)
+    smallest = [[0] * (max_items + 1) for _ in range(n + 1)]
+    largest = [[0] * (max_items + 1) for _ in range(n + 1)]
+    low_values: List[int] = []
+    high_values: List[int] = []  # Negated, so both lists keep their best values first
+    for j in range(n - 1, -1, -1):
+        insort(low_values, amounts[j])
+        insort(high_values, -amounts[j])
+        del low_values[max_items:], high_values[max_items:]
+        low_row, high_row = smallest[j], largest[j]
+        for r in range(1, max_items + 1):
+            if r > len(low_values):
+                # Fewer than r items left: no sum is possible, which fails both bounds
+                low_row[r], high_row[r] = inf, -inf
+            else:
+                low_row[r] = low_row[r - 1] + low_values[r - 1]
+                high_row[r] = high_row[r - 1] - high_values[r - 1]
+    for r in range(1, max_items + 1):
+        smallest[n][r], largest[n][r] = inf, -inf
+    return smallest, largest
+
 def is_realistic_combination(items: List[MenuItem]) -> bool:
     """Apply heuristics to determine if this is a realistic meal combination."""
     # Check 1: Not too many of the same item
@@ -31,96 +192,706 @@ def is_realistic_combination(items: List[MenuItem]) -> bool:
     
     return True
 
+def _cursor_entry(cursor: MealCursor) -> Tuple[int, int, Tuple[int, ...]]:
+    """Turn a cursor into the heap entry form used by `_search`."""
+    total, count, positions = cursor
+    return (total, -count, tuple(-i for i in positions))
+
+def _suffix_reach(calories: List[int], max_items: int, high: int) -> List[List[int]]:
+    """
+    Subset-sum table over the menu suffixes, as bitsets: bit t of `reach[j][r]` is set
+    when some r items from `calories[j:]` add up to exactly t (for t <= high).
+    """
+    mask = (1 << (high + 1)) - 1
+    n = len(calories)
+    reach = [[1] + [0] * max_items for _ in range(n + 1)]
+    for j in range(n - 1, -1, -1):
+        cal, below, row = calories[j], reach[j + 1], reach[j]
+        for r in range(1, max_items + 1):
+            row[r] = below[r] | ((below[r - 1] << cal) & mask)
+    return reach
+
+def _suffix_role_reach(
+    calories: List[int], roles: Sequence[int], required: int, max_items: int, high: int
+) -> Dict[int, List[List[int]]]:
+    """
+    `_suffix_reach` per subset of the `required` role bits: bit t of `reaches[s][j][r]`
+    is set when some r items from `calories[j:]` whose roles together cover `s` add up
+    to exactly t. `reaches[0]` is the plain table.
+    """
+    mask = (1 << (high + 1)) - 1
+    n = len(calories)
+    subsets = [s for s in range(required + 1) if not s & ~required]
+    reaches = {s: [[int(s == 0)] + [0] * max_items for _ in range(n + 1)] for s in subsets}
+    for j in range(n - 1, -1, -1):
+        cal, role = calories[j], roles[j]
+        for s in subsets:
+            below, rest, row = reaches[s][j + 1], reaches[s & ~role][j + 1], reaches[s][j]
+            for r in range(1, max_items + 1):
+                row[r] = below[r] | ((rest[r - 1] << cal) & mask)
+    return reaches
+
+def _suffix_share_floors(calories: List[int], roles: Sequence[int], required: int) -> Dict[int, List[float]]:
+    """
+    Lowest meal total the 80% share rule allows once the items from each position on must
+    still cover some required role bits: for every bit of `s`, the meal has an item from
+    `j` on with that bit, so its largest item is at least the smallest such item, and
+    `floors[s][j]` is 5/4 of the largest of those. inf when no item covers a bit.
+    """
+    n = len(calories)
+    bits = [1 << k for k in range(required.bit_length()) if required >> k & 1]
+    # Share floor of the smallest item with each bit from every position on
+    bit_floors = {}
+    for bit in bits:
+        column = [inf] * (n + 1)
+        for j in range(n - 1, -1, -1):
+            column[j] = (calories[j] * 5 + 3) // 4 if roles[j] & bit else column[j + 1]
+        bit_floors[bit] = column
+    return {
+        s: [max((bit_floors[bit][j] for bit in bits if s & bit), default=0) for j in range(n + 1)]
+        for s in range(required + 1) if not s & ~required
+    }
+
+def _can_reach(reach: List[List[int]], start: int, remaining: int, low: int, high: int) -> bool:
+    """Whether `remaining` items from position `start` on can add up to a total in [low, high]."""
+    low = max(low, 0)
+    if high < low:
+        return False
+    return (reach[start][remaining] >> low) & ((1 << (high - low + 1)) - 1) != 0
+
+def _search(
+    calories: List[int],
+    low: float,
+    high: float,
+    max_items: int,
+    target_count: int,
+    accept: Optional[Callable[[Tuple[int, ...]], bool]] = None,
+    after: Optional[MealCursor] = None,
+    deadline: Optional[float] = None,
+    stats: Optional[Dict[str, int]] = None,
+    base: Tuple[int, int] = (0, 0),
+    rules: Optional[RoleRules] = None,
+    nutrients: Optional[NutrientBounds] = None
+) -> List[Tuple[int, ...]]:
+    """
+    Pure-Python search backend: return the `target_count` best realistic combinations
+    with a total in [low, high], as increasing index tuples into the ascending
+    (integer) `calories` list, ranked best first. `accept` is an extra filter applied
+    to candidates, and `after` skips every combination ranked at or above that cursor.
+    If `time.monotonic()` passes `deadline`, the search stops and raises
+    `SearchDeadlineExceeded` with the winners found so far. If `stats` is given, the
+    number of candidates that reached the final pick is added to `stats['evaluated']`.
+
+    `base` is `(total, largest)` calories of items fixed into every meal (and not in
+    `calories`): totals and the realism rules then cover the fixed items too, while
+    item counts and index tuples only cover the searched ones. `rules` restricts which
+    item roles a meal may combine; the roles picked so far are carried down the search,
+    so a prefix that already breaks an at-most-one rule is abandoned with its subtree,
+    and so is one whose completions can no longer cover the required roles it misses
+    (checked against a subset-sum table per set of missing roles) or keep the smallest
+    item that could cover them within 80% of the meal.
+    `nutrients` bounds the meal's nutrient sums: the sums picked so far are carried down
+    as well, and a prefix is abandoned as soon as, for any nutrient, even the smallest or
+    largest possible completion from the items after it (per `_suffix_extremes`) falls
+    outside the range.
+
+    Combinations are ranked by highest total, then fewest items, then lowest indexes.
+    Because the list is sorted, the last index of a combination is always its largest
+    item, which lets whole subtrees be skipped: a prefix is abandoned as soon as its
+    cheapest completion overshoots `high`, or no completion from the items after it
+    can land in the window (checked against a subset-sum table). The last item is
+    picked by bisecting for the window, the 150 kcal substance rule and the 80% share
+    rule directly.
+
+    Only the current winners are kept, as lightweight index entries in a heap whose root
+    is the worst of them. Once the heap is full the root's total becomes the floor (a
+    strict one for combinations with more items than the root, or whose indexes already
+    come after the root's, as they lose ties), so memory stays flat and the window
+    narrows as better combinations are found, even on menus with many equal totals.
+    """
+    n = len(calories)
+    high = int(high)
+    base_total, base_largest = base
+    if target_count < 1 or high < base_total:
+        return []
+    min_total = max(ceil(low), 0)
+    # Fixed items may already give the meal substance, or need the rest to outweigh them
+    min_last = 150 if base_largest < 150 else 0
+    share_floor = (base_largest * 5 + 3) // 4
+
+    roles = None
+    start_mask = at_most_one = required = 0
+    if rules is not None:
+        roles, at_most_one, required = rules.roles, rules.at_most_one, rules.required
+        start_mask = rules.fixed_mask()
+        if start_mask is None:
+            return []
+
+    # The tables cover the searched items only, so they stop at what the fixed ones leave
+    if required:
+        reaches = _suffix_role_reach(calories, roles, required, max_items, high - base_total)
+        share_floors = _suffix_share_floors(calories, roles, required)
+    else:
+        reaches = {0: _suffix_reach(calories, max_items, high - base_total)}
+
+    dimensions = []
+    if nutrients is not None:
+        for amounts, low_amount, high_amount in zip(nutrients.amounts, nutrients.low, nutrients.high):
+            dimensions.append((amounts, low_amount, high_amount, *_suffix_extremes(amounts, max_items)))
+
+    def fits_nutrients(sums: Tuple[int, ...], start: int, remaining: int) -> bool:
+        """Whether `remaining` more items from position `start` on can keep every nutrient in range."""
+        for amount, (_, low_amount, high_amount, smallest, largest) in zip(sums, dimensions):
+            if amount + smallest[start][remaining] > high_amount or amount + largest[start][remaining] < low_amount:
+                return False
+        return True
+
+    def add_nutrients(sums: Tuple[int, ...], j: int) -> Tuple[int, ...]:
+        return tuple(amount + dimension[0][j] for amount, dimension in zip(sums, dimensions))
+
+    start_sums = (0,) * len(dimensions)
+
+    # Entries are (total, -item count, negated indexes), so the heap root is the worst
+    heap: List[Tuple[int, int, Tuple[int, ...]]] = []
+    chosen: List[int] = []
+    after_entry = _cursor_entry(after) if after is not None else None
+    expansions = 0
+    evaluated = 0
+
+    def ranked() -> List[Tuple[int, ...]]:
+        return [tuple(-i for i in entry[2]) for entry in sorted(heap, reverse=True)]
+
+    def ceiling(size: int) -> int:
+        """Highest total a `size`-item combination may have to rank below `after`."""
+        if after is None:
+            return high
+        # Ties on total go to fewer items, so smaller combinations must stay strictly below
+        after_total, after_count, _ = after
+        return min(high, after_total - 1 if size < after_count else after_total)
+
+    def floor(size: int, prefix: Tuple[int, ...] = ()) -> int:
+        """
+        Lowest total a `size`-item combination needs to be able to enter the heap, if it
+        starts with the (negated, as in heap entries) indexes `prefix`.
+        """
+        if len(heap) < target_count:
+            return min_total
+        # Ties on total go to fewer items, then to lower indexes, so larger combinations and
+        # ones whose indexes already come after the root's must strictly beat the root
+        worst_total, worst_count, worst_indexes = heap[0][0], -heap[0][1], heap[0][2]
+        if worst_count < size or (worst_count == size and prefix < worst_indexes[:len(prefix)]):
+            return max(min_total, worst_total + 1)
+        return max(min_total, worst_total)
+
+    def extend(start: int, total: int, remaining: int, size: int, top: int, mask: int, sums: Tuple[int, ...]) -> None:
+        nonlocal expansions, evaluated
+        negated = tuple(-i for i in chosen)
+        if remaining == 1:
+            if deadline is not None:
+                expansions += 1
+                if expansions % DEADLINE_CHECK_INTERVAL == 0 and monotonic() > deadline:
+                    raise SearchDeadlineExceeded(ranked())
+
+            # The final pick is the largest searched item: it must reach the window, be at
+            # least 150 kcal and stay within 80% of the meal, i.e. at most 4x the rest of it
+            # (and large enough that the largest fixed item stays within 80% too).
+            first = bisect_left(calories, max(floor(size, negated) - total, min_last, share_floor - total), start)
+            last = bisect_right(calories, min(top - total, total * 4), start)
+            if stats is not None and last > first:
+                evaluated += last - first
+
+            # Best totals first, so the floor rises as early as possible
+            for j in range(last - 1, first - 1, -1):
+                meal_total = total + calories[j]
+                entry = (meal_total, -size, negated + (-j,))
+                if after_entry is not None and entry >= after_entry:
+                    continue
+                if len(heap) >= target_count:
+                    if meal_total < heap[0][0]:
+                        break
+                    if entry <= heap[0]:
+                        continue
+                if roles is not None:
+                    role = roles[j]
+                    if role & mask & at_most_one or (mask | role) & required != required:
+                        continue
+                if dimensions and not fits_nutrients(add_nutrients(sums, j), j + 1, 0):
+                    continue
+                if accept is not None and not accept((*chosen, j)):
+                    continue
+
+                if len(heap) < target_count:
+                    heappush(heap, entry)
+                else:
+                    heapreplace(heap, entry)
+            return
+
+        for j in range(start, n - remaining + 1):
+            cal = calories[j]
+            # Every later pick is at least as large as this one
+            if total + cal * remaining > top:
+                break
+            role = roles[j] if roles is not None else 0
+            if role & mask & at_most_one:
+                continue
+            # The rest must cover the required roles still missing, and the meal's largest
+            # item (at least this one, and any item left to cover a role) stays within 80%
+            subtotal = total + cal
+            missing = required & ~(mask | role)
+            need = max(floor(size, negated + (-j,)), share_floor, (cal * 5 + 3) // 4)
+            if missing:
+                need = max(need, share_floors[missing][j + 1])
+            if not _can_reach(reaches[missing], j + 1, remaining - 1, need - subtotal, top - subtotal):
+                continue
+            subsums = sums
+            if dimensions:
+                subsums = add_nutrients(sums, j)
+                if not fits_nutrients(subsums, j + 1, remaining - 1):
+                    continue
+            chosen.append(j)
+            extend(j + 1, subtotal, remaining - 1, size, top, mask | role, subsums)
+            chosen.pop()
+
+    try:
+        # Fewer items first: they win ties, so they tighten the floor for larger sizes
+        for num_items in range(1, min(max_items, n) + 1):
+            top = ceiling(num_items)
+            missing = required & ~start_mask
+            need = max(floor(num_items), share_floor)
+            if missing:
+                need = max(need, share_floors[missing][0])
+            if not _can_reach(reaches[missing], 0, num_items, need - base_total, top - base_total):
+                continue
+            if dimensions and not fits_nutrients(start_sums, 0, num_items):
+                continue
+            extend(0, base_total, num_items, num_items, top, start_mask, start_sums)
+    finally:
+        if stats is not None:
+            stats['evaluated'] = stats.get('evaluated', 0) + evaluated
+
+    return ranked()
+
+def _get_search_backend(backend: str) -> Callable[..., List[Tuple[int, ...]]]:
+    """Return the search function for a backend name."""
+    if backend == 'numpy':
+        from .meal_recommender_numpy import search
+        return search
+    if backend == 'python':
+        return _search
+    raise ValueError(f"Unknown meal recommender backend: {backend}")
+
+def _previous_copies(order: Sequence[int], identity: Callable[[int], Hashable]) -> Optional[List[int]]:
+    """
+    For every position in `order`, the position of the previous identical item (same
+    `identity` of its menu position), or -1 for the first copy. None when the menu has no
+    identical items.
+    """
+    last_seen: Dict[Hashable, int] = {}
+    previous = []
+    for position, i in enumerate(order):
+        key = identity(i)
+        previous.append(last_seen.get(key, -1))
+        last_seen[key] = position
+    return previous if len(last_seen) < len(order) else None
+
+class _PreparedMenu(NamedTuple):
+    order: Sequence[int]  # Menu positions of the searched items, in calorie order
+    calories: Sequence[int]  # Their (integer) calories, ascending
+    accept: Optional[Callable[[Tuple[int, ...]], bool]]  # Extra candidate filter, if needed
+    item_at: Callable[[int], MenuItem]  # Menu item at a menu position
+    fixed: Tuple[int, ...] = ()  # Menu positions of items included in every meal
+    base: Tuple[int, int] = (0, 0)  # Total and largest calories of the fixed items
+    rules: Optional[RoleRules] = None  # Role rules, when the menu's item roles are known
+    nutrients: Optional[NutrientBounds] = None  # Nutrient limits, if any
+
+    def meal(self, combo: Tuple[int, ...]) -> MealCombination:
+        """The meal for a search result, with its items in menu order."""
+        return {'items': [self.item_at(i) for i in sorted(self.fixed + tuple(self.order[j] for j in combo))]}
+
+def _prepare_menu(
+    menu_items: Menu,
+    stats: Optional[Dict[str, int]] = None,
+    include: Optional[Iterable[Union[int, str]]] = None,
+    exclude: Optional[Iterable[Union[int, str]]] = None,
+    nutrient_limits: Optional[NutrientLimits] = None
+) -> _PreparedMenu:
+    """
+    Sort the menu by calories for searching.
+
+    Menus often list the same item more than once (same name, calories, roles and nutrient
+    amounts, different ids), which would yield meals that look identical. The filter only lets through the canonical
+    copy of such a meal: the one using the earliest copies of each repeated item. That makes
+    every distinct meal appear once, without remembering the meals already seen; rejected
+    copies are counted in `stats['duplicates']`.
+
+    Items with an id in `include` are fixed into every meal and items in `exclude` are left
+    out, so neither is searched. Raises ValueError when an included id is not on the menu
+    or is also excluded.
+
+    When any item has a role, meals follow the default `RoleRules`; a meal only has to
+    contain an entrée if the menu left to choose from has one.
+
+    `nutrient_limits` are turned into `NutrientBounds` for the searched items. An item
+    whose amount of a limited nutrient is unknown cannot be shown to meet the limit, so
+    it is left out like an excluded one; if it is included, no meal qualifies. Raises
+    ValueError for a nutrient not in NUTRIENTS.
+    """
+    for nutrient in nutrient_limits or ():
+        if nutrient not in NUTRIENTS:
+            raise ValueError(f"Unknown nutrient: {nutrient}")
+
+    if isinstance(menu_items, CompactMenu):
+        order, calories, item_at = menu_items.order, menu_items.sorted_calories, menu_items.item
+        repeated_names, previous = menu_items.repeated_names, menu_items.previous_copies
+        name_of, calories_of = menu_items.names.__getitem__, menu_items.calories.__getitem__
+        identity = menu_items.identity
+        roles_of = menu_items.roles.__getitem__
+        nutrient_of = lambda i, nutrient: (
+            menu_items.nutrients[nutrient][i] if nutrient in menu_items.nutrients else UNKNOWN_AMOUNT
+        )
+        position_of = menu_items.position_of
+    else:
+        # Stable sort, so items with equal calories keep their menu order
+        order = sorted(range(len(menu_items)), key=lambda i: menu_items[i]['calories'])
+        calories = [int(menu_items[i]['calories']) for i in order]
+        item_at = menu_items.__getitem__
+
+        names = [menu_items[i]['name'] for i in order]
+        repeated_names = len(set(names)) < len(names)
+        name_of = lambda i: menu_items[i]['name']
+        calories_of = lambda i: int(menu_items[i]['calories'])
+        roles_of = lambda i: menu_items[i].get('roles', 0)
+        nutrient_of = lambda i, nutrient: _scaled_nutrient(menu_items[i].get(nutrient))
+        identity = lambda i: (
+            name_of(i), calories_of(i), roles_of(i), tuple(nutrient_of(i, nutrient) for nutrient in NUTRIENTS)
+        )
+        previous = _previous_copies(order, identity) if repeated_names else None
+        position_of = lambda item_id: positions.get(item_id)
+
+    fixed: Tuple[int, ...] = ()
+    base = (0, 0)
+    if include or exclude or nutrient_limits:
+        if not isinstance(menu_items, CompactMenu):
+            positions = {item['id']: i for i, item in enumerate(menu_items)}
+        fixed = tuple(dict.fromkeys(position_of(item_id) for item_id in include or ()))
+        if None in fixed:
+            raise ValueError("Included items must be on the menu")
+        dropped = {position_of(item_id) for item_id in exclude or ()}
+        if dropped.intersection(fixed):
+            raise ValueError("An item cannot be both included and excluded")
+        for nutrient, bounds in (nutrient_limits or {}).items():
+            if bounds != (None, None):
+                dropped.update(i for i in order if nutrient_of(i, nutrient) == UNKNOWN_AMOUNT)
+
+        dropped.update(fixed)
+        order = [i for i in order if i not in dropped]
+        calories = [calories_of(i) for i in order]
+        fixed_calories = [calories_of(i) for i in fixed]
+        base = (sum(fixed_calories), max(fixed_calories, default=0))
+
+        names = [name_of(i) for i in order]
+        repeated_names = len(set(names + [name_of(i) for i in fixed])) < len(names) + len(fixed)
+        previous = _previous_copies(order, identity) if repeated_names else None
+
+    rules = None
+    roles = [roles_of(i) for i in order]
+    fixed_roles = tuple(roles_of(i) for i in fixed)
+    menu_mask = 0
+    for role in roles + list(fixed_roles):
+        menu_mask |= role
+    if menu_mask:
+        rules = RoleRules(roles, required=REQUIRED & menu_mask, fixed=fixed_roles)
+
+    nutrients = None
+    if nutrient_limits:
+        amounts, lows, highs = [], [], []
+        for nutrient, (minimum, maximum) in nutrient_limits.items():
+            fixed_amounts = [nutrient_of(i, nutrient) for i in fixed]
+            amounts.append([nutrient_of(i, nutrient) for i in order])
+            if UNKNOWN_AMOUNT in fixed_amounts and (minimum, maximum) != (None, None):
+                # An included item of unknown amount leaves no meal within the limits
+                lows.append(inf)
+                highs.append(-inf)
+                continue
+            lows.append(-inf if minimum is None else minimum * NUTRIENT_SCALE - sum(fixed_amounts))
+            highs.append(inf if maximum is None else maximum * NUTRIENT_SCALE - sum(fixed_amounts))
+        nutrients = NutrientBounds(amounts, lows, highs)
+
+    if not repeated_names:
+        return _PreparedMenu(order, calories, None, item_at, fixed, base, rules, nutrients)
+
+    fixed_items = [item_at(i) for i in fixed]
+
+    def accept(combo: Tuple[int, ...]) -> bool:
+        if previous is not None and any(previous[i] >= 0 and previous[i] not in combo for i in combo):
+            if stats is not None:
+                stats['duplicates'] = stats.get('duplicates', 0) + 1
+            return False
+        # Only menus with repeated names can break the "at most 2 of any item" rule
+        return is_realistic_combination(fixed_items + [item_at(order[i]) for i in combo])
+
+    return _PreparedMenu(order, calories, accept, item_at, fixed, base, rules, nutrients)
+
+def _search_menu(
+    search: Callable[..., List[Tuple[int, ...]]],
+    menu: _PreparedMenu,
+    low: float,
+    high: int,
+    max_items: int,
+    target_count: int,
+    **kwargs
+) -> List[Tuple[int, ...]]:
+    """
+    Run a search backend over a prepared menu, fixed items included: the backend only
+    searches the free slots, and the fixed items alone are ranked in as a meal of their own.
+    """
+    fixed = menu.fixed
+    if len(fixed) > max_items:
+        return []
+
+    def with_fixed_alone(winners: List[Tuple[int, ...]]) -> List[Tuple[int, ...]]:
+        base_total = menu.base[0]
+        if not fixed or not low <= base_total <= high:
+            return winners
+        if not is_realistic_combination([menu.item_at(i) for i in fixed]):
+            return winners
+        if menu.rules is not None:
+            fixed_mask = menu.rules.fixed_mask()
+            if fixed_mask is None or fixed_mask & menu.rules.required != menu.rules.required:
+                return winners
+        if menu.nutrients is not None and not menu.nutrients.fixed_alone_fits():
+            return winners
+        # Searched meals never total less than the fixed items, and ties go to fewer items
+        position = next(
+            (k for k, combo in enumerate(winners) if sum(menu.calories[j] for j in combo) == 0),
+            len(winners)
+        )
+        return (winners[:position] + [()] + winners[position:])[:target_count]
+
+    try:
+        winners = search(
+            menu.calories, low, high, max_items - len(fixed), target_count, menu.accept,
+            base=menu.base, rules=menu.rules, nutrients=menu.nutrients, **kwargs
+        )
+    except SearchDeadlineExceeded as exc:
+        exc.winners = with_fixed_alone(exc.winners)
+        raise
+    return with_fixed_alone(winners)
+
 def find_meal_combinations_efficient(
-    menu_items: List[MenuItem],
+    menu_items: Menu,
     calorie_limit: int,
     target_count: int = 20,
     min_efficiency: float = 0.7,
-    max_items: int = 4
+    max_items: int = 4,
+    backend: str = 'python',
+    stats: Optional[Dict[str, int]] = None,
+    include: Optional[Iterable[Union[int, str]]] = None,
+    exclude: Optional[Iterable[Union[int, str]]] = None,
+    nutrient_limits: Optional[NutrientLimits] = None
 ) -> List[MealCombination]:
     """
     Find valid meal combinations within calorie limit with improved efficiency.
+
+    Items are searched in calorie order with subtrees pruned against the calorie window
+    `[calorie_limit * min_efficiency, calorie_limit]`, and the result is the true top
+    `target_count` by efficiency (ties go to fewer items), so the same menu always
+    yields the same recommendations. Every combination is generated once, and meals
+    that only differ in which copy of a repeated menu item they use are returned once.
+    When the items carry 'roles' bitmasks, meals hold at most one drink and, if the menu
+    has entrées, at least one entrée (see `RoleRules`).
     
     Args:
         menu_items: List of dicts containing menu items with 'id', 'name', and 'calories'
+            (and optionally 'roles'), or a CompactMenu
         calorie_limit: Maximum calories allowed for the meal
         target_count: Number of meal combinations to return
         min_efficiency: Minimum ratio of total calories to calorie limit
         max_items: Maximum number of items in a combination
+        backend: 'python' for the pure-Python search, 'numpy' to score candidates in
+            vectorized blocks. Both return identical results; 'python' is the default
+            and usually as fast or faster, as its pruning keeps the candidates it scores
+            to a few thousand (see `meal_recommender_numpy.search`).
+        stats: Optional dict the search adds its counters to: 'evaluated', the number
+            of candidate combinations it scored, and 'duplicates', the number of copies
+            of identical meals it skipped
+        include: Ids of items every meal must contain. They are fixed up front and only
+            the remaining calories and item slots are searched.
+        exclude: Ids of items no meal may contain; they are dropped before searching
+        nutrient_limits: Optional (minimum, maximum) amounts of a whole meal per nutrient
+            in NUTRIENTS, e.g. `{'protein': (40, None)}` for at least 40 g of protein,
+            taken from the items' nutrient keys. Items whose amount of a limited nutrient
+            is missing or None are left out, as they cannot be shown to meet the limit.
+            The search prunes on these alongside calories.
     
     Returns:
         List of dicts containing just the menu items in each combination
     """
+    search = _get_search_backend(backend)
+
     # Early return for empty menu items
     if not menu_items:
         return []
 
-    valid_meals: List[Dict] = []  # Using Dict temporarily for internal processing
-    
-    # First try smaller combinations which are less computationally expensive
-    for num_items in range(1, min(3, max_items) + 1):
-        for combo in combinations(menu_items, num_items):
-            total_calories = sum(item['calories'] for item in combo)
-            
-            if total_calories <= calorie_limit and total_calories >= calorie_limit * min_efficiency:
-                efficiency = total_calories / calorie_limit
-                
-                if is_realistic_combination(list(combo)):
-                    valid_meals.append({
-                        'items': list(combo),
-                        'total_calories': total_calories,
-                        'efficiency': efficiency,
-                        'item_count': len(combo)
-                    })
-                    
-                    if len(valid_meals) >= target_count * 3:
-                        break
-        
-        if len(valid_meals) >= target_count * 3:
+    menu = _prepare_menu(menu_items, stats, include, exclude, nutrient_limits)
+    low = calorie_limit * min_efficiency
+
+    winners = _search_menu(search, menu, low, calorie_limit, max_items, target_count, stats=stats)
+
+    # Return only the items for each meal combination, in menu order
+    return [menu.meal(combo) for combo in winners]
+
+def find_meal_combinations_anytime(
+    menu_items: Menu,
+    calorie_limit: int,
+    budget: float,
+    target_count: int = 20,
+    min_efficiency: float = 0.7,
+    max_items: int = 4,
+    backend: str = 'python',
+    include: Optional[Iterable[Union[int, str]]] = None,
+    exclude: Optional[Iterable[Union[int, str]]] = None,
+    nutrient_limits: Optional[NutrientLimits] = None
+) -> Tuple[List[MealCombination], bool]:
+    """
+    Like `find_meal_combinations_efficient`, but stops searching after `budget` seconds.
+
+    Returns `(combinations, partial)`. When the budget runs out, `combinations` are the
+    best ones found up to that point (still valid and ranked, but not necessarily the
+    overall top `target_count`) and `partial` is True.
+    """
+    search = _get_search_backend(backend)
+    if not menu_items:
+        return [], False
+
+    deadline = monotonic() + budget
+    menu = _prepare_menu(menu_items, include=include, exclude=exclude, nutrient_limits=nutrient_limits)
+    low = calorie_limit * min_efficiency
+
+    partial = False
+    try:
+        winners = _search_menu(search, menu, low, calorie_limit, max_items, target_count, deadline=deadline)
+    except SearchDeadlineExceeded as exc:
+        winners, partial = exc.winners, True
+
+    return [menu.meal(combo) for combo in winners], partial
+
+def iter_meal_combinations(
+    menu_items: Menu,
+    calorie_limit: int,
+    min_efficiency: float = 0.7,
+    max_items: int = 4,
+    after: Optional[MealCursor] = None,
+    batch_size: int = 20,
+    backend: str = 'python'
+) -> Iterator[Tuple[MealCursor, MealCombination]]:
+    """
+    Lazily yield `(cursor, combination)` pairs in the same rank order as
+    `find_meal_combinations_efficient`, starting after `after` if given.
+
+    Combinations are found `batch_size` at a time, each batch being a fresh top-k
+    search capped just below the previous batch's last cursor, so resuming from a
+    cursor costs the same as starting over rather than replaying earlier batches.
+    Cursors index into the calorie-sorted menu, so they are only meaningful for the
+    same menu in the same order.
+    """
+    search = _get_search_backend(backend)
+    if not menu_items:
+        return
+
+    menu = _prepare_menu(menu_items)
+    low = calorie_limit * min_efficiency
+
+    while True:
+        winners = search(menu.calories, low, calorie_limit, max_items, batch_size, menu.accept, after, rules=menu.rules)
+        for combo in winners:
+            after = (sum(menu.calories[i] for i in combo), len(combo), combo)
+            yield after, menu.meal(combo)
+
+        if len(winners) < batch_size:
+            return
+
+def build_calorie_buckets(
+    menu_items: Menu,
+    max_calories: int,
+    bucket_width: int,
+    bucket_size: int,
+    max_items: int = 4,
+    backend: str = 'python'
+) -> Dict[int, List[Tuple[int, List[Union[int, str]]]]]:
+    """
+    Precompute the best meal combinations for every calorie bucket up to `max_calories`.
+
+    Bucket `top` covers the integer totals in (top - bucket_width, top] and holds up to
+    `bucket_size` `(total_calories, item ids)` pairs, ranked best first. Empty buckets
+    are left out.
+    """
+    search = _get_search_backend(backend)
+    if not menu_items:
+        return {}
+
+    menu = _prepare_menu(menu_items)
+    buckets = {}
+    for top in range(bucket_width, max_calories + 1, bucket_width):
+        winners = search(
+            menu.calories, top - bucket_width + 1, top, max_items, bucket_size, menu.accept, rules=menu.rules
+        )
+        if winners:
+            buckets[top] = [
+                (sum(menu.calories[i] for i in combo), [item['id'] for item in menu.meal(combo)['items']])
+                for combo in winners
+            ]
+    return buckets
+
+def find_meal_combinations_from_buckets(
+    buckets: Dict[int, List[Tuple[int, List[Union[int, str]]]]],
+    bucket_width: int,
+    bucket_size: int,
+    menu_items: Menu,
+    calorie_limit: int,
+    target_count: int = 20,
+    min_efficiency: float = 0.7
+) -> Optional[List[MealCombination]]:
+    """
+    Answer a recommendation from buckets built by `build_calorie_buckets` with a range scan.
+
+    Buckets are walked from the one containing `calorie_limit` downwards. Returns None
+    when the buckets cannot give the exact answer, e.g. the top bucket was truncated
+    and `calorie_limit` falls inside it, so the caller should search instead.
+    """
+    if target_count > bucket_size:
+        return None
+
+    if isinstance(menu_items, CompactMenu):
+        def item_with_id(item_id):
+            position = menu_items.position_of(item_id)
+            return None if position is None else menu_items.item(position)
+    else:
+        item_with_id = {item['id']: item for item in menu_items}.get
+    low = calorie_limit * min_efficiency
+    top = -(-calorie_limit // bucket_width) * bucket_width
+
+    meals: List[MealCombination] = []
+    for bucket in range(top, 0, -bucket_width):
+        if bucket < low:
             break
-    
-    # If we don't have enough combinations yet, try larger combinations with sampling
-    if len(valid_meals) < target_count and max_items > 2:
-        filtered_items = [item for item in menu_items if item['calories'] <= calorie_limit * 0.8]
-        
-        if filtered_items:  # Only proceed if we have items to work with
-            attempts = 0
-            max_attempts = 10000
-            
-            while len(valid_meals) < target_count * 3 and attempts < max_attempts:
-                attempts += 1
-                
-                # Generate weights matching the actual range size
-                size_range = list(range(3, max_items + 1))
-                weights = [5] * len(size_range)  # Equal weights for simplicity
-                
-                # Randomly select number of items
-                num_items = min(random.choices(size_range, weights=weights)[0], len(filtered_items))
-                
-                # Randomly select items
-                combo = random.sample(filtered_items, num_items)
-                total_calories = sum(item['calories'] for item in combo)
-                
-                if total_calories <= calorie_limit and total_calories >= calorie_limit * min_efficiency:
-                    efficiency = total_calories / calorie_limit
-                    
-                    if is_realistic_combination(combo):
-                        is_unique = True
-                        for meal in valid_meals[-10:]:
-                            if set(item['id'] for item in combo) == set(item['id'] for item in meal['items']):
-                                is_unique = False
-                                break
-                        
-                        if is_unique:
-                            valid_meals.append({
-                                'items': combo,
-                                'total_calories': total_calories,
-                                'efficiency': efficiency,
-                                'item_count': len(combo)
-                            })
-    
-    # Sort by efficiency and extract just the items
-    valid_meals.sort(key=lambda x: (x['efficiency'], -x['item_count']), reverse=True)
-    
-    # Return only the items for each meal combination
-    return [{'items': meal['items']} for meal in valid_meals[:target_count]]
+
+        entries = buckets.get(bucket, [])
+        if bucket == top and len(entries) >= bucket_size and entries[0][0] > calorie_limit:
+            # Combinations under the limit may have been cut from a full bucket
+            return None
+
+        for total, ids in entries:
+            if total > calorie_limit:
+                continue
+            if total < low:
+                return meals
+            items = [item_with_id(item_id) for item_id in ids]
+            if None in items:
+                return None
+
+            meals.append({'items': items})
+            if len(meals) >= target_count:
+                return meals
+
+    return meals
@@ -0,0 +1,490 @@
+from math import ceil
+from time import monotonic
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .meal_recommender import (
+    MealCursor,
+    NutrientBounds,
+    RoleRules,
+    SearchDeadlineExceeded,
+    _can_reach,
+    _suffix_extremes,
+    _suffix_reach,
+    _suffix_role_reach,
+    _suffix_share_floors,
+)
+from .roles import AT_MOST_ONE, REQUIRED
+
+# Rough upper bound on the number of candidates expanded per array operation
+BLOCK_CELLS = 1 << 20
+# Rough number of prefixes per block; smaller blocks let a rising floor prune sooner
+PREFIX_ROWS = 1 << 12
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Row numbers and values of the concatenated ranges [starts[i], stops[i])."""
+    widths = np.maximum(stops - starts, 0)
+    rows = np.repeat(np.arange(len(widths)), widths)
+    offsets = np.arange(int(widths.sum())) - np.repeat(np.cumsum(widths) - widths, widths)
+    return rows, starts[rows] + offsets
+
+
+def _prefixes(cal: np.ndarray, size: int, firsts: Iterable[int], high: int) -> Iterator[np.ndarray]:
+    """
+    Yield blocks of increasing index tuples of length `size`, in lexicographic order,
+    for the first indexes in `firsts` (ascending), to be completed by one larger item
+    within `high` kcal.
+
+    Tuples are built one first index at a time, and for prefixes of three one slice of
+    second indexes at a time, so no more than about PREFIX_ROWS of them exist at once.
+    Second indexes stop where the second item and every item after it can no longer
+    fit under `high`, and every tuple leaves room for a last item after it.
+    """
+    n = len(cal)
+
+    def parts() -> Iterator[np.ndarray]:
+        for first in firsts:
+            if size == 1:
+                yield np.array([[first]], dtype=np.int32)
+                continue
+            # The second item and the ones after it are at least as large
+            stop = int(np.searchsorted(cal, (high - int(cal[first])) // size, side='right'))
+            seconds = np.arange(first + 1, min(stop, n - size + 1), dtype=np.int32)
+            if size == 2:
+                yield np.stack([np.full(len(seconds), first, dtype=np.int32), seconds], axis=1)
+                continue
+            step = max(1, PREFIX_ROWS // n)
+            for start in range(0, len(seconds), step):
+                chunk = seconds[start:start + step]
+                rows, thirds = _ranges(chunk + 1, np.full(len(chunk), n - 1, dtype=np.int32))
+                yield np.stack(
+                    [np.full(len(rows), first, dtype=np.int32), chunk[rows], thirds.astype(np.int32)], axis=1
+                )
+
+    block, rows = [], 0
+    for part in parts():
+        block.append(part)
+        rows += len(part)
+        if rows >= PREFIX_ROWS:
+            yield np.concatenate(block)
+            block, rows = [], 0
+    if rows:
+        yield np.concatenate(block)
+
+
+class _RolePruning(NamedTuple):
+    """Role rules and the tables `_blocks_in_window` prunes with, for menus with required roles."""
+    roles: np.ndarray  # Role bitmask of every searched item, in calorie order
+    fixed_mask: int  # Roles covered by the fixed items
+    at_most_one: int
+    required: int
+    reaches: Dict[int, List[List[int]]]  # Per missing required roles, as `_suffix_role_reach`
+    share_floors: Dict[int, List[float]]  # As `_suffix_share_floors`
+    # next_covering[s, p]: first position from p on whose roles cover s (n if none)
+    next_covering: np.ndarray
+
+    @classmethod
+    def build(
+        cls, calories: List[int], rules: RoleRules, fixed_mask: int, high: int, max_items: int
+    ) -> '_RolePruning':
+        n = len(calories)
+        roles = np.asarray(rules.roles, dtype=np.int64)
+        next_covering = np.full((rules.required + 1, n + 1), n, dtype=np.int64)
+        for s in range(1, rules.required + 1):
+            if not s & ~rules.required:
+                covering = np.flatnonzero(roles & s == s)
+                next_covering[s, :n] = np.append(covering, n)[np.searchsorted(covering, np.arange(n))]
+        next_covering[0] = np.arange(n + 1)
+        return cls(
+            roles, fixed_mask, rules.at_most_one, rules.required,
+            _suffix_role_reach(calories, rules.roles, rules.required, max_items, high),
+            _suffix_share_floors(calories, rules.roles, rules.required),
+            next_covering
+        )
+
+
+def _blocks_in_window(
+    cal: np.ndarray,
+    reach: List[List[int]],
+    floor: Callable[[], int],
+    high: int,
+    size: int,
+    base: Tuple[int, int] = (0, 0),
+    keep_prefixes: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    per_prefix: Optional[int] = None,
+    role_pruning: Optional[_RolePruning] = None,
+    worst: Optional[Callable[[], Optional[Tuple[int, ...]]]] = None
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield (index tuples, totals) blocks for realistic combinations of `size` items with
+    a total in [floor(), high]. `floor` is re-read for every block, so the caller can
+    raise it as better combinations are found. `base` is `(total, largest)` calories of
+    fixed items added to every combination, as in `meal_recommender._search`.
+    `keep_prefixes`, if given, maps a block of prefixes to a mask of those worth completing.
+    `per_prefix`, if given, is how many of a prefix's best completions are enough: when
+    every hit is kept, the rest can never rank among the winners. `role_pruning`, if
+    given, also skips prefixes that cannot be completed into a meal with every required
+    role (or that already break an at-most-one rule), and starts each prefix's slice at
+    the first item that covers the required roles it still misses. `worst`, if given,
+    returns the indexes of the worst winner when it has `size` items too (else None):
+    ties on total go to lower indexes, so prefixes past its own must strictly beat floor().
+
+    Candidates are built from blocks of prefixes whose last item is the largest one;
+    first items that cannot be completed into the window (according to the subset-sum
+    table `reach`) are skipped outright. For every prefix the calorie window, the
+    150 kcal substance rule and the 80% share rule bound the last item to a contiguous
+    slice of the sorted menu, found with a vectorized searchsorted; the slices are then
+    expanded into hits in one step.
+    """
+    n = len(cal)
+    base_total, base_largest = base
+    # A single item is always 100% of its meal, so alone it can never pass the share rule
+    if size < 1 or size > n or (size == 1 and not base_total):
+        return
+
+    max_cal = int(cal[-1])
+    # Fixed items may already give the meal substance, or need the rest to outweigh them
+    substantial = int(np.searchsorted(cal, 150, side='left')) if base_largest < 150 else 0
+    share_floor = (base_largest * 5 + 3) // 4
+
+    if size == 1:
+        low = floor()
+        first = max(
+            int(np.searchsorted(cal, low - base_total, side='left')),
+            int(np.searchsorted(cal, share_floor - base_total, side='left')),
+            substantial
+        )
+        last = int(np.searchsorted(cal, min(high - base_total, base_total * 4), side='right'))
+        if last > first:
+            cols = np.arange(first, last, dtype=np.int32)
+            yield cols.reshape(-1, 1), base_total + cal[cols].astype(np.int64)
+        return
+
+    def firsts() -> Iterator[int]:
+        for first_item in range(n - size + 1):
+            first_cal = int(cal[first_item])
+            if base_total + first_cal * size > high:
+                # Later first items are larger, so their combinations only get heavier
+                break
+            subtotal = base_total + first_cal
+            # The meal's largest item is at least this one, so it must stay within 80%
+            need = max(floor(), share_floor, (first_cal * 5 + 3) // 4)
+            worst_indexes = worst() if worst is not None else None
+            if worst_indexes is not None and first_item > worst_indexes[0]:
+                need = max(need, floor() + 1)
+            first_reach = reach
+            if role_pruning is not None:
+                role = int(role_pruning.roles[first_item])
+                if role & role_pruning.fixed_mask & role_pruning.at_most_one:
+                    continue
+                missing = role_pruning.required & ~(role_pruning.fixed_mask | role)
+                if missing:
+                    need = max(need, role_pruning.share_floors[missing][first_item + 1])
+                first_reach = role_pruning.reaches[missing]
+            if _can_reach(first_reach, first_item + 1, size - 1, need - subtotal, high - subtotal):
+                yield first_item
+
+    for block in _prefixes(cal, size - 1, firsts(), high - base_total):
+        low = floor()
+        worst_indexes = worst() if worst is not None else None
+        if worst_indexes is not None:
+            low = low + _lex_greater(block, worst_indexes[:size - 1])
+        prefix_totals = cal[block].sum(axis=1, dtype=np.int64) + base_total
+        cheapest = prefix_totals + cal[block[:, -1]]
+
+        # Drop prefixes that cannot be completed inside the window by any larger item
+        keep = (cheapest <= high) & (prefix_totals + max_cal >= low)
+        if not keep.any():
+            continue
+        block, prefix_totals = block[keep], prefix_totals[keep]
+        if worst_indexes is not None:
+            low = low[keep]
+        if keep_prefixes is not None:
+            keep = keep_prefixes(block)
+            if not keep.any():
+                continue
+            block, prefix_totals = block[keep], prefix_totals[keep]
+            if worst_indexes is not None:
+                low = low[keep]
+
+        first = np.maximum(
+            np.searchsorted(cal, np.maximum(low, share_floor) - prefix_totals, side='left'),
+            np.maximum(block[:, -1] + 1, substantial)
+        )
+        if role_pruning is not None:
+            prefix_roles = role_pruning.roles[block]
+            keep = np.ones(len(block), dtype=bool)
+            for bit in (1 << k for k in range(role_pruning.at_most_one.bit_length())):
+                if role_pruning.at_most_one & bit:
+                    keep &= (prefix_roles & bit != 0).sum(axis=1) + bool(role_pruning.fixed_mask & bit) <= 1
+            missing = role_pruning.required & ~(np.bitwise_or.reduce(prefix_roles, axis=1) | role_pruning.fixed_mask)
+            # The last item has to cover every required role the prefix misses
+            first = np.where(keep, role_pruning.next_covering[missing, first], n)
+        last = np.searchsorted(cal, np.minimum(high - prefix_totals, prefix_totals * 4), side='right')
+        if per_prefix is not None:
+            # Keep the largest `per_prefix` last items, and any tied with the smallest of them
+            cutoff = cal[np.clip(last - per_prefix, 0, n - 1)]
+            first = np.maximum(first, np.searchsorted(cal, cutoff, side='left'))
+
+        rows_per_chunk = max(1, BLOCK_CELLS // n)
+        for start in range(0, len(block), rows_per_chunk):
+            rows, cols = _ranges(first[start:start + rows_per_chunk], last[start:start + rows_per_chunk])
+            if not len(rows):
+                continue
+            rows += start
+            cols = cols.astype(np.int32)
+
+            hits = np.concatenate([block[rows], cols.reshape(-1, 1)], axis=1)
+            yield hits, prefix_totals[rows] + cal[cols]
+
+
+def _lex_greater(rows: np.ndarray, reference: Tuple[int, ...]) -> np.ndarray:
+    """Mask of the rows that compare lexicographically greater than `reference`."""
+    greater = np.zeros(len(rows), dtype=bool)
+    equal = np.ones(len(rows), dtype=bool)
+    for col, value in enumerate(reference):
+        greater |= equal & (rows[:, col] > value)
+        equal &= rows[:, col] == value
+    return greater
+
+
+def _follows_rules(hits: np.ndarray, roles: np.ndarray, rules: RoleRules, fixed_mask: int) -> np.ndarray:
+    """Mask of the hits whose items, with the fixed ones, follow the role rules."""
+    hit_roles = roles[hits]
+    keep = ((np.bitwise_or.reduce(hit_roles, axis=1) | fixed_mask) & rules.required) == rules.required
+    for bit in (1 << k for k in range(rules.at_most_one.bit_length())):
+        if rules.at_most_one & bit:
+            keep &= (hit_roles & bit != 0).sum(axis=1) + bool(fixed_mask & bit) <= 1
+    return keep
+
+
+def _winners(best_hits: np.ndarray, n: int) -> List[Tuple[int, ...]]:
+    """Turn winner rows, padded with the menu length `n`, back into index tuples."""
+    counts = (best_hits < n).sum(axis=1)
+    ranked: List[Tuple[int, ...]] = [()] * len(best_hits)
+    for num_items in np.unique(counts).tolist():
+        positions = np.flatnonzero(counts == num_items).tolist()
+        for position, combo in zip(positions, map(tuple, best_hits[positions, :num_items].tolist())):
+            ranked[position] = combo
+    return ranked
+
+
+def search(
+    calories: List[int],
+    low: float,
+    high: float,
+    max_items: int,
+    target_count: int,
+    accept: Optional[Callable[[Tuple[int, ...]], bool]] = None,
+    after: Optional[MealCursor] = None,
+    deadline: Optional[float] = None,
+    stats: Optional[Dict[str, int]] = None,
+    base: Tuple[int, int] = (0, 0),
+    rules: Optional[RoleRules] = None,
+    nutrients: Optional[NutrientBounds] = None
+) -> List[Tuple[int, ...]]:
+    """
+    Vectorized counterpart of `meal_recommender._search`.
+
+    Loads the (ascending) calories into an int32 array and merges every candidate block
+    into the running top `target_count` with a lexsort. Once that is full, its worst
+    total becomes the floor for the following blocks. Only the returned winners become
+    Python tuples. Shares the subset-sum table used by the pure-Python search to skip
+    sizes and blocks that cannot land in the window, and the same `after`, `deadline`,
+    `stats`, `base`, `rules` and `nutrients` semantics (the deadline is checked between
+    blocks, and every expanded candidate counts as evaluated). Role rules and nutrient
+    limits are checked on whole blocks, from the roles and amounts of the hits gathered
+    into arrays; sizes whose nutrient ranges cannot be met by any items are skipped.
+    Prefixes are pruned on required roles and on ties with the worst winner the same way
+    as in the pure-Python search (see `_blocks_in_window`).
+
+    Without role rules, nutrient limits or other filters, only each prefix's best
+    `target_count` completions are expanded. Even so this is not faster than the pure-
+    Python search in general: on the synthetic menus of `benchmarks.meal_recommender`
+    (100 to 2500 items) it runs from about 2x slower to 2x faster, as the pure-Python
+    search scores far fewer candidates. It is kept as an alternative, not the default.
+    """
+    if max_items > 4:
+        raise ValueError("The numpy backend supports at most 4 items per combination")
+    if target_count < 1:
+        return []
+
+    n = len(calories)
+    high = int(high)
+    if high < base[0]:
+        return []
+    min_total = max(ceil(low), 0)
+    cal = np.asarray(calories, dtype=np.int32)
+    reach = _suffix_reach(calories, max_items, high - base[0])
+    role_pruning = None
+    if rules is not None:
+        roles = np.asarray(rules.roles, dtype=np.int64)
+        fixed_mask = rules.fixed_mask()
+        if fixed_mask is None:
+            return []
+        if rules.required:
+            role_pruning = _RolePruning.build(calories, rules, fixed_mask, high - base[0], max_items)
+    if nutrients is not None:
+        amounts = np.asarray(nutrients.amounts, dtype=np.int64).reshape(len(nutrients.amounts), n)
+        nutrient_low = np.asarray(nutrients.low, dtype=np.float64).reshape(-1, 1)
+        nutrient_high = np.asarray(nutrients.high, dtype=np.float64).reshape(-1, 1)
+        extremes = [_suffix_extremes(values, max(max_items, 1)) for values in nutrients.amounts]
+        # Lowest and highest amount of any single item after each position
+        next_smallest = np.array([[row[1] for row in smallest] for smallest, _ in extremes], dtype=np.float64)
+        next_largest = np.array([[row[1] for row in largest] for _, largest in extremes], dtype=np.float64)
+
+    def keep_prefixes(block: np.ndarray) -> np.ndarray:
+        """Prefixes whose nutrient sums can still be completed into range by one more item."""
+        sums = amounts[:, block].sum(axis=2)
+        after = block[:, -1] + 1
+        return (
+            (sums + next_smallest[:, after] <= nutrient_high) & (sums + next_largest[:, after] >= nutrient_low)
+        ).all(axis=0)
+
+    # Current winners, padded to a common width with a sentinel past the end of the menu
+    best_hits = np.empty((0, max_items), dtype=np.int32)
+    best_totals = np.empty(0, dtype=np.int64)
+    # (total, indexes) of the worst winner once there are `target_count` of them
+    worst_winner: Optional[Tuple[int, Tuple[int, ...]]] = None
+
+    def floor(size: int) -> int:
+        """Lowest total a `size`-item combination needs to be able to enter the winners."""
+        if worst_winner is None:
+            return min_total
+        # Ties on total go to fewer items, so larger combinations must strictly beat the worst
+        worst_total, worst_indexes = worst_winner
+        return max(min_total, worst_total + 1 if len(worst_indexes) < size else worst_total)
+
+    def worst(size: int) -> Optional[Tuple[int, ...]]:
+        """Indexes of the worst winner, if the winners are full and it has `size` items."""
+        if worst_winner is None or len(worst_winner[1]) != size:
+            return None
+        return worst_winner[1]
+
+    def ceiling(size: int) -> int:
+        """Highest total a `size`-item combination may have to rank below `after`."""
+        if after is None:
+            return high
+        # Ties on total go to fewer items, so smaller combinations must stay strictly below
+        after_total, after_count, _ = after
+        return min(high, after_total - 1 if size < after_count else after_total)
+
+    for num_items in range(1, min(max_items, n) + 1):
+        top = ceiling(num_items)
+        need, size_reach = floor(num_items), reach
+        if role_pruning is not None:
+            missing = rules.required & ~fixed_mask
+            if missing:
+                need = max(need, role_pruning.share_floors[missing][0])
+            size_reach = role_pruning.reaches[missing]
+        if not _can_reach(size_reach, 0, num_items, need - base[0], top - base[0]):
+            continue
+        if nutrients is not None and any(
+            smallest[0][num_items] > high_amount or largest[0][num_items] < low_amount
+            for (smallest, largest), low_amount, high_amount in zip(extremes, nutrients.low, nutrients.high)
+        ):
+            continue
+
+        # Without filters on the hits, a prefix's best `target_count` completions are enough
+        unfiltered = accept is None and rules is None and nutrients is None and (after is None or num_items != after[1])
+        blocks = _blocks_in_window(
+            cal, reach, lambda: floor(num_items), top, num_items, base,
+            keep_prefixes if nutrients is not None else None,
+            target_count if unfiltered else None,
+            role_pruning,
+            lambda: worst(num_items)
+        )
+        for hits, totals in blocks:
+            if deadline is not None and monotonic() > deadline:
+                raise SearchDeadlineExceeded(_winners(best_hits, n))
+            if stats is not None:
+                stats['evaluated'] = stats.get('evaluated', 0) + len(hits)
+
+            above = totals >= floor(num_items)
+            if after is not None and num_items == after[1]:
+                # Same total and size as the cursor: only lexicographically later indexes
+                above &= (totals < after[0]) | _lex_greater(hits, after[2])
+            hits, totals = hits[above], totals[above]
+            if rules is not None:
+                keep = _follows_rules(hits, roles, rules, fixed_mask)
+                hits, totals = hits[keep], totals[keep]
+            if nutrients is not None:
+                sums = amounts[:, hits].sum(axis=2)
+                keep = ((sums >= nutrient_low) & (sums <= nutrient_high)).all(axis=0)
+                hits, totals = hits[keep], totals[keep]
+            if accept is not None:
+                keep = np.fromiter((accept(tuple(hit)) for hit in hits.tolist()), dtype=bool, count=len(hits))
+                hits, totals = hits[keep], totals[keep]
+            if not len(hits):
+                continue
+
+            padded = np.full((len(hits), max_items), n, dtype=np.int32)
+            padded[:, :num_items] = hits
+            best_hits = np.concatenate([best_hits, padded])
+            best_totals = np.concatenate([best_totals, totals.astype(np.int64)])
+
+            # Highest total first, then fewer items, then lowest indexes
+            counts = (best_hits < n).sum(axis=1)
+            keys = [best_hits[:, col] for col in reversed(range(max_items))] + [counts, -best_totals]
+            ranking = np.lexsort(keys)[:target_count]
+            best_hits, best_totals = best_hits[ranking], best_totals[ranking]
+            if len(best_totals) == target_count:
+                worst_winner = (int(best_totals[-1]), tuple(best_hits[-1][best_hits[-1] < n].tolist()))
+
+    return _winners(best_hits, n)
+
+
+def realistic_total_counts(
+    calories: List[int], max_items: int, max_total: int, roles: Optional[Sequence[int]] = None
+) -> np.ndarray:
+    """
+    Count the realistic combinations of up to `max_items` items by total calories.
+
+    Returns an int64 array `counts` where `counts[r, t]` is the number of `r`-item
+    combinations totalling exactly `t` kcal (for t <= max_total) that pass the 150 kcal
+    substance and 80% share rules. The "at most 2 of any item" rule is not applied.
+    When `roles` (the items' role bitmasks) has any role set, only combinations that
+    follow the recommender's default `RoleRules` are counted.
+
+    Runs a bounded subset-sum DP over the items in calorie order: `ways[s][r]` counts the
+    r-item subsets of the items seen so far by total whose roles, within the ruled ones,
+    add up to `s`, so each item, taken as the largest of a meal, adds `ways[s][r - 1]`
+    shifted by its calories for every `s` it can join and that then covers the required
+    roles, restricted to the rest totals that keep it within 80% of the meal. Each step
+    is a few vector additions per role state.
+    """
+    if roles is None:
+        roles = [0] * len(calories)
+    menu_mask = 0
+    for role in roles:
+        menu_mask |= role
+    at_most_one = AT_MOST_ONE if menu_mask else 0
+    required = REQUIRED & menu_mask
+    ruled = at_most_one | required
+    states = [state for state in range(ruled + 1) if not state & ~ruled]
+
+    counts = np.zeros((max_items + 1, max_total + 1), dtype=np.int64)
+    ways = {state: np.zeros((max_items, max_total + 1), dtype=np.int64) for state in states}
+    ways[0][0, 0] = 1
+
+    for cal, role in sorted((int(c), r & ruled) for c, r in zip(calories, roles)):
+        if cal > max_total:
+            break
+        # Role states this item can join, and the state each one becomes
+        joins = [(state, state | role) for state in states if not state & role & at_most_one]
+        if cal >= 150:
+            # The largest item may be at most 4x the rest of the meal
+            rest_floor = (cal + 3) // 4
+            for state, joined in joins:
+                if joined & required != required:
+                    continue
+                for num_items in range(2, max_items + 1):
+                    counts[num_items, rest_floor + cal:] += ways[state][num_items - 1, rest_floor:max_total + 1 - cal]
+        # Larger sizes first, so an item is never added twice
+        for num_items in range(max_items - 1, 0, -1):
+            for state, joined in joins:
+                ways[joined][num_items, cal:] += ways[state][num_items - 1, :max_total + 1 - cal]
+
+    return counts
@@ -0,0 +1,76 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .meal_recommender import NUTRIENTS, CompactMenu
+from .models import MenuItem
+
+logger = logging.getLogger(__name__)
+
+
+class MenuCache:
+    """
+    In-process LRU cache of compact per-restaurant menus.
+
+    Entries are keyed by restaurant and remember the menu_version they were loaded at;
+    a lookup with a newer version reloads the menu. Memory is bounded by the total number
+    of menu items held, evicting the least recently used menus first.
+    """
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._entries = OrderedDict()  # restaurant id -> (menu_version, CompactMenu)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, restaurant):
+        with self._lock:
+            entry = self._entries.get(restaurant.id)
+            if entry is not None and entry[0] == restaurant.menu_version:
+                self._entries.move_to_end(restaurant.id)
+                return entry[1]
+
+        # The restaurant row was read before the menu, so the rows are at least as new as
+        # its menu_version; a later bump just triggers another reload.
+        rows = MenuItem.objects.filter(restaurant=restaurant, is_active=True).order_by("id").values_list(
+            "id", "name", "calories", "roles", *NUTRIENTS
+        )
+        ids, names, calories, roles, *amounts = zip(*rows) if rows else ((),) * (4 + len(NUTRIENTS))
+        menu = CompactMenu(ids, names, calories, roles, dict(zip(NUTRIENTS, amounts)))
+
+        with self._lock:
+            previous = self._entries.pop(restaurant.id, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+            if len(menu) <= self.max_items:
+                self._entries[restaurant.id] = (restaurant.menu_version, menu)
+                self._size += len(menu)
+            while self._size > self.max_items:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return menu
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+_menu_cache = None
+_menu_cache_lock = threading.Lock()
+
+
+def get_menu(restaurant):
+    """The restaurant's current menu as a CompactMenu, from the process-wide cache."""
+    global _menu_cache
+    with _menu_cache_lock:
+        if _menu_cache is None:
+            _menu_cache = MenuCache(settings.MEAL_MENU_CACHE_MAX_ITEMS)
+    return _menu_cache.get(restaurant)
+
+
+def clear_menu_cache():
+    if _menu_cache is not None:
+        _menu_cache.clear()
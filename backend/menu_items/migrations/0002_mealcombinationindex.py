@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 02:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu_items', '0001_initial'),
+        ('restaurants', '0002_restaurant_menu_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealCombinationIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('menu_version', models.PositiveIntegerField()),
+                ('max_items', models.PositiveSmallIntegerField()),
+                ('bucket_width', models.PositiveIntegerField()),
+                ('bucket_size', models.PositiveIntegerField()),
+                ('max_calories', models.PositiveIntegerField()),
+                ('buckets', models.JSONField(default=dict)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='meal_index', to='restaurants.restaurant')),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+from menu_items.roles import classify_menu_item
+
+
+def classify_existing_items(apps, schema_editor):
+    MenuItem = apps.get_model('menu_items', 'MenuItem')
+    items = list(MenuItem.objects.only('id', 'name', 'calories'))
+    for item in items:
+        item.roles = classify_menu_item(item.name, item.calories)
+    MenuItem.objects.bulk_update(items, ['roles'], batch_size=1000)
+
+    # Cached recommendations and meal indexes were built without role rules
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    Restaurant.objects.filter(id__in=MenuItem.objects.values('restaurant_id')).update(
+        menu_version=models.F('menu_version') + 1
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu_items', '0002_mealcombinationindex'),
+        ('restaurants', '0002_restaurant_menu_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='roles',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(classify_existing_items, migrations.RunPython.noop),
+    ]
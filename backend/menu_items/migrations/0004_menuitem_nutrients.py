@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu_items', '0003_menuitem_roles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='carbohydrate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='fat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='protein',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='sodium',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu_items', '0004_menuitem_nutrients'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu_items', '0005_menuitem_soft_retire'),
+        ('restaurants', '0003_restaurant_menu_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuIngestionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'PENDING'), ('running', 'RUNNING'), ('done', 'DONE'), ('failed', 'FAILED')], default='running', max_length=20)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MenuIngestionProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'PENDING'), ('running', 'RUNNING'), ('done', 'DONE'), ('failed', 'FAILED')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('result', models.JSONField(default=dict)),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='restaurants.restaurant')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='menu_items.menuingestionrun')),
+            ],
+            options={
+                'unique_together': {('run', 'restaurant')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MenuIngestionPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.PositiveIntegerField()),
+                ('menu_items', models.JSONField(default=list)),
+                ('progress', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='menu_items.menuingestionprogress')),
+            ],
+            options={
+                'unique_together': {('progress', 'page')},
+            },
+        ),
+    ]
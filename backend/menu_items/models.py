@@ -1,18 +1,57 @@
+import hashlib
+import json
 import logging
+from datetime import timedelta
+from enum import Enum
+from typing import NamedTuple
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.utils.timezone import now
 
 from restaurants.models import Restaurant
 
+from .meal_recommender import NUTRIENTS, build_calorie_buckets, find_meal_combinations_from_buckets
+from .roles import classify_menu_item
+
 
 logger = logging.getLogger(__name__)
 
+# MenuItem columns that come from FatSecret
+MENU_ITEM_DATA_FIELDS = ["calories", "fatsecret_food_id", "roles", *NUTRIENTS]
+
+# Everything an upsert may change: the data, and reactivating a retired item
+MENU_ITEM_SYNC_FIELDS = [*MENU_ITEM_DATA_FIELDS, "is_active", "deactivated_at"]
+
+# Rows per INSERT ... ON CONFLICT statement when upserting menu items
+UPSERT_BATCH_SIZE = 500
+
+
+class MenuItemUpdateCounts(NamedTuple):
+    inserted: int
+    updated: int
+    unchanged: int
+    retired: int = 0
+
+    @property
+    def changed(self):
+        return self.inserted + self.updated + self.retired
+
 
 class MenuItem(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     calories = models.IntegerField()
     fatsecret_food_id = models.CharField(max_length=50, unique=True, null=True, blank=True)
+    # Bitmask of roles (entrée, side, drink, ...) from menu_items.roles, set at ingestion
+    roles = models.PositiveSmallIntegerField(default=0)
+    # Per default serving, from FatSecret; null when FatSecret does not list them
+    protein = models.FloatField(null=True, blank=True)  # g
+    carbohydrate = models.FloatField(null=True, blank=True)  # g
+    fat = models.FloatField(null=True, blank=True)  # g
+    sodium = models.FloatField(null=True, blank=True)  # mg
+    is_active = models.BooleanField(default=True)  # False once the item drops off the restaurant's menu
+    deactivated_at = models.DateTimeField(null=True, blank=True)  # Timestamp when it was retired
 
     class Meta:
         unique_together = ("restaurant", "name")
@@ -21,20 +60,336 @@ class MenuItem(models.Model):
         return f"{self.name} ({self.calories} cal) - {self.restaurant.name}"
 
     @classmethod
-    def update_menu_items(cls, restaurant, menu_items):
-        """Update or create menu items for a given restaurant, storing FatSecret food ID."""
-        logger.info(f"Updating menu items for {restaurant.name}")
+    def parse_menu_items(cls, restaurant, menu_items):
+        """
+        Turn FatSecret foods into unsaved MenuItem objects for a restaurant, keyed by name.
+
+        Calories, nutrients and the FatSecret food ID come from the default serving (or the
+        first one), and roles are classified from the name. Foods without servings are
+        skipped; when a name repeats, the last food wins.
+        """
+        parsed = {}
         for item in menu_items:
             servings = item.get("servings", {}).get("serving", [])
             default_serving = next((s for s in servings if s.get("is_default") == "1"), servings[0] if servings else None)
             
             if default_serving:
-                cls.objects.update_or_create(
+                calories = int(float(default_serving["calories"]))
+                parsed[item["food_name"]] = cls(
                     restaurant=restaurant,
                     name=item["food_name"],
-                    defaults={
-                        "calories": int(float(default_serving["calories"])),
-                        "fatsecret_food_id": item.get("food_id"),  # Nullable for API flexibility
+                    calories=calories,
+                    fatsecret_food_id=item.get("food_id"),  # Nullable for API flexibility
+                    roles=classify_menu_item(item["food_name"], calories),
+                    **{
+                        nutrient: float(default_serving[nutrient]) if default_serving.get(nutrient) else None
+                        for nutrient in NUTRIENTS
                     },
                 )
-        logger.info(f"Finished updating menu items for {restaurant.name}")
+        return parsed
+
+    @staticmethod
+    def menu_fingerprint(menu_items):
+        """
+        Content hash of a parsed menu: SHA-256 over the sorted names and stored fields of
+        its items, so it changes exactly when syncing the menu would write something.
+        """
+        rows = sorted(
+            [item.name, *(getattr(item, field) for field in MENU_ITEM_DATA_FIELDS)] for item in menu_items
+        )
+        return hashlib.sha256(json.dumps(rows, separators=(",", ":")).encode()).hexdigest()
+
+    @classmethod
+    def update_menu_items(cls, restaurant, menu_items, complete=True):
+        """
+        Update or create menu items for a given restaurant, storing FatSecret food ID.
+
+        Takes the restaurant's whole menu of FatSecret foods (see `parse_menu_items`). When
+        its fingerprint matches the restaurant's stored menu_fingerprint, the menu is known
+        to be unchanged and the database is not touched at all. Otherwise rows whose
+        calories, nutrients, food ID or roles changed are written with a single bulk upsert
+        on (restaurant, name), in one transaction with the restaurant's menu_version bump
+        (and menu_changed_at) and the new fingerprint.
+
+        Items missing from the menu are retired rather than deleted, as saved user meals may
+        still refer to them: they are marked inactive in one bulk update, and reactivated
+        if they come back. Only active items are recommended or listed.
+
+        A menu that is not `complete` (some of its pages could not be fetched) is only
+        upserted: nothing is retired, and the stored fingerprint is cleared rather than
+        replaced, so the next complete menu is synced in full.
+
+        Returns MenuItemUpdateCounts of inserted, updated, unchanged and retired rows.
+        """
+        logger.info(f"Updating menu items for {restaurant.name}")
+        parsed = cls.parse_menu_items(restaurant, menu_items)
+        fingerprint = cls.menu_fingerprint(parsed.values())
+        if fingerprint == restaurant.menu_fingerprint:
+            logger.info(f"Menu of {restaurant.name} is unchanged, skipping")
+            return MenuItemUpdateCounts(0, 0, len(parsed))
+
+        with transaction.atomic():
+            existing = {item.name: item for item in cls.objects.filter(restaurant=restaurant, name__in=parsed)}
+            inserted, updated, unchanged = [], [], 0
+            for name, menu_item in parsed.items():
+                current = existing.get(name)
+                if current is None:
+                    inserted.append(menu_item)
+                elif any(getattr(current, field) != getattr(menu_item, field) for field in MENU_ITEM_SYNC_FIELDS):
+                    updated.append(menu_item)
+                else:
+                    unchanged += 1
+
+            if inserted or updated:
+                cls.objects.bulk_create(
+                    inserted + updated,
+                    batch_size=UPSERT_BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=["restaurant", "name"],
+                    update_fields=MENU_ITEM_SYNC_FIELDS,
+                )
+            retired = 0
+            if complete:
+                retired = cls.objects.filter(restaurant=restaurant, is_active=True).exclude(name__in=parsed).update(
+                    is_active=False, deactivated_at=now()
+                )
+            else:
+                fingerprint = ""
+
+            if inserted or updated or retired:
+                Restaurant.objects.filter(pk=restaurant.pk).update(
+                    menu_version=models.F("menu_version") + 1, menu_fingerprint=fingerprint, menu_changed_at=now()
+                )
+            else:
+                # The rows already match (e.g. the first fingerprinted sync): only remember it
+                Restaurant.objects.filter(pk=restaurant.pk).update(menu_fingerprint=fingerprint)
+
+        restaurant.refresh_from_db(fields=["menu_version", "menu_fingerprint", "menu_changed_at"])
+
+        counts = MenuItemUpdateCounts(len(inserted), len(updated), unchanged, retired)
+        logger.info(
+            f"Finished updating menu items for {restaurant.name} ({counts.inserted} inserted, "
+            f"{counts.updated} updated, {counts.unchanged} unchanged, {counts.retired} retired)"
+        )
+        return counts
+
+
+class MealCombinationIndex(models.Model):
+    """
+    Precomputed meal combinations for one restaurant, bucketed by total calories.
+
+    `buckets` maps the top of each calorie bucket (a multiple of `bucket_width`) to its
+    best combinations, ranked best first, as `[total_calories, [menu item ids]]` pairs.
+    The index is only valid while `menu_version` matches the restaurant's.
+    """
+    restaurant = models.OneToOneField(Restaurant, on_delete=models.CASCADE, related_name="meal_index")
+    menu_version = models.PositiveIntegerField()
+    max_items = models.PositiveSmallIntegerField()
+    bucket_width = models.PositiveIntegerField()
+    bucket_size = models.PositiveIntegerField()
+    max_calories = models.PositiveIntegerField()
+    buckets = models.JSONField(default=dict)
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Meal index for {self.restaurant.name} (menu v{self.menu_version})"
+
+    @classmethod
+    def rebuild(cls, restaurant):
+        """Build (or replace) the meal combination index for the restaurant's current menu."""
+        logger.info(f"Building meal combination index for {restaurant.name}")
+        menu_version = restaurant.menu_version
+        menu_data = list(
+            MenuItem.objects.filter(restaurant=restaurant, is_active=True)
+            .order_by("id")
+            .values("id", "name", "calories", "roles")
+        )
+
+        buckets = build_calorie_buckets(
+            menu_data,
+            max_calories=settings.MEAL_INDEX_MAX_CALORIES,
+            bucket_width=settings.MEAL_INDEX_BUCKET_WIDTH,
+            bucket_size=settings.MEAL_INDEX_BUCKET_SIZE,
+            backend=settings.MEAL_RECOMMENDER_BACKEND,
+        )
+        index, _ = cls.objects.update_or_create(
+            restaurant=restaurant,
+            defaults={
+                "menu_version": menu_version,
+                "max_items": 4,
+                "bucket_width": settings.MEAL_INDEX_BUCKET_WIDTH,
+                "bucket_size": settings.MEAL_INDEX_BUCKET_SIZE,
+                "max_calories": settings.MEAL_INDEX_MAX_CALORIES,
+                "buckets": buckets,
+            },
+        )
+        logger.info(f"Built meal combination index for {restaurant.name} with {len(buckets)} buckets")
+        return index
+
+    def find_meal_combinations(self, menu_items, calorie_limit, target_count=20, min_efficiency=0.7, max_items=4):
+        """
+        Look up recommendations in the index. Returns None when the index cannot answer
+        the query exactly and the recommender should run instead.
+        """
+        if max_items != self.max_items or calorie_limit > self.max_calories:
+            return None
+
+        # JSON object keys come back as strings
+        buckets = {int(top): entries for top, entries in self.buckets.items()}
+        return find_meal_combinations_from_buckets(
+            buckets,
+            self.bucket_width,
+            self.bucket_size,
+            menu_items,
+            calorie_limit,
+            target_count=target_count,
+            min_efficiency=min_efficiency,
+        )
+
+
+class IngestionStatus(Enum):
+    """Status of a menu ingestion run, and of each restaurant within it."""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+INGESTION_STATUS_CHOICES = [(tag.value, tag.name) for tag in IngestionStatus]
+
+
+class MenuIngestionRun(models.Model):
+    """
+    One run of update_menu_items_task over every restaurant, with per-restaurant progress
+    in MenuIngestionProgress. A run that never finished (worker restart, revoked tasks)
+    is resumed by the next update_menu_items_task instead of starting over, once it has
+    gone stale (see `is_stale`) and while it is recent enough (see `is_resumable`).
+    """
+    status = models.CharField(max_length=20, choices=INGESTION_STATUS_CHOICES, default=IngestionStatus.RUNNING.value)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Menu ingestion run {self.id} ({self.status})"
+
+    @classmethod
+    def start(cls, restaurant_ids):
+        """Create a run with a pending progress row for each restaurant."""
+        with transaction.atomic():
+            run = cls.objects.create()
+            MenuIngestionProgress.objects.bulk_create(
+                MenuIngestionProgress(run=run, restaurant_id=restaurant_id) for restaurant_id in restaurant_ids
+            )
+        logger.info(f"Started menu ingestion run {run.id} for {len(restaurant_ids)} restaurants")
+        return run
+
+    def is_stale(self):
+        """
+        Whether none of the run's restaurants made progress (started, fetched a page or
+        finished) for MENU_INGESTION_STALE_AFTER seconds, counting from the run's start, so
+        its workers are taken to be gone.
+        """
+        heartbeat = self.progress.aggregate(heartbeat=models.Max("heartbeat_at"))["heartbeat"]
+        last_activity = max(heartbeat, self.started_at) if heartbeat else self.started_at
+        return now() - last_activity > timedelta(seconds=settings.MENU_INGESTION_STALE_AFTER)
+
+    def is_resumable(self):
+        """Whether the run started less than MENU_INGESTION_RESUME_MAX_AGE seconds ago."""
+        return now() - self.started_at < timedelta(seconds=settings.MENU_INGESTION_RESUME_MAX_AGE)
+
+    def abandon(self):
+        """
+        Give up on a run too old to resume: drop its page checkpoints, fail the restaurants
+        it never finished and the run itself.
+        """
+        with transaction.atomic():
+            MenuIngestionPage.objects.filter(progress__run=self).delete()
+            self.progress.filter(status__in=[IngestionStatus.PENDING.value, IngestionStatus.RUNNING.value]).update(
+                status=IngestionStatus.FAILED.value, error="Abandoned with its run", finished_at=now()
+            )
+            self.status = IngestionStatus.FAILED.value
+            self.finished_at = now()
+            self.save(update_fields=["status", "finished_at"])
+        logger.info(f"Abandoned menu ingestion run {self.id}")
+
+    def finish(self):
+        """Mark the run done, or failed if any of its restaurants failed."""
+        failed = self.progress.filter(status=IngestionStatus.FAILED.value).exists()
+        self.status = (IngestionStatus.FAILED if failed else IngestionStatus.DONE).value
+        self.finished_at = now()
+        self.save(update_fields=["status", "finished_at"])
+
+
+class MenuIngestionProgress(models.Model):
+    """
+    Checkpoint of one restaurant's menu update within a MenuIngestionRun.
+
+    The menu pages fetched so far are saved as MenuIngestionPage rows, one per page as it
+    arrives, so a retried update only fetches the pages it is missing. They are deleted
+    once the menu has been stored. `heartbeat_at` moves on with every step of the update.
+    """
+    run = models.ForeignKey(MenuIngestionRun, on_delete=models.CASCADE, related_name="progress")
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=INGESTION_STATUS_CHOICES, default=IngestionStatus.PENDING.value)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(default=dict)  # Upsert counts of update_restaurant_menu_task
+    error = models.TextField(blank=True, default="")
+    started_at = models.DateTimeField(null=True, blank=True)  # Start of the first attempt
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Last time the update made progress
+
+    class Meta:
+        unique_together = ("run", "restaurant")
+
+    def __str__(self):
+        return f"{self.restaurant.name} in menu ingestion run {self.run_id} ({self.status})"
+
+    def start(self):
+        self.status = IngestionStatus.RUNNING.value
+        self.attempts += 1
+        self.started_at = self.started_at or now()
+        self.finished_at = None
+        self.heartbeat_at = now()
+        self.save(update_fields=["status", "attempts", "started_at", "finished_at", "heartbeat_at"])
+
+    def fetched_pages(self):
+        """The checkpointed pages, keyed by page number."""
+        return dict(self.pages.values_list("page", "menu_items"))
+
+    def checkpoint(self, page, menu_items):
+        """Save one fetched page; a page saved twice (e.g. by a redelivered task) is overwritten."""
+        MenuIngestionPage.objects.bulk_create(
+            [MenuIngestionPage(progress=self, page=page, menu_items=menu_items)],
+            update_conflicts=True,
+            unique_fields=["progress", "page"],
+            update_fields=["menu_items"],
+        )
+        self.heartbeat_at = now()
+        self.save(update_fields=["heartbeat_at"])
+
+    def succeed(self, result):
+        self.pages.all().delete()
+        self.status = IngestionStatus.DONE.value
+        self.result = result
+        self.error = ""
+        self.finished_at = self.heartbeat_at = now()
+        self.save(update_fields=["status", "result", "error", "finished_at", "heartbeat_at"])
+
+    def fail(self, error):
+        self.status = IngestionStatus.FAILED.value
+        self.error = error
+        self.finished_at = self.heartbeat_at = now()
+        self.save(update_fields=["status", "error", "finished_at", "heartbeat_at"])
+
+
+class MenuIngestionPage(models.Model):
+    """One FatSecret search page checkpointed by a MenuIngestionProgress, with its foods."""
+    progress = models.ForeignKey(MenuIngestionProgress, on_delete=models.CASCADE, related_name="pages")
+    page = models.PositiveIntegerField()
+    menu_items = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ("progress", "page")
+
+    def __str__(self):
+        return f"Page {self.page} of {self.progress}"
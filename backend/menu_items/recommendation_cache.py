@@ -0,0 +1,106 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+HITS_KEY = "meal_recs:hits"
+MISSES_KEY = "meal_recs:misses"
+
+
+# Meals kept per bucket entry: more than a response holds, so that limits below the
+# bucket's top can still be answered from it after dropping the meals above them
+ENTRY_SIZE = 40
+
+
+def bucket_top(calorie_limit):
+    """Top of the cache bucket holding `calorie_limit`; bucket `top` covers (top - width, top]."""
+    width = settings.MEAL_RECOMMENDATION_CACHE_BUCKET_WIDTH
+    return -(-calorie_limit // width) * width
+
+
+def entry_search(calorie_limit, min_efficiency=0.7):
+    """
+    Search arguments (calorie_limit, target_count, min_efficiency) for the meals of the
+    bucket entry holding `calorie_limit`: the best ENTRY_SIZE meals up to the bucket's top,
+    down to the lowest total any limit in the bucket accepts.
+    """
+    top = bucket_top(calorie_limit)
+    lowest_limit = top - settings.MEAL_RECOMMENDATION_CACHE_BUCKET_WIDTH + 1
+    # Half a kcal under the lowest accepted total, so float rounding cannot drop a meal
+    low = int(max(lowest_limit, 1) * min_efficiency) - 0.5
+    return top, ENTRY_SIZE, max(low, 0) / top
+
+
+def meals_within(meals, calorie_limit, target_count=20, min_efficiency=0.7):
+    """
+    The answer to a search at `calorie_limit` drawn from an entry's `meals` (found with
+    `entry_search`), or None when the entry cannot tell it exactly.
+
+    The search ranks meals the same way at any limit, so the answer is the entry's meals
+    within [calorie_limit * min_efficiency, calorie_limit], in order. That is exact once
+    it has `target_count` meals, or when the entry was not cut at ENTRY_SIZE and so holds
+    every meal in the bucket's range.
+    """
+    low = calorie_limit * min_efficiency
+    within = [
+        meal for meal in meals if low <= sum(item["calories"] for item in meal["items"]) <= calorie_limit
+    ][:target_count]
+    if len(within) < target_count and len(meals) >= ENTRY_SIZE:
+        return None
+    return within
+
+
+def cache_key(restaurant, calorie_limit):
+    """
+    Cache key for the entry of a restaurant's calorie bucket holding `calorie_limit`.
+
+    The key embeds the restaurant's menu version, so entries for an older menu are never
+    read again once `MenuItem.update_menu_items` changes its rows; they simply expire.
+    """
+    return f"meal_recs:{restaurant.id}:v{restaurant.menu_version}:{bucket_top(calorie_limit)}"
+
+
+def get_recommendations(restaurant, calorie_limit):
+    """
+    Return the cached recommendations for exactly `calorie_limit`, or None on a miss (no
+    entry for its bucket, or one that cannot answer it). Updates the hit/miss counters.
+    """
+    meals = cache.get(cache_key(restaurant, calorie_limit))
+    if meals is not None:
+        meals = meals_within(meals, calorie_limit)
+    _increment(HITS_KEY if meals is not None else MISSES_KEY)
+    return meals
+
+
+def set_recommendations(restaurant, calorie_limit, meals):
+    """Store the meals of the bucket entry holding `calorie_limit`, as found with `entry_search`."""
+    cache.set(cache_key(restaurant, calorie_limit), meals, settings.MEAL_RECOMMENDATION_CACHE_TIMEOUT)
+
+
+def get_stats():
+    """Hit/miss counters for the recommendation cache, shared by every worker."""
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else None,
+        "bucket_width": settings.MEAL_RECOMMENDATION_CACHE_BUCKET_WIDTH,
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def _increment(key):
+    # add() is a no-op when the counter exists, so concurrent workers never reset it
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr(); losing one count is fine
+        logger.debug(f"Recommendation cache counter {key} disappeared")
@@ -0,0 +1,102 @@
+"""
+Menu item roles, stored on MenuItem as a bitmask and used by the meal recommender.
+
+Items are classified once, at ingestion, from their name (and calories as a fallback).
+An item can have more than one role, e.g. a milkshake is both a drink and a dessert.
+"""
+import re
+
+ENTREE = 1
+SIDE = 2
+DRINK = 4
+DESSERT = 8
+SAUCE = 16
+
+ROLE_NAMES = {
+    ENTREE: "entree",
+    SIDE: "side",
+    DRINK: "drink",
+    DESSERT: "dessert",
+    SAUCE: "sauce",
+}
+
+# Meal rules: roles a meal may contain at most once, and roles every meal must contain
+# (only enforced when the menu has an item with that role)
+AT_MOST_ONE = DRINK
+REQUIRED = ENTREE
+
+# Unclassified items at least this heavy are treated as entrées
+ENTREE_FALLBACK_CALORIES = 350
+
+
+def _words(*words):
+    return re.compile(r"\b(?:" + "|".join(words) + r")", re.IGNORECASE)
+
+
+# Checked in the order of classify_menu_item; the first role group that matches wins.
+# Names whose head noun is a condiment are sauces, whatever else they mention ("Honey
+# Mustard Sauce", "Buffalo Ranch Dip"); other condiment words only make a sauce of a name
+# with no food word in it, as they also flavour entrées and desserts ("Honey BBQ Chicken
+# Sandwich"). The head noun ends the name, or its first part before "with" or "and".
+HEAD_SEPARATOR = re.compile(r"\s+(?:with|w/|and|&)\s+", re.IGNORECASE)
+SAUCE_HEAD_PATTERN = re.compile(
+    r"\b(?:sauce|dressing|dip|ketchup|mayo|mayonnaise|mustard|creamer|sweetener|vinaigrette|packet)s?\W*$",
+    re.IGNORECASE,
+)
+SAUCE_PATTERN = _words(
+    "sauce", "dressing", "dip\\b", "ketchup", "mayo", "mustard", "syrup", "gravy", "salsa", "ranch",
+    "creamer", "sweetener", "butter\\b", "jam\\b", "jelly", "honey\\b", "vinaigrette", "packet",
+)
+DRINK_PATTERN = _words(
+    "coffee", "latte", "tea\\b", "soda", "cola", "coke", "pepsi", "sprite", "juice", "lemonade", "water",
+    "shake", "milkshake", "smoothie", "milk\\b", "frappe", "frappuccino", "espresso", "cappuccino",
+    "mocha", "americano", "macchiato", "drink", "beverage", "refresher", "slush", "chocolate milk",
+)
+DESSERT_PATTERN = _words(
+    "cookie", "brownie", "pie\\b", "sundae", "ice cream", "mcflurry", "cake", "donut", "doughnut",
+    "muffin", "churro", "pudding", "cone\\b", "dessert", "shake", "milkshake", "frosty", "blizzard",
+    "cinnamon roll", "parfait", "cheesecake",
+)
+SIDE_PATTERN = _words(
+    "fries", "fry\\b", "tots", "hash brown", "onion rings", "side", "chips", "apple slices", "coleslaw",
+    "slaw", "mashed", "corn\\b", "rice\\b", "beans", "mozzarella sticks", "breadsticks", "garlic bread",
+    "soup", "fruit cup", "yogurt",
+)
+ENTREE_PATTERN = _words(
+    "burger", "cheeseburger", "whopper", "big mac", "sandwich", "wrap", "burrito", "taco", "bowl", "pizza",
+    "salad", "nuggets", "tenders", "strips", "wings", "chicken", "sub\\b", "hot dog", "quesadilla", "platter",
+    "steak", "fish", "filet", "melt", "panini", "sliders?", "gyro", "pasta", "entree", "combo", "meal\\b",
+    "club\\b", "mcmuffin", "mcgriddles?", "biscuits and gravy", "hotcakes", "pancakes", "waffles", "omelet",
+)
+
+
+def classify_menu_item(name, calories):
+    """
+    Classify a menu item into a role bitmask from its name.
+
+    Names headed by a condiment ("Honey Mustard Sauce") are sauces. Otherwise drinks and
+    desserts come first (they can combine, as for shakes), then sides ("Side Salad"), then
+    entrées, so a condiment word in a food's name ("Peanut Butter Cookie", "Hotcakes with
+    Syrup") does not make it a sauce; only a name with no food word in it does ("Maple
+    Syrup"). Unmatched items of at least ENTREE_FALLBACK_CALORIES are taken as entrées.
+    """
+    if SAUCE_HEAD_PATTERN.search(HEAD_SEPARATOR.split(name, 1)[0]):
+        return SAUCE
+
+    roles = 0
+    if DRINK_PATTERN.search(name):
+        roles |= DRINK
+    if DESSERT_PATTERN.search(name):
+        roles |= DESSERT
+    if roles:
+        return roles
+
+    if SIDE_PATTERN.search(name):
+        return SIDE
+    if ENTREE_PATTERN.search(name):
+        return ENTREE
+    if SAUCE_PATTERN.search(name):
+        return SAUCE
+    if calories >= ENTREE_FALLBACK_CALORIES:
+        return ENTREE
+    return 0
@@ -7,3 +7,13 @@ class MenuItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = MenuItem
         fields = ('id', 'name', 'calories', 'restaurant')
+
+
+class BatchRecommendationSerializer(serializers.Serializer):
+    """Validates input for a batch of meal recommendations"""
+    restaurant_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=50
+    )
+    calorie_limits = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=5
+    )
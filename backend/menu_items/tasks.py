@@ -1,29 +1,161 @@
 import logging
-from celery import shared_task
+from celery import chord, group, shared_task
+from django.utils.timezone import now
 from api.fatsecret import FatSecretAPI
-from menu_items.models import MenuItem
+from menu_items.models import (
+    IngestionStatus,
+    MealCombinationIndex,
+    MenuIngestionProgress,
+    MenuIngestionRun,
+    MenuItem,
+    MenuItemUpdateCounts,
+)
 from restaurants.models import Restaurant
 
 logger = logging.getLogger("celery")
 
 @shared_task
 def update_menu_items_task():
-    """Fetch and store menu items for all restaurants in the database."""
+    """
+    Fetch and store menu items for all restaurants in the database.
+
+    Fans out one update_restaurant_menu_task per restaurant as a chord, so the updates
+    spread over every available worker (FatSecret requests stay under the shared rate
+    limit), and summarize_menu_updates_task reports on the run once all of them are done.
+
+    Progress is recorded in a MenuIngestionRun. If the last run never finished and has
+    gone stale (e.g. the worker restarted mid-run), it is resumed instead: only its
+    restaurants that are still pending or were interrupted are updated, each from its
+    page checkpoint. While the last run is still making progress, nothing is scheduled;
+    a run too old to resume is abandoned along with its checkpoints, and a fresh one
+    started over every restaurant.
+    """
     logger.info("update_menu_items_task started")
+    run = MenuIngestionRun.objects.filter(status=IngestionStatus.RUNNING.value).order_by("-id").first()
+    if run is not None and not run.is_stale():
+        logger.info(f"Menu ingestion run {run.id} is still running, not scheduling another")
+        return f"Menu ingestion run {run.id} is still running."
+    if run is not None and not run.is_resumable():
+        run.abandon()
+        run = None
+    if run is not None:
+        restaurant_ids = list(
+            run.progress.filter(status__in=[IngestionStatus.PENDING.value, IngestionStatus.RUNNING.value])
+            .order_by("restaurant_id")
+            .values_list("restaurant_id", flat=True)
+        )
+        logger.info(f"Resuming menu ingestion run {run.id}")
+    else:
+        restaurant_ids = list(Restaurant.objects.order_by("id").values_list("id", flat=True))
+        run = MenuIngestionRun.start(restaurant_ids)
+
+    dispatch_menu_updates(run, restaurant_ids)
+    logger.info(f"Scheduled menu updates for {len(restaurant_ids)} restaurants.")
+    return f"Scheduled menu updates for {len(restaurant_ids)} restaurants."
+
+def dispatch_menu_updates(run, restaurant_ids):
+    """
+    Update the given restaurants as part of `run`, one subtask each, and finish the run
+    once they are all done.
+    """
+    MenuIngestionRun.objects.filter(pk=run.pk).update(status=IngestionStatus.RUNNING.value, finished_at=None)
+    # Scheduling counts as progress, so the run is not taken as stale while its updates wait in the queue
+    run.progress.filter(restaurant_id__in=restaurant_ids).update(heartbeat_at=now())
+    if not restaurant_ids:
+        return summarize_menu_updates_task([], run_id=run.id)
+
+    return chord(group(update_restaurant_menu_task.s(restaurant_id, run.id) for restaurant_id in restaurant_ids))(
+        summarize_menu_updates_task.s(run_id=run.id)
+    )
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def update_restaurant_menu_task(restaurant_id, run_id=None):
+    """
+    Fetch and store one restaurant's menu items, and rebuild its meal index if the menu changed.
+
+    Failures are logged and reported in the result rather than raised, so one restaurant
+    cannot fail the whole chord. Returns a dict with the restaurant ID and either the
+    inserted/updated/unchanged/retired counts and whether the menu changed, or the error.
+    An unchanged menu (same fingerprint) costs no writes and no index rebuild. A page
+    that fails fails the restaurant; a menu cut short by FATSECRET_MAX_MENU_PAGES is
+    stored without retiring the items it lacks.
+
+    Within an ingestion run (`run_id`), every fetched page is checkpointed as a row of
+    the restaurant's MenuIngestionProgress, so a retry (or a redelivery after the worker
+    died, as the task is only acknowledged once it finishes) skips the pages it has.
+    """
+    progress = None
     try:
+        restaurant = Restaurant.objects.get(id=restaurant_id)
+        pages = {}
+        if run_id is not None:
+            progress, _ = MenuIngestionProgress.objects.get_or_create(run_id=run_id, restaurant=restaurant)
+            progress.start()
+            pages = progress.fetched_pages()
         fatsecret = FatSecretAPI()
-        for restaurant in Restaurant.objects.all():
-            page = 0
-            while True:
-                menu_items = fatsecret.get_menu_items(restaurant.name, page=page)
-                if not menu_items:
-                    break  # No more pages
-                
-                MenuItem.update_menu_items(restaurant, menu_items)
-                page += 1  # Go to next page
-
-        logger.info("Successfully updated menu items for all restaurants.")
-        return "Updated menu items for all restaurants."
+
+        # Collect the whole menu first, so it is upserted in one statement and transaction.
+        # Pages are fetched concurrently and arrive in any order; they are put back in page
+        # order so a food listed twice resolves the same way on every run.
+        for page, page_items in fatsecret.iter_menu_item_pages(restaurant.name, skip_pages=set(pages)):
+            pages[page] = page_items
+            if progress is not None:
+                progress.checkpoint(page, page_items)
+        menu_items = [item for page in sorted(pages) for item in pages[page]]
+
+        complete = restaurant.name not in fatsecret.truncated_menus
+        if menu_items:
+            counts = MenuItem.update_menu_items(restaurant, menu_items, complete=complete)
+        else:
+            counts = MenuItemUpdateCounts(0, 0, 0)
+
+        # Only rebuild the meal index when the menu changed since it was built
+        if not MealCombinationIndex.objects.filter(restaurant=restaurant, menu_version=restaurant.menu_version).exists():
+            build_meal_index_task.delay(restaurant.id)
+
+        result = {"restaurant_id": restaurant_id, "changed": counts.changed > 0, **counts._asdict()}
+        if progress is not None:
+            progress.succeed(result)
+        return result
+    except Exception as e:
+        logger.exception(f"Error updating menu items for restaurant {restaurant_id}.")
+        if progress is not None:
+            progress.fail(str(e))
+        return {"restaurant_id": restaurant_id, "error": str(e)}
+
+@shared_task
+def summarize_menu_updates_task(results, run_id=None):
+    """
+    Log and return totals over the results of one update_menu_items_task run, including
+    the IDs of the restaurants whose menus changed (their menu_version was bumped, so
+    their cached recommendations and meal indexes are the only ones invalidated), and
+    mark its MenuIngestionRun as finished.
+    """
+    failed = [result["restaurant_id"] for result in results if "error" in result]
+    succeeded = [result for result in results if "error" not in result]
+    changed = [result["restaurant_id"] for result in succeeded if result["changed"]]
+    summary = {
+        "restaurants": len(results),
+        "failed": failed,
+        "changed": changed,
+        "changed_restaurants": len(changed),
+        **{key: sum(result[key] for result in succeeded) for key in ("inserted", "updated", "unchanged", "retired")},
+    }
+    logger.info(f"Menu update finished: {summary}")
+    if failed:
+        logger.warning(f"Menu update failed for {len(failed)} restaurants: {failed}")
+    if run_id is not None:
+        MenuIngestionRun.objects.get(id=run_id).finish()
+    return summary
+
+@shared_task
+def build_meal_index_task(restaurant_id):
+    """Precompute the meal combination index for one restaurant's current menu."""
+    logger.info(f"build_meal_index_task started for restaurant {restaurant_id}")
+    try:
+        restaurant = Restaurant.objects.get(id=restaurant_id)
+        index = MealCombinationIndex.rebuild(restaurant)
+        return f"Built meal index for {restaurant.name} (menu v{index.menu_version})"
     except Exception as e:
-        logger.exception("Error updating menu items.")
+        logger.exception(f"Error building meal index for restaurant {restaurant_id}.")
         raise e
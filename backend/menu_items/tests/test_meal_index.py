@@ -0,0 +1,100 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from config.celery import app
+from menu_items.meal_recommender import (
+    build_calorie_buckets,
+    find_meal_combinations_efficient,
+    find_meal_combinations_from_buckets,
+)
+from menu_items.menu_cache import clear_menu_cache
+from menu_items.models import MealCombinationIndex, MenuItem
+from menu_items.tasks import update_menu_items_task
+from restaurants.models import DataSource, Restaurant
+
+
+MENU = [
+    {"id": 1, "name": "Burger", "calories": 500},
+    {"id": 2, "name": "Fries", "calories": 300},
+    {"id": 3, "name": "Drink", "calories": 150},
+    {"id": 4, "name": "Salad", "calories": 200},
+    {"id": 5, "name": "Dessert", "calories": 400},
+    {"id": 6, "name": "Small Fries", "calories": 200},
+]
+
+
+class CalorieBucketTests(TestCase):
+    def test_bucket_lookup_matches_search(self):
+        """Range lookups over the buckets return the same meals as a live search"""
+        buckets = build_calorie_buckets(MENU, max_calories=1500, bucket_width=25, bucket_size=20)
+
+        for calorie_limit in (500, 800, 1000, 1200):
+            expected = find_meal_combinations_efficient(MENU, calorie_limit=calorie_limit)
+            found = find_meal_combinations_from_buckets(buckets, 25, 20, MENU, calorie_limit)
+            self.assertEqual(found, expected)
+
+    def test_truncated_top_bucket_is_a_miss(self):
+        """A limit inside a full bucket cannot be answered from the index"""
+        buckets = build_calorie_buckets(MENU, max_calories=1500, bucket_width=100, bucket_size=1)
+
+        self.assertIsNotNone(find_meal_combinations_from_buckets(buckets, 100, 1, MENU, 800, target_count=1))
+        self.assertIsNone(find_meal_combinations_from_buckets(buckets, 100, 1, MENU, 790, target_count=1))
+
+    def test_unknown_item_is_a_miss(self):
+        """Combinations that reference items no longer on the menu are not served"""
+        buckets = build_calorie_buckets(MENU, max_calories=1500, bucket_width=25, bucket_size=20)
+        self.assertIsNone(find_meal_combinations_from_buckets(buckets, 25, 20, MENU[1:], 800))
+
+
+@override_settings(MEAL_INDEX_MAX_CALORIES=1500, MEAL_INDEX_BUCKET_WIDTH=25, MEAL_INDEX_BUCKET_SIZE=20)
+class MealCombinationIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_menu_cache()
+        self.restaurant = Restaurant.objects.create(name="Test Restaurant", data_source=DataSource.FATSECRET.value)
+        for item in MENU:
+            MenuItem.objects.create(restaurant=self.restaurant, name=item["name"], calories=item["calories"])
+
+    def test_view_serves_current_index(self):
+        """RecommendMealView answers from a current index without searching"""
+        MealCombinationIndex.rebuild(self.restaurant)
+        url = reverse("recommend-meal", kwargs={"restaurant_id": self.restaurant.id, "calorie_limit": 800})
+
+        with patch("menu_items.views.find_meal_combinations_efficient") as mock_search:
+            response = self.client.get(url)
+
+        mock_search.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["recommended_meals"])
+
+    def test_view_ignores_stale_index(self):
+        """An index built for an older menu version falls back to a live search"""
+        MealCombinationIndex.rebuild(self.restaurant)
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(menu_version=5)
+        url = reverse("recommend-meal", kwargs={"restaurant_id": self.restaurant.id, "calorie_limit": 800})
+
+        with patch("menu_items.views.find_meal_combinations_efficient", return_value=[]) as mock_search:
+            response = self.client.get(url)
+
+        mock_search.assert_called_once()
+        self.assertEqual(response.data["recommended_meals"], [])
+
+    @patch("menu_items.tasks.build_meal_index_task.delay")
+    @patch("menu_items.tasks.FatSecretAPI")
+    def test_task_rebuilds_only_stale_indexes(self, mock_api, mock_delay):
+        """update_menu_items_task only schedules index builds for changed menus"""
+        mock_api.return_value.iter_menu_item_pages.return_value = iter([])
+        self.addCleanup(setattr, app.conf, "task_always_eager", app.conf.task_always_eager)
+        app.conf.task_always_eager = True
+
+        update_menu_items_task()
+        mock_delay.assert_called_once_with(self.restaurant.id)
+
+        mock_delay.reset_mock()
+        MealCombinationIndex.rebuild(self.restaurant)
+        update_menu_items_task()
+        mock_delay.assert_not_called()
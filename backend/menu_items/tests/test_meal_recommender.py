@@ -1,5 +1,14 @@
+from itertools import combinations
+
 from django.test import TestCase
-from ..meal_recommender import find_meal_combinations_efficient, is_realistic_combination
+from ..meal_recommender import (
+    CompactMenu,
+    find_meal_combinations_anytime,
+    find_meal_combinations_efficient,
+    is_realistic_combination,
+    iter_meal_combinations,
+)
+from ..roles import DESSERT, DRINK, ENTREE, SIDE
 
 class MealRecommenderTests(TestCase):
     def setUp(self):
@@ -81,4 +90,290 @@ class MealRecommenderTests(TestCase):
             self.test_menu_items,
             calorie_limit=100
         )
-        self.assertEqual(combinations, []) 
\ No newline at end of file
+        self.assertEqual(combinations, []) 
+
+    def test_results_are_deterministic(self):
+        """Test that repeated searches return identical recommendations"""
+        first = find_meal_combinations_efficient(self.test_menu_items, calorie_limit=900)
+        second = find_meal_combinations_efficient(self.test_menu_items, calorie_limit=900)
+        self.assertEqual(first, second)
+
+    def test_matches_exhaustive_search(self):
+        """Test that pruning never loses a combination an exhaustive search would find"""
+        menu_items = [
+            {"id": i, "name": f"Item {i}", "calories": calories}
+            for i, calories in enumerate([90, 120, 150, 180, 210, 260, 320, 380, 450, 520, 610, 700])
+        ]
+        calorie_limit, min_efficiency = 1000, 0.7
+
+        expected = set()
+        for num_items in range(1, 5):
+            for combo in combinations(menu_items, num_items):
+                total = sum(item['calories'] for item in combo)
+                if calorie_limit * min_efficiency <= total <= calorie_limit and is_realistic_combination(list(combo)):
+                    expected.add(frozenset(item['id'] for item in combo))
+
+        found = find_meal_combinations_efficient(
+            menu_items,
+            calorie_limit=calorie_limit,
+            target_count=len(expected),
+            min_efficiency=min_efficiency
+        )
+        found_ids = [frozenset(item['id'] for item in combo['items']) for combo in found]
+
+        self.assertTrue(len(found_ids) > 0)
+        self.assertEqual(len(found_ids), len(set(found_ids)))
+        self.assertEqual(set(found_ids), expected)
+
+        totals = [sum(item['calories'] for item in combo['items']) for combo in found]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+
+    def test_returns_true_top_k(self):
+        """Test that the best combinations are returned, not just the first ones found"""
+        menu_items = [
+            {"id": i, "name": f"Item {i}", "calories": (i * 53) % 700 + 100}
+            for i in range(25)
+        ]
+        calorie_limit, target_count = 1100, 10
+
+        ranked = []
+        for num_items in range(1, 5):
+            for combo in combinations(menu_items, num_items):
+                total = sum(item['calories'] for item in combo)
+                if calorie_limit * 0.7 <= total <= calorie_limit and is_realistic_combination(list(combo)):
+                    ranked.append((-total, num_items))
+        ranked.sort()
+
+        found = find_meal_combinations_efficient(menu_items, calorie_limit=calorie_limit, target_count=target_count)
+        found_keys = [(-sum(item['calories'] for item in combo['items']), len(combo['items'])) for combo in found]
+        self.assertEqual(found_keys, ranked[:target_count])
+
+    def test_numpy_backend_matches_python_backend(self):
+        """Test that the vectorized backend returns exactly the pure-Python results"""
+        menu_items = [
+            {"id": i, "name": f"Item {i}", "calories": (i * 137) % 900}
+            for i in range(60)
+        ]
+        for calorie_limit in (400, 800, 1500):
+            for max_items in (2, 3, 4):
+                python_result = find_meal_combinations_efficient(
+                    menu_items, calorie_limit=calorie_limit, max_items=max_items
+                )
+                numpy_result = find_meal_combinations_efficient(
+                    menu_items, calorie_limit=calorie_limit, max_items=max_items, backend='numpy'
+                )
+                self.assertEqual(python_result, numpy_result)
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend is rejected"""
+        with self.assertRaises(ValueError):
+            find_meal_combinations_efficient(self.test_menu_items, calorie_limit=800, backend='fortran')
+
+    def test_iter_meal_combinations_resumes_from_cursor(self):
+        """Test that the generator yields the full ranking and can resume from any cursor"""
+        menu_items = [
+            {"id": i, "name": f"Item {i}", "calories": (i * 71) % 600 + 50}
+            for i in range(30)
+        ]
+        expected = find_meal_combinations_efficient(menu_items, calorie_limit=900, target_count=200)
+
+        streamed = list(iter_meal_combinations(menu_items, calorie_limit=900, batch_size=7))[:200]
+        self.assertEqual([meal for _, meal in streamed], expected)
+
+        for backend in ('python', 'numpy'):
+            cursor = streamed[41][0]
+            resumed = iter_meal_combinations(menu_items, calorie_limit=900, after=cursor, backend=backend)
+            self.assertEqual([meal for _, meal in resumed][:50], expected[42:92])
+
+    def test_anytime_search_within_budget(self):
+        """Test that an ample budget gives the complete results"""
+        for backend in ('python', 'numpy'):
+            meals, partial = find_meal_combinations_anytime(
+                self.test_menu_items, calorie_limit=800, budget=60, backend=backend
+            )
+            self.assertFalse(partial)
+            self.assertEqual(meals, find_meal_combinations_efficient(self.test_menu_items, calorie_limit=800))
+
+    def test_anytime_search_out_of_budget(self):
+        """Test that an exhausted budget returns valid best-so-far results marked as partial"""
+        menu_items = [
+            {"id": i, "name": f"Item {i}", "calories": (i * 97) % 1200}
+            for i in range(300)
+        ]
+        for backend in ('python', 'numpy'):
+            meals, partial = find_meal_combinations_anytime(menu_items, calorie_limit=1000, budget=0, backend=backend)
+            self.assertTrue(partial)
+            for meal in meals:
+                total = sum(item['calories'] for item in meal['items'])
+                self.assertTrue(700 <= total <= 1000)
+                self.assertTrue(is_realistic_combination(meal['items']))
+
+    def test_search_stats(self):
+        """Test that the search reports how many candidate combinations it evaluated"""
+        for backend in ('python', 'numpy'):
+            stats = {}
+            meals = find_meal_combinations_efficient(
+                self.test_menu_items, calorie_limit=800, backend=backend, stats=stats
+            )
+            self.assertGreaterEqual(stats['evaluated'], len(meals))
+
+    def test_identical_items_give_unique_meals(self):
+        """Test that repeated menu rows do not produce meals that look the same"""
+        menu_items = [
+            {"id": 1, "name": "Burger", "calories": 500},
+            {"id": 2, "name": "Fries", "calories": 300},
+            {"id": 3, "name": "Burger", "calories": 500},
+            {"id": 4, "name": "Drink", "calories": 150},
+            {"id": 5, "name": "Fries", "calories": 300},
+        ]
+        for backend in ('python', 'numpy'):
+            stats = {}
+            meals = find_meal_combinations_efficient(menu_items, calorie_limit=1000, backend=backend, stats=stats)
+            signatures = [tuple(sorted(item['name'] for item in meal['items'])) for meal in meals]
+
+            self.assertEqual(len(signatures), len(set(signatures)))
+            self.assertIn(('Burger', 'Burger'), signatures)
+            self.assertIn(('Burger', 'Fries'), signatures)
+            self.assertGreater(stats['duplicates'], 0)
+
+    def test_items_differing_in_nutrients_are_not_copies(self):
+        """Test that rows with the same name and calories but other amounts are searched apart"""
+        menu_items = [
+            {"id": 1, "name": "Burger", "calories": 500, "protein": 10, "roles": ENTREE},
+            {"id": 2, "name": "Burger", "calories": 500, "protein": 30, "roles": ENTREE},
+            {"id": 3, "name": "Fries", "calories": 300, "protein": 5, "roles": SIDE},
+        ]
+        compact = CompactMenu(
+            [1, 2, 3], ["Burger", "Burger", "Fries"], [500, 500, 300], [ENTREE, ENTREE, SIDE],
+            {'protein': [10, 30, 5]}
+        )
+        for menu in (menu_items, compact):
+            for backend in ('python', 'numpy'):
+                meals = find_meal_combinations_efficient(
+                    menu, calorie_limit=900, backend=backend, nutrient_limits={'protein': (20, None)}
+                )
+                self.assertEqual([[item['id'] for item in meal['items']] for meal in meals], [[2, 3]])
+
+    def test_include_and_exclude(self):
+        """Test that constraints match filtering an unconstrained search"""
+        menu_items = [
+            {"id": i, "name": f"Item {i}", "calories": (i * 83) % 650 + 40}
+            for i in range(20)
+        ]
+        everything = find_meal_combinations_efficient(menu_items, calorie_limit=1000, target_count=5000)
+        for backend in ('python', 'numpy'):
+            meals = find_meal_combinations_efficient(
+                menu_items, calorie_limit=1000, target_count=5000, include=[3], exclude=[7, 11], backend=backend
+            )
+            expected = [
+                meal for meal in everything
+                if 3 in {item['id'] for item in meal['items']}
+                and not {7, 11} & {item['id'] for item in meal['items']}
+            ]
+            self.assertEqual(meals, expected)
+
+        with self.assertRaises(ValueError):
+            find_meal_combinations_efficient(menu_items, calorie_limit=1000, include=[99])
+
+    def test_role_rules(self):
+        """Test that meals with item roles hold one drink at most and need an entrée"""
+        menu_items = [
+            {"id": 1, "name": "Burger", "calories": 500, "roles": ENTREE},
+            {"id": 2, "name": "Fries", "calories": 300, "roles": SIDE},
+            {"id": 3, "name": "Cola", "calories": 200, "roles": DRINK},
+            {"id": 4, "name": "Lemonade", "calories": 180, "roles": DRINK},
+            {"id": 5, "name": "Shake", "calories": 450, "roles": DRINK | DESSERT},
+            {"id": 6, "name": "Cookie", "calories": 250, "roles": DESSERT},
+        ]
+        everything = find_meal_combinations_efficient(
+            [{k: v for k, v in item.items() if k != 'roles'} for item in menu_items],
+            calorie_limit=1200, target_count=5000
+        )
+        roles = {item['id']: item['roles'] for item in menu_items}
+        expected = [
+            {'items': [dict(item, roles=roles[item['id']]) for item in meal['items']]}
+            for meal in everything
+            if sum(1 for item in meal['items'] if roles[item['id']] & DRINK) <= 1
+            and any(roles[item['id']] & ENTREE for item in meal['items'])
+        ]
+        self.assertTrue(expected)
+        self.assertLess(len(expected), len(everything))
+
+        for backend in ('python', 'numpy'):
+            meals = find_meal_combinations_efficient(menu_items, calorie_limit=1200, target_count=5000, backend=backend)
+            self.assertEqual(meals, expected)
+
+            # Fixed items count towards the rules too
+            meals = find_meal_combinations_efficient(
+                menu_items, calorie_limit=1200, target_count=5000, include=[3], backend=backend
+            )
+            self.assertEqual(meals, [meal for meal in expected if 3 in {item['id'] for item in meal['items']}])
+            self.assertEqual(
+                find_meal_combinations_efficient(menu_items, calorie_limit=1200, include=[3, 4], backend=backend), []
+            )
+
+    def test_role_rules_prune_early(self):
+        """Test that prefixes which can no longer get a fitting entrée are cut before the final pick"""
+        menu_items = (
+            [{"id": i, "name": f"Side {i}", "calories": 100 + i * 5, "roles": SIDE} for i in range(40)]
+            + [{"id": 100 + i, "name": f"Cola {i}", "calories": 150 + i * 10, "roles": DRINK} for i in range(10)]
+            + [{"id": 200 + i, "name": f"Burger {i}", "calories": 450 + i * 10, "roles": ENTREE} for i in range(5)]
+        )
+        for backend in ('python', 'numpy'):
+            # Every entrée is over 80% of any meal within 500 kcal
+            stats = {}
+            meals = find_meal_combinations_efficient(menu_items, calorie_limit=500, backend=backend, stats=stats)
+            self.assertEqual(meals, [])
+            self.assertEqual(stats.get('evaluated', 0), 0)
+
+            meals = find_meal_combinations_efficient(menu_items, calorie_limit=900, backend=backend)
+            self.assertEqual(len(meals), 20)
+            for meal in meals:
+                self.assertTrue(any(item['roles'] & ENTREE for item in meal['items']))
+
+    def test_nutrient_limits(self):
+        """Test that nutrient limits match filtering an unconstrained search"""
+        menu_items = [
+            {"id": i, "name": f"Item {i}", "calories": (i * 83) % 650 + 40, "protein": (i * 7) % 30, "fat": i % 9 + 0.5}
+            for i in range(20)
+        ]
+        everything = find_meal_combinations_efficient(menu_items, calorie_limit=1000, target_count=5000)
+        expected = [
+            meal for meal in everything
+            if sum(item['protein'] for item in meal['items']) >= 45
+            and sum(item['fat'] for item in meal['items']) <= 15
+        ]
+        self.assertTrue(expected)
+        for backend in ('python', 'numpy'):
+            meals = find_meal_combinations_efficient(
+                menu_items, calorie_limit=1000, target_count=5000, backend=backend,
+                nutrient_limits={'protein': (45, None), 'fat': (None, 15)}
+            )
+            self.assertEqual(meals, expected)
+
+        with self.assertRaises(ValueError):
+            find_meal_combinations_efficient(menu_items, calorie_limit=1000, nutrient_limits={'fibre': (5, None)})
+
+    def test_nutrient_limits_skip_unknown_amounts(self):
+        """Test that items of unknown amount are left out of meals limited on that nutrient"""
+        menu_items = [
+            {"id": 1, "name": "Burger", "calories": 500, "sodium": 900},
+            {"id": 2, "name": "Fries", "calories": 300, "sodium": None},
+            {"id": 3, "name": "Salad", "calories": 250, "sodium": 300},
+            {"id": 4, "name": "Shake", "calories": 400},
+        ]
+        compact = CompactMenu(
+            [item["id"] for item in menu_items], [item["name"] for item in menu_items],
+            [item["calories"] for item in menu_items], nutrients={'sodium': [900, None, 300, None]}
+        )
+        for menu in (menu_items, compact):
+            for backend in ('python', 'numpy'):
+                meals = find_meal_combinations_efficient(
+                    menu, calorie_limit=1000, backend=backend, nutrient_limits={'sodium': (None, 1500)}
+                )
+                self.assertEqual([sorted(item['id'] for item in meal['items']) for meal in meals], [[1, 3]])
+                # Including an item of unknown amount leaves no meal within the limit
+                meals = find_meal_combinations_efficient(
+                    menu, calorie_limit=1000, backend=backend, include=[2], nutrient_limits={'sodium': (None, 1500)}
+                )
+                self.assertEqual(meals, [])
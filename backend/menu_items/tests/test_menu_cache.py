@@ -0,0 +1,69 @@
+from django.test import TestCase
+
+from menu_items.meal_recommender import CompactMenu, find_meal_combinations_efficient
+from menu_items.menu_cache import MenuCache
+from menu_items.models import MenuItem
+from restaurants.models import DataSource, Restaurant
+
+
+class MenuCacheTests(TestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(name="Burgers", data_source=DataSource.FATSECRET.value)
+        self.burger = MenuItem.objects.create(restaurant=self.restaurant, name="Burger", calories=500)
+        self.fries = MenuItem.objects.create(restaurant=self.restaurant, name="Fries", calories=300)
+
+    def test_hit_skips_database(self):
+        """A cached menu is served without querying while its version is current"""
+        menu_cache = MenuCache(max_items=100)
+        menu = menu_cache.get(self.restaurant)
+        self.assertEqual(list(menu.ids), [self.burger.id, self.fries.id])
+        self.assertEqual(menu.names, ("Burger", "Fries"))
+        self.assertEqual(list(menu.calories), [500, 300])
+
+        with self.assertNumQueries(0):
+            self.assertIs(menu_cache.get(self.restaurant), menu)
+
+    def test_refresh_on_new_menu_version(self):
+        """A newer menu version reloads the menu"""
+        menu_cache = MenuCache(max_items=100)
+        menu_cache.get(self.restaurant)
+
+        MenuItem.objects.create(restaurant=self.restaurant, name="Drink", calories=150)
+        self.restaurant.menu_version += 1
+        self.assertEqual(len(menu_cache.get(self.restaurant)), 3)
+
+    def test_evicts_least_recently_used(self):
+        """The total number of cached items stays within the bound"""
+        other = Restaurant.objects.create(name="Tacos", data_source=DataSource.FATSECRET.value)
+        MenuItem.objects.create(restaurant=other, name="Taco", calories=200)
+        MenuItem.objects.create(restaurant=other, name="Chips", calories=250)
+
+        menu_cache = MenuCache(max_items=3)
+        menu_cache.get(self.restaurant)
+        menu_cache.get(other)
+
+        with self.assertNumQueries(0):
+            menu_cache.get(other)
+        with self.assertNumQueries(1):
+            menu_cache.get(self.restaurant)
+
+
+class CompactMenuTests(TestCase):
+    def test_recommends_like_dict_menu(self):
+        """The recommender gives the same results for a compact menu and a list of dicts"""
+        menu_items = [
+            {"id": i + 1, "name": f"Item {i % 7}", "calories": (i * 89) % 700 + 20}
+            for i in range(30)
+        ]
+        menu = CompactMenu(
+            [item["id"] for item in menu_items],
+            [item["name"] for item in menu_items],
+            [item["calories"] for item in menu_items],
+        )
+        for backend in ('python', 'numpy'):
+            self.assertEqual(
+                find_meal_combinations_efficient(menu, calorie_limit=900, backend=backend),
+                find_meal_combinations_efficient(menu_items, calorie_limit=900, backend=backend),
+            )
+        self.assertEqual(menu.position_of(3), 2)
+        self.assertIsNone(menu.position_of(999))
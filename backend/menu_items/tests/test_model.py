@@ -1,5 +1,6 @@
 from django.test import TestCase
 from menu_items.models import MenuItem
+from menu_items.roles import ENTREE
 from restaurants.models import DataSource, Restaurant
 
 
@@ -10,7 +11,7 @@ class MenuItemModelTest(TestCase):
             {
                 "food_name": "Test Burger",
                 "servings": {
-                    "serving": [{"is_default": "1", "calories": "500"}]
+                    "serving": [{"is_default": "1", "calories": "500", "protein": "25.00", "sodium": "1040"}]
                 }
             },
             {
@@ -39,4 +40,80 @@ class MenuItemModelTest(TestCase):
         """Test that menu items without servings are ignored."""
         invalid_items = [{"food_name": "No Serving Item", "servings": {"serving": []}}]
         MenuItem.update_menu_items(self.restaurant, invalid_items)
-        self.assertFalse(MenuItem.objects.filter(name="No Serving Item").exists()) 
\ No newline at end of file
+        self.assertFalse(MenuItem.objects.filter(name="No Serving Item").exists()) 
+
+    def test_update_menu_items_bumps_menu_version_only_on_change(self):
+        """Test that menu_version changes only when rows are actually written."""
+        self.assertEqual(MenuItem.update_menu_items(self.restaurant, self.menu_items).changed, 2)
+        self.assertEqual(self.restaurant.menu_version, 1)
+
+        self.assertEqual(MenuItem.update_menu_items(self.restaurant, self.menu_items).changed, 0)
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.menu_version, 1)
+
+    def test_update_menu_items_reports_counts(self):
+        """Test that inserted, updated and unchanged rows are counted, with one upsert for all writes."""
+        MenuItem.objects.create(restaurant=self.restaurant, name="Test Salad", calories=150)
+        menu_items = self.menu_items + [
+            {"food_name": "Test Fries", "servings": {"serving": [{"is_default": "1", "calories": "350"}]}},
+        ]
+        # Savepoint, select, one upsert, retire, version bump, release, version refresh
+        with self.assertNumQueries(7):
+            counts = MenuItem.update_menu_items(self.restaurant, menu_items)
+        self.assertEqual(counts, (2, 1, 0, 0))
+
+        counts = MenuItem.update_menu_items(self.restaurant, menu_items)
+        self.assertEqual((counts.inserted, counts.updated, counts.unchanged), (0, 0, 3))
+        self.assertEqual(MenuItem.objects.get(name="Test Salad").calories, 200)
+
+    def test_update_menu_items_classifies_roles(self):
+        """Test that item roles are set at ingestion and updated when they change."""
+        MenuItem.objects.create(restaurant=self.restaurant, name="Test Salad", calories=200)
+        MenuItem.update_menu_items(self.restaurant, self.menu_items)
+        self.assertEqual(MenuItem.objects.get(name="Test Burger").roles, ENTREE)
+        self.assertEqual(MenuItem.objects.get(name="Test Salad").roles, ENTREE)
+
+    def test_update_menu_items_stores_nutrients(self):
+        """Test that nutrients of the default serving are stored, and missing ones left null."""
+        MenuItem.update_menu_items(self.restaurant, self.menu_items)
+        burger = MenuItem.objects.get(name="Test Burger")
+        self.assertEqual((burger.protein, burger.sodium, burger.fat), (25.0, 1040.0, None))
+
+        self.menu_items[0]["servings"]["serving"][0]["protein"] = "27.5"
+        self.assertEqual(MenuItem.update_menu_items(self.restaurant, self.menu_items).changed, 1)
+        self.assertEqual(MenuItem.objects.get(name="Test Burger").protein, 27.5)
+
+    def test_update_menu_items_skips_unchanged_menu(self):
+        """Test that a menu matching the stored fingerprint is not written or even read again."""
+        MenuItem.update_menu_items(self.restaurant, self.menu_items)
+        fingerprint = self.restaurant.menu_fingerprint
+        self.assertTrue(fingerprint)
+        self.assertIsNotNone(self.restaurant.menu_changed_at)
+
+        with self.assertNumQueries(0):
+            counts = MenuItem.update_menu_items(self.restaurant, list(reversed(self.menu_items)))
+        self.assertEqual(counts, (0, 0, 2, 0))
+
+        self.menu_items[1]["servings"]["serving"][0]["calories"] = "220"
+        self.assertEqual(MenuItem.update_menu_items(self.restaurant, self.menu_items).updated, 1)
+        self.assertNotEqual(self.restaurant.menu_fingerprint, fingerprint)
+        self.assertEqual(self.restaurant.menu_version, 2)
+
+    def test_update_menu_items_retires_missing_items(self):
+        """Test that items dropped from the menu are retired, and reactivated when they return."""
+        MenuItem.update_menu_items(self.restaurant, self.menu_items)
+        salad = MenuItem.objects.get(name="Test Salad")
+
+        counts = MenuItem.update_menu_items(self.restaurant, self.menu_items[:1])
+        self.assertEqual((counts.retired, counts.changed), (1, 1))
+        self.assertEqual(self.restaurant.menu_version, 2)
+        salad.refresh_from_db()
+        self.assertFalse(salad.is_active)
+        self.assertIsNotNone(salad.deactivated_at)
+        self.assertTrue(MenuItem.objects.get(name="Test Burger").is_active)
+
+        counts = MenuItem.update_menu_items(self.restaurant, self.menu_items)
+        self.assertEqual(counts, (0, 1, 1, 0))
+        self.assertEqual(self.restaurant.menu_version, 3)
+        salad.refresh_from_db()
+        self.assertEqual((salad.is_active, salad.deactivated_at), (True, None))
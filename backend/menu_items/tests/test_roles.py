@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase
+
+from ..roles import DESSERT, DRINK, ENTREE, SAUCE, SIDE, classify_menu_item
+
+
+class ClassifyMenuItemTests(SimpleTestCase):
+    def test_classifies_by_name(self):
+        cases = {
+            "Big Mac": ENTREE,
+            "Steak Burrito Bowl": ENTREE,
+            "Egg McMuffin": ENTREE,
+            "Sausage McGriddle": ENTREE,
+            "Large French Fries": SIDE,
+            "Side Salad": SIDE,
+            "Medium Sweet Tea": DRINK,
+            "Apple Pie": DESSERT,
+            "Chocolate Shake": DRINK | DESSERT,
+            "Honey Mustard Sauce": SAUCE,
+            "Ranch Dressing": SAUCE,
+            "Sweet and Sour Sauce": SAUCE,
+            "Maple Syrup": SAUCE,
+            "Coffee Creamer": SAUCE,
+        }
+        for name, roles in cases.items():
+            with self.subTest(name=name):
+                self.assertEqual(classify_menu_item(name, 300), roles)
+
+    def test_condiment_words_in_food_names(self):
+        """Foods flavoured with a condiment are not sauces"""
+        cases = {
+            "Honey BBQ Chicken Sandwich": ENTREE,
+            "Butter Chicken Bowl": ENTREE,
+            "Biscuits and Gravy": ENTREE,
+            "Chicken Ranch Club": ENTREE,
+            "Salsa Verde Chicken Burrito": ENTREE,
+            "Honey Mustard Chicken Tenders": ENTREE,
+            "Hotcakes with Syrup": ENTREE,
+            "Bacon Ranch Salad with Dressing": ENTREE,
+            "Chips and Salsa": SIDE,
+            "Jelly Donut": DESSERT,
+            "Peanut Butter Cookie": DESSERT,
+        }
+        for name, roles in cases.items():
+            with self.subTest(name=name):
+                self.assertEqual(classify_menu_item(name, 300), roles)
+
+    def test_falls_back_on_calories(self):
+        self.assertEqual(classify_menu_item("Sausage Biscuit", 460), ENTREE)
+        self.assertEqual(classify_menu_item("Biscuit", 180), 0)
@@ -0,0 +1,227 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.timezone import now
+
+from config.celery import app
+from menu_items.models import IngestionStatus, MenuIngestionPage, MenuIngestionRun, MenuItem
+from menu_items.tasks import summarize_menu_updates_task, update_menu_items_task, update_restaurant_menu_task
+from restaurants.models import DataSource, Restaurant
+
+
+def fake_menu(restaurant_name, skip_pages=()):
+    if restaurant_name == "Broken":
+        raise RuntimeError("upstream error")
+    food = {"food_name": f"{restaurant_name} Burger", "servings": {"serving": [{"is_default": "1", "calories": "500"}]}}
+    pages = [(1, [dict(food, servings={"serving": [{"is_default": "1", "calories": "550"}]})]), (0, [food])]
+    return iter([(page, menu_items) for page, menu_items in pages if page not in skip_pages])
+
+
+def flaky_menu(restaurant_name, skip_pages=()):
+    """Like fake_menu, but "Broken" fails after its first page unless that page was checkpointed."""
+    if restaurant_name != "Broken":
+        yield from fake_menu(restaurant_name, skip_pages)
+    elif 0 not in skip_pages:
+        yield 0, [{"food_name": "Broken Fries", "servings": {"serving": [{"is_default": "1", "calories": "300"}]}}]
+        raise RuntimeError("connection reset")
+    else:
+        yield 1, [{"food_name": "Broken Shake", "servings": {"serving": [{"is_default": "1", "calories": "400"}]}}]
+
+
+def food(name, calories):
+    return {"food_name": name, "servings": {"serving": [{"is_default": "1", "calories": str(calories)}]}}
+
+
+@patch("menu_items.tasks.build_meal_index_task.delay")
+@patch("menu_items.tasks.FatSecretAPI")
+class MenuItemTasksTest(TestCase):
+    def setUp(self):
+        # Run the per-restaurant chord in this process, whatever the settings say
+        self.addCleanup(setattr, app.conf, "task_always_eager", app.conf.task_always_eager)
+        app.conf.task_always_eager = True
+        for name in ("First", "Broken", "Second"):
+            Restaurant.objects.create(name=name, data_source=DataSource.FATSECRET.value)
+
+    def test_update_menu_items_task_fans_out_per_restaurant(self, mock_api, mock_delay):
+        """Ensure every restaurant is updated by its own subtask and one failure does not stop the rest."""
+        mock_api.return_value.iter_menu_item_pages.side_effect = fake_menu
+
+        with patch("menu_items.tasks.summarize_menu_updates_task.run", wraps=summarize_menu_updates_task.run) as summary:
+            update_menu_items_task()
+
+        self.assertEqual(
+            sorted(MenuItem.objects.values_list("name", flat=True)), ["First Burger", "Second Burger"]
+        )
+        summary.assert_called_once()
+        totals = summarize_menu_updates_task(*summary.call_args.args)
+        self.assertEqual(totals["restaurants"], 3)
+        self.assertEqual(totals["failed"], [Restaurant.objects.get(name="Broken").id])
+        self.assertEqual((totals["changed_restaurants"], totals["inserted"]), (2, 2))
+
+        # A second run finds every menu unchanged
+        with patch("menu_items.tasks.summarize_menu_updates_task.run", wraps=summarize_menu_updates_task.run) as summary:
+            update_menu_items_task()
+        totals = summarize_menu_updates_task(*summary.call_args.args)
+        self.assertEqual((totals["changed"], totals["unchanged"]), ([], 2))
+
+    def test_update_restaurant_menu_task_reports_counts(self, mock_api, mock_delay):
+        """Ensure the per-restaurant task reports its upsert counts and schedules an index build."""
+        mock_api.return_value.iter_menu_item_pages.side_effect = fake_menu
+        restaurant = Restaurant.objects.get(name="First")
+
+        result = update_restaurant_menu_task(restaurant.id)
+
+        self.assertEqual(
+            result, {"restaurant_id": restaurant.id, "changed": True, "inserted": 1, "updated": 0, "unchanged": 0, "retired": 0}
+        )
+        # Pages are applied in page order, whatever order they arrived in
+        self.assertEqual(MenuItem.objects.get(restaurant=restaurant).calories, 550)
+        mock_delay.assert_called_once_with(restaurant.id)
+
+    def test_update_menu_items_task_records_run_progress(self, mock_api, mock_delay):
+        """Ensure each run records per-restaurant status, counts and errors."""
+        mock_api.return_value.iter_menu_item_pages.side_effect = fake_menu
+
+        update_menu_items_task()
+
+        run = MenuIngestionRun.objects.get()
+        self.assertEqual(run.status, IngestionStatus.FAILED.value)
+        self.assertIsNotNone(run.finished_at)
+        progress = {row.restaurant.name: row for row in run.progress.all()}
+        self.assertEqual(progress["First"].status, IngestionStatus.DONE.value)
+        self.assertEqual((progress["First"].result["inserted"], progress["First"].fetched_pages()), (1, {}))
+        self.assertEqual(progress["Broken"].status, IngestionStatus.FAILED.value)
+        self.assertEqual(progress["Broken"].error, "upstream error")
+
+    def test_rerun_failed_restaurants_from_checkpoint(self, mock_api, mock_delay):
+        """Ensure the management command reruns only failed restaurants, skipping fetched pages."""
+        mock_api.return_value.iter_menu_item_pages.side_effect = flaky_menu
+        update_menu_items_task()
+        run = MenuIngestionRun.objects.get()
+        broken = run.progress.get(restaurant__name="Broken")
+        self.assertEqual((broken.status, list(broken.fetched_pages())), (IngestionStatus.FAILED.value, [0]))
+
+        mock_api.return_value.iter_menu_item_pages.reset_mock()
+        call_command("rerun_failed_menu_updates", stdout=StringIO())
+
+        mock_api.return_value.iter_menu_item_pages.assert_called_once_with("Broken", skip_pages={0})
+        self.assertEqual(
+            sorted(MenuItem.objects.filter(restaurant__name="Broken").values_list("name", flat=True)),
+            ["Broken Fries", "Broken Shake"],
+        )
+        run.refresh_from_db()
+        self.assertEqual(run.status, IngestionStatus.DONE.value)
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.attempts), (IngestionStatus.DONE.value, 2))
+
+    def test_update_menu_items_task_resumes_unfinished_run(self, mock_api, mock_delay):
+        """Ensure a run interrupted mid-way is resumed from its checkpoints rather than restarted."""
+        mock_api.return_value.iter_menu_item_pages.side_effect = fake_menu
+        run = MenuIngestionRun.start(list(Restaurant.objects.values_list("id", flat=True)))
+        run.progress.filter(restaurant__name="First").update(status=IngestionStatus.DONE.value)
+        second = run.progress.get(restaurant__name="Second")
+        second.start()
+        second.checkpoint(0, [{"food_name": "Second Burger"}])
+        # The run's workers died over an hour ago
+        an_hour_ago = now() - timedelta(hours=1)
+        MenuIngestionRun.objects.update(started_at=an_hour_ago)
+        run.progress.update(heartbeat_at=an_hour_ago)
+
+        update_menu_items_task()
+
+        self.assertEqual(MenuIngestionRun.objects.count(), 1)
+        fetched = [call.args[0] for call in mock_api.return_value.iter_menu_item_pages.call_args_list]
+        self.assertEqual(sorted(fetched), ["Broken", "Second"])
+        self.assertEqual(MenuItem.objects.get(name="Second Burger").calories, 550)
+        self.assertEqual(run.progress.get(restaurant__name="Second").status, IngestionStatus.DONE.value)
+        self.assertFalse(MenuIngestionPage.objects.exists())
+
+    def test_update_menu_items_task_abandons_old_run(self, mock_api, mock_delay):
+        """Ensure a run too old to resume is abandoned with its checkpoints, and a fresh run started."""
+        mock_api.return_value.iter_menu_item_pages.side_effect = fake_menu
+        run = MenuIngestionRun.start(list(Restaurant.objects.values_list("id", flat=True)))
+        run.progress.filter(restaurant__name="First").update(status=IngestionStatus.DONE.value)
+        second = run.progress.get(restaurant__name="Second")
+        second.start()
+        second.checkpoint(0, [{"food_name": "Second Burger"}])
+        a_week_ago = now() - timedelta(days=7)
+        MenuIngestionRun.objects.update(started_at=a_week_ago)
+        run.progress.update(heartbeat_at=a_week_ago)
+
+        update_menu_items_task()
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, IngestionStatus.FAILED.value)
+        self.assertEqual(run.progress.get(restaurant__name="Second").status, IngestionStatus.FAILED.value)
+        self.assertFalse(MenuIngestionPage.objects.exists())
+        # Every restaurant is fetched again in full, the one the old run finished too
+        fresh = MenuIngestionRun.objects.exclude(pk=run.pk).get()
+        self.assertEqual(fresh.progress.count(), 3)
+        calls = mock_api.return_value.iter_menu_item_pages.call_args_list
+        self.assertEqual(sorted(call.args[0] for call in calls), ["Broken", "First", "Second"])
+        self.assertTrue(all(call.kwargs["skip_pages"] == set() for call in calls))
+
+    def test_update_menu_items_task_leaves_live_run_alone(self, mock_api, mock_delay):
+        """Ensure a run whose workers are still making progress is neither resumed nor restarted."""
+        mock_api.return_value.iter_menu_item_pages.side_effect = fake_menu
+        run = MenuIngestionRun.start(list(Restaurant.objects.values_list("id", flat=True)))
+        first = run.progress.get(restaurant__name="First")
+        first.start()
+        first.checkpoint(0, [{"food_name": "First Burger"}])
+
+        update_menu_items_task()
+
+        mock_api.return_value.iter_menu_item_pages.assert_not_called()
+        self.assertEqual(MenuIngestionRun.objects.get().status, IngestionStatus.RUNNING.value)
+        self.assertEqual(first.fetched_pages(), {0: [{"food_name": "First Burger"}]})
+
+        # Once nothing has happened for longer than MENU_INGESTION_STALE_AFTER, it is resumed
+        with self.settings(MENU_INGESTION_STALE_AFTER=0):
+            update_menu_items_task()
+        self.assertEqual(MenuIngestionRun.objects.get().status, IngestionStatus.FAILED.value)
+        self.assertEqual(MenuItem.objects.get(name="First Burger").calories, 550)
+
+    def test_failed_page_retires_nothing(self, mock_api, mock_delay):
+        """Ensure a menu whose later page failed is not synced, so its items are not retired."""
+        restaurant = Restaurant.objects.get(name="Second")
+        MenuItem.update_menu_items(restaurant, [food("Second Burger", 500), food("Second Fries", 300)])
+        restaurant.refresh_from_db()
+
+        def failing_menu(restaurant_name, skip_pages=()):
+            yield 0, [food("Second Burger", 520)]
+            raise RuntimeError("No results for Second on page 1 of 2")
+
+        mock_api.return_value.iter_menu_item_pages.side_effect = failing_menu
+        result = update_restaurant_menu_task(restaurant.id)
+
+        self.assertEqual(result["error"], "No results for Second on page 1 of 2")
+        self.assertEqual(
+            sorted(MenuItem.objects.filter(restaurant=restaurant, is_active=True).values_list("name", "calories")),
+            [("Second Burger", 500), ("Second Fries", 300)],
+        )
+        self.assertEqual(
+            Restaurant.objects.filter(pk=restaurant.pk).values_list("menu_version", "menu_fingerprint").get(),
+            (restaurant.menu_version, restaurant.menu_fingerprint),
+        )
+
+    def test_truncated_menu_retires_nothing(self, mock_api, mock_delay):
+        """Ensure a menu cut short by the page cap is upserted without retiring or fingerprinting."""
+        restaurant = Restaurant.objects.get(name="Second")
+        MenuItem.update_menu_items(restaurant, [food("Second Burger", 500), food("Second Fries", 300)])
+
+        mock_api.return_value.iter_menu_item_pages.side_effect = lambda name, skip_pages=(): iter(
+            [(0, [food("Second Burger", 520)])]
+        )
+        mock_api.return_value.truncated_menus = {"Second"}
+        result = update_restaurant_menu_task(restaurant.id)
+
+        self.assertEqual((result["updated"], result["retired"]), (1, 0))
+        self.assertEqual(
+            sorted(MenuItem.objects.filter(restaurant=restaurant, is_active=True).values_list("name", "calories")),
+            [("Second Burger", 520), ("Second Fries", 300)],
+        )
+        restaurant.refresh_from_db()
+        self.assertEqual(restaurant.menu_fingerprint, "")
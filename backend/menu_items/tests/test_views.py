@@ -1,11 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from restaurants.models import Restaurant, DataSource
+from menu_items.meal_recommender import find_meal_combinations_efficient
+from menu_items.menu_cache import clear_menu_cache
 from menu_items.models import MenuItem
+from menu_items.roles import DESSERT, DRINK, ENTREE, SIDE
 
 class RecommendMealViewTests(APITestCase):
     def setUp(self):
+        cache.clear()
+        clear_menu_cache()
+
         # Create test restaurant
         self.restaurant = Restaurant.objects.create(
             name="Test Restaurant",
@@ -50,6 +60,119 @@ class RecommendMealViewTests(APITestCase):
             self.assertIn('items', first_meal)
             self.assertIsInstance(first_meal['items'], list)
 
+    def test_recommendations_within_budget(self):
+        """Test that a budgeted request runs off-thread and returns the same results"""
+        expected = self.client.get(self.url).data['recommended_meals']
+
+        response = self.client.get(self.url, {'budget_ms': 5000})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recommended_meals'], expected)
+        self.assertFalse(response.data['partial'])
+
+    def test_invalid_budget(self):
+        """Test handling of an invalid time budget"""
+        for budget_ms in ('0', '-5', 'soon', '999999'):
+            response = self.client.get(self.url, {'budget_ms': budget_ms})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recommendations_are_cached(self):
+        """Test that repeated requests in one calorie bucket are served from the cache"""
+        menu_data = list(MenuItem.objects.order_by('id').values('id', 'name', 'calories'))
+        expected = find_meal_combinations_efficient(menu_data, calorie_limit=795)
+        self.client.get(self.url)
+        with patch('menu_items.views.find_meal_combinations_efficient') as mock_search:
+            url = reverse('recommend-meal', kwargs={'restaurant_id': self.restaurant.id, 'calorie_limit': 795})
+            second = self.client.get(url)
+        mock_search.assert_not_called()
+        self.assertEqual(
+            [sorted(item['id'] for item in meal['items']) for meal in second.data['recommended_meals']],
+            [sorted(item['id'] for item in meal['items']) for meal in expected],
+        )
+
+        stats = self.client.get(reverse('recommend-meal-cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_cached_requests_match_an_exact_search(self):
+        """Test that limits sharing a cache bucket each get the meals a search at that exact limit returns"""
+        MenuItem.objects.create(restaurant=self.restaurant, name="Ketchup", calories=5)
+        Restaurant.objects.filter(id=self.restaurant.id).update(menu_version=1)
+        menu_data = list(MenuItem.objects.order_by('id').values('id', 'name', 'calories'))
+
+        for calorie_limit in (809, 801, 805, 800, 809):
+            url = reverse('recommend-meal', kwargs={'restaurant_id': self.restaurant.id, 'calorie_limit': calorie_limit})
+            meals = self.client.get(url).data['recommended_meals']
+            expected = find_meal_combinations_efficient(menu_data, calorie_limit=calorie_limit)
+            self.assertEqual(
+                [sorted(item['id'] for item in meal['items']) for meal in meals],
+                [sorted(item['id'] for item in meal['items']) for meal in expected],
+            )
+        url = reverse('recommend-meal', kwargs={'restaurant_id': self.restaurant.id, 'calorie_limit': 809})
+        self.assertEqual(self.client.get(url, {'budget_ms': 5000}).data['recommended_meals'], meals)
+
+        # 801 to 809 share the 810 kcal bucket, and 800 has a bucket of its own
+        stats = self.client.get(reverse('recommend-meal-cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (3, 2))
+
+    def test_menu_update_invalidates_cache(self):
+        """Test that changing the menu bypasses recommendations cached for the old one, and drops retired items"""
+        self.client.get(self.url)
+        MenuItem.update_menu_items(self.restaurant, [
+            {"food_name": "Burger", "servings": {"serving": [{"is_default": "1", "calories": "500"}]}},
+            {"food_name": "Salad", "food_id": "1", "servings": {"serving": [{"is_default": "1", "calories": "300"}]}},
+        ])
+
+        response = self.client.get(self.url)
+        names = {item['name'] for meal in response.data['recommended_meals'] for item in meal['items']}
+        self.assertEqual(names, {"Burger", "Salad"})
+
+    def test_include_and_exclude_items(self):
+        """Test that every meal contains the included items and none of the excluded ones"""
+        burger, fries, drink = self.menu_items
+        response = self.client.get(self.url, {'include': str(burger.id), 'exclude': str(fries.id)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        meals = response.data['recommended_meals']
+        self.assertTrue(meals)
+        for meal in meals:
+            ids = {item['id'] for item in meal['items']}
+            self.assertIn(burger.id, ids)
+            self.assertNotIn(fries.id, ids)
+
+    def test_nutrient_limits(self):
+        """Test that every meal stays within the requested nutrient limits"""
+        burger, fries, drink = self.menu_items
+        MenuItem.objects.filter(id=burger.id).update(protein=25, sodium=900)
+        MenuItem.objects.filter(id=fries.id).update(protein=5, sodium=400)
+        Restaurant.objects.filter(id=self.restaurant.id).update(menu_version=1)
+
+        response = self.client.get(self.url, {'min_protein': '30', 'max_sodium': '1500'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        meals = response.data['recommended_meals']
+        self.assertEqual([{item['id'] for item in meal['items']} for meal in meals], [{burger.id, fries.id}])
+
+        response = self.client.get(self.url, {'min_protein': '30', 'max_sodium': '1000'})
+        self.assertEqual(response.data['recommended_meals'], [])
+
+        # The drink's sodium is unknown, so it cannot join a sodium-limited meal
+        response = self.client.get(self.url, {'max_sodium': '1500'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        meals = response.data['recommended_meals']
+        self.assertTrue(meals)
+        self.assertFalse(any(item['id'] == drink.id for meal in meals for item in meal['items']))
+
+    def test_invalid_constraints(self):
+        """Test handling of malformed, conflicting or unknown include/exclude items and nutrient limits"""
+        burger = self.menu_items[0]
+        for params in (
+            {'include': 'burger'},
+            {'include': str(burger.id), 'exclude': str(burger.id)},
+            {'include': '99999'},
+            {'min_protein': 'lots'},
+            {'max_sodium': '-1'},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_restaurant_not_found(self):
         """Test handling of non-existent restaurant"""
         url = reverse('recommend-meal', kwargs={
@@ -88,4 +211,270 @@ class RecommendMealViewTests(APITestCase):
             'calorie_limit': 0
         })
         response = self.client.get(url)
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST) 
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST) 
+
+
+class RecommendMealPageViewTests(APITestCase):
+    def setUp(self):
+        clear_menu_cache()
+        self.restaurant = Restaurant.objects.create(
+            name="Test Restaurant",
+            data_source=DataSource.FATSECRET.value
+        )
+        for name, calories in [
+            ("Burger", 500), ("Fries", 300), ("Drink", 150), ("Salad", 200),
+            ("Dessert", 400), ("Small Fries", 200), ("Wrap", 350), ("Shake", 450),
+        ]:
+            MenuItem.objects.create(restaurant=self.restaurant, name=name, calories=calories)
+
+        self.url = reverse('recommend-meal-page', kwargs={
+            'restaurant_id': self.restaurant.id,
+            'calorie_limit': 1000
+        })
+
+    def test_pages_follow_full_ranking(self):
+        """Walking the cursor returns the full ranking, one page at a time"""
+        menu_data = list(MenuItem.objects.order_by('id').values('id', 'name', 'calories'))
+        expected = find_meal_combinations_efficient(menu_data, calorie_limit=1000, target_count=1000)
+
+        meals, cursor = [], None
+        while True:
+            params = {'page_size': 7}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['recommended_meals']), 7)
+
+            meals.extend(response.data['recommended_meals'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(meals, expected)
+
+    def test_invalid_cursor(self):
+        """Tampered cursors are rejected"""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stale_cursor(self):
+        """Cursors issued for an older menu version are rejected"""
+        response = self.client.get(self.url, {'page_size': 1})
+        cursor = response.data['next_cursor']
+        self.assertIsNotNone(cursor)
+
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(menu_version=7)
+        response = self.client.get(self.url, {'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_page_size(self):
+        """page_size must be a positive integer within the maximum"""
+        for page_size in ('0', '1000', 'ten'):
+            response = self.client.get(self.url, {'page_size': page_size})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BatchRecommendMealViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        clear_menu_cache()
+        self.url = reverse('recommend-meal-batch')
+        self.burgers = Restaurant.objects.create(name="Burgers", data_source=DataSource.FATSECRET.value)
+        self.tacos = Restaurant.objects.create(name="Tacos", data_source=DataSource.FATSECRET.value)
+        self.empty = Restaurant.objects.create(name="Empty", data_source=DataSource.FATSECRET.value)
+
+        for name, calories in [("Burger", 500), ("Fries", 300), ("Drink", 150), ("Shake", 450)]:
+            MenuItem.objects.create(restaurant=self.burgers, name=name, calories=calories)
+        for name, calories in [("Taco", 200), ("Burrito", 600), ("Chips", 250), ("Soda", 180)]:
+            MenuItem.objects.create(restaurant=self.tacos, name=name, calories=calories)
+
+    def single(self, restaurant, calorie_limit):
+        url = reverse('recommend-meal', kwargs={'restaurant_id': restaurant.id, 'calorie_limit': calorie_limit})
+        return self.client.get(url).data['recommended_meals']
+
+    def test_batch_matches_single_requests(self):
+        """Each restaurant gets the same recommendations as the single-restaurant endpoint"""
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                self.url,
+                {'restaurant_ids': [self.tacos.id, self.burgers.id], 'calorie_limits': [800, 1200]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = response.data['results']
+        self.assertEqual([result['restaurant_id'] for result in results], [self.tacos.id, self.burgers.id])
+        for result, restaurant in zip(results, [self.tacos, self.burgers]):
+            self.assertEqual(
+                result['recommendations'],
+                [
+                    {'calorie_limit': limit, 'recommended_meals': self.single(restaurant, limit)}
+                    for limit in (800, 1200)
+                ]
+            )
+
+    def test_per_restaurant_errors(self):
+        """Missing restaurants and empty menus fail individually"""
+        response = self.client.post(
+            self.url,
+            {'restaurant_ids': [self.burgers.id, 9999, self.empty.id], 'calorie_limits': [800]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = response.data['results']
+        self.assertIn('recommendations', results[0])
+        self.assertEqual(results[1], {'restaurant_id': 9999, 'error': 'Restaurant not found.'})
+        self.assertEqual(results[2]['restaurant_id'], self.empty.id)
+        self.assertIn('error', results[2])
+
+    def test_recommender_failure(self):
+        """A recommender failure is reported for that restaurant only"""
+        def search(menu, **kwargs):
+            if "Burger" in menu.names:
+                raise RuntimeError("boom")
+            return find_meal_combinations_efficient(menu, **kwargs)
+
+        # Searches normally run in pool processes, out of reach of the patch
+        with ThreadPoolExecutor(max_workers=1) as executor, \
+                patch('menu_items.workers.get_process_pool', return_value=executor), \
+                patch('menu_items.workers.find_meal_combinations_efficient', side_effect=search):
+            response = self.client.post(
+                self.url,
+                {'restaurant_ids': [self.burgers.id, self.tacos.id], 'calorie_limits': [800]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(results[0]['error'], 'Failed to recommend meals.')
+        self.assertEqual(results[1]['recommendations'][0]['recommended_meals'], self.single(self.tacos, 800))
+
+    def test_invalid_batch(self):
+        """The request itself must name restaurants and positive calorie limits"""
+        for payload in (
+            {'restaurant_ids': [], 'calorie_limits': [800]},
+            {'restaurant_ids': [self.burgers.id], 'calorie_limits': [0]},
+            {'restaurant_ids': [self.burgers.id]},
+        ):
+            response = self.client.post(self.url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NearbyBestMealsViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        clear_menu_cache()
+        self.burgers = Restaurant.objects.create(name="Burgers", data_source=DataSource.FATSECRET.value)
+        self.tacos = Restaurant.objects.create(name="Tacos", data_source=DataSource.FATSECRET.value)
+        for name, calories in [("Burger", 500), ("Fries", 300), ("Drink", 150), ("Shake", 450)]:
+            MenuItem.objects.create(restaurant=self.burgers, name=name, calories=calories)
+        for name, calories in [("Taco", 200), ("Burrito", 600), ("Chips", 250), ("Soda", 180)]:
+            MenuItem.objects.create(restaurant=self.tacos, name=name, calories=calories)
+
+        self.places = [
+            {"id": self.tacos.id, "name": "Tacos Main St", "formatted_address": "1 Main St"},
+            {"id": self.burgers.id, "name": "Burgers Elm St", "formatted_address": "2 Elm St"},
+            {"id": self.tacos.id, "name": "Tacos Oak St", "formatted_address": "3 Oak St"},
+        ]
+        self.url = reverse('recommend-meal-nearby', kwargs={'calorie_limit': 900})
+
+    @patch('menu_items.views.get_nearby_restaurants')
+    def test_global_ranking(self, mock_nearby):
+        """Meals from all nearby restaurants are merged into one ranking"""
+        mock_nearby.return_value = self.places
+        response = self.client.get(self.url, {'lat': '40.0', 'lng': '-74.0', 'count': 6})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_nearby.assert_called_once_with(40.0, -74.0)
+
+        meals = response.data['recommended_meals']
+        self.assertEqual(len(meals), 6)
+        self.assertEqual({meal['restaurant_id'] for meal in meals}, {self.burgers.id, self.tacos.id})
+
+        keys = [(-meal['total_calories'], len(meal['items'])) for meal in meals]
+        self.assertEqual(keys, sorted(keys))
+        for meal in meals:
+            self.assertEqual(meal['total_calories'], sum(item['calories'] for item in meal['items']))
+            if meal['restaurant_id'] == self.tacos.id:
+                self.assertEqual(meal['restaurant_name'], "Tacos Main St")
+
+    def test_missing_location(self):
+        """Latitude and longitude are required"""
+        response = self.client.get(self.url, {'lat': '40.0'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CalorieHistogramViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        clear_menu_cache()
+        self.restaurant = Restaurant.objects.create(name="Burgers", data_source=DataSource.FATSECRET.value)
+        for name, calories in [("Burger", 500), ("Fries", 300), ("Drink", 150), ("Shake", 450)]:
+            MenuItem.objects.create(restaurant=self.restaurant, name=name, calories=calories)
+        self.url = reverse('calorie-histogram', kwargs={'restaurant_id': self.restaurant.id})
+
+    def test_histogram_matches_recommender(self):
+        """Every bucket holds exactly the meals the recommender can return in it"""
+        response = self.client.get(self.url, {'bucket_width': 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        menu_data = list(MenuItem.objects.order_by('id').values('id', 'name', 'calories'))
+        for bucket in response.data['buckets']:
+            top = bucket['max_calories']
+            meals = find_meal_combinations_efficient(
+                menu_data, calorie_limit=top, target_count=1000, min_efficiency=(top - 99) / top
+            )
+            self.assertEqual(bucket['combinations'], len(meals))
+        self.assertEqual(
+            sum(bucket['combinations'] for bucket in response.data['buckets']),
+            len(find_meal_combinations_efficient(menu_data, calorie_limit=3000, target_count=1000, min_efficiency=0))
+        )
+
+    def test_histogram_follows_role_rules(self):
+        """With roles set, buckets only count meals with an entrée and at most one drink"""
+        restaurant = Restaurant.objects.create(name="Diner", data_source=DataSource.FATSECRET.value)
+        for name, calories, roles in [
+            ("Burger", 500, ENTREE), ("Wrap", 400, ENTREE), ("Fries", 300, SIDE), ("Cola", 200, DRINK),
+            ("Shake", 450, DRINK | DESSERT), ("Cookie", 160, DESSERT),
+        ]:
+            MenuItem.objects.create(restaurant=restaurant, name=name, calories=calories, roles=roles)
+        url = reverse('calorie-histogram', kwargs={'restaurant_id': restaurant.id})
+        response = self.client.get(url, {'bucket_width': 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        menu_data = list(MenuItem.objects.filter(restaurant=restaurant).order_by('id').values(
+            'id', 'name', 'calories', 'roles'
+        ))
+        for bucket in response.data['buckets']:
+            top = bucket['max_calories']
+            meals = find_meal_combinations_efficient(
+                menu_data, calorie_limit=top, target_count=1000, min_efficiency=(top - 99) / top
+            )
+            self.assertEqual(bucket['combinations'], len(meals))
+        all_meals = find_meal_combinations_efficient(menu_data, calorie_limit=3000, target_count=1000, min_efficiency=0)
+        self.assertEqual(sum(bucket['combinations'] for bucket in response.data['buckets']), len(all_meals))
+        # The rules rule out meals such as Fries + Cookie or Cola + Shake
+        role_less = [dict(item, roles=0) for item in menu_data]
+        self.assertLess(
+            len(all_meals),
+            len(find_meal_combinations_efficient(role_less, calorie_limit=3000, target_count=1000, min_efficiency=0))
+        )
+
+    def test_histogram_follows_menu_version(self):
+        """Cached histograms are rebuilt once the menu changes"""
+        before = self.client.get(self.url).data
+        MenuItem.update_menu_items(self.restaurant, [
+            {"food_name": name, "servings": {"serving": [{"is_default": "1", "calories": str(calories)}]}}
+            for name, calories in [("Burger", 500), ("Fries", 300), ("Drink", 150), ("Shake", 450), ("Salad", 220)]
+        ])
+        after = self.client.get(self.url).data
+
+        self.assertEqual(after['menu_version'], before['menu_version'] + 1)
+        self.assertGreater(
+            sum(bucket['combinations'] for bucket in after['buckets']),
+            sum(bucket['combinations'] for bucket in before['buckets'])
+        )
+
+    def test_invalid_bucket_width(self):
+        response = self.client.get(self.url, {'bucket_width': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
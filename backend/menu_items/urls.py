@@ -1,7 +1,20 @@
 from django.urls import path
-from .views import RecommendMealView, MenuItemListView
+from .views import (
+    BatchRecommendMealView,
+    CalorieHistogramView,
+    MenuItemListView,
+    NearbyBestMealsView,
+    RecommendationCacheStatsView,
+    RecommendMealPageView,
+    RecommendMealView,
+)
 
 urlpatterns = [
     path('recommend/<int:restaurant_id>/<int:calorie_limit>/', RecommendMealView.as_view(), name='recommend-meal'),
+    path('recommend/<int:restaurant_id>/<int:calorie_limit>/page/', RecommendMealPageView.as_view(), name='recommend-meal-page'),
+    path('recommend/batch/', BatchRecommendMealView.as_view(), name='recommend-meal-batch'),
+    path('recommend/cache-stats/', RecommendationCacheStatsView.as_view(), name='recommend-meal-cache-stats'),
+    path('recommend/nearby/<int:calorie_limit>/', NearbyBestMealsView.as_view(), name='recommend-meal-nearby'),
     path('restaurant/<int:restaurant_id>/', MenuItemListView.as_view(), name='menu-items-list'),
+    path('restaurant/<int:restaurant_id>/calorie-histogram/', CalorieHistogramView.as_view(), name='calorie-histogram'),
 ]
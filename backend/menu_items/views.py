@@ -1,12 +1,81 @@
+import heapq
+import logging
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from rest_framework import status
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from restaurants.models import Restaurant
+from restaurants.nearby import get_nearby_restaurants
+
+from . import recommendation_cache
+from .meal_recommender import NUTRIENTS, CompactMenu, find_meal_combinations_efficient, iter_meal_combinations
+from .menu_cache import get_menu
+from .models import MealCombinationIndex, MenuItem
+from .serializers import BatchRecommendationSerializer
+from .workers import recommend_meals_for_menus, recommend_meals_within_budget
+
+
+logger = logging.getLogger(__name__)
+
+
+def _load_menus(restaurant_ids):
+    """
+    Load the menus of many restaurants with one query each for restaurants, menu items
+    and meal indexes.
+
+    :return: Tuple of (menu_version by restaurant ID for the restaurants that exist,
+             CompactMenu by restaurant ID for those with menu items, current
+             MealCombinationIndex by restaurant ID)
+    """
+    menu_versions = dict(Restaurant.objects.filter(id__in=restaurant_ids).values_list("id", "menu_version"))
+    menu_items = MenuItem.objects.filter(restaurant_id__in=menu_versions, is_active=True).order_by("restaurant_id", "id")
+    menus = {
+        restaurant_id: CompactMenu(*zip(*(row[1:] for row in rows)))
+        for restaurant_id, rows in groupby(
+            menu_items.values_list("restaurant_id", "id", "name", "calories", "roles"), key=lambda row: row[0]
+        )
+    }
+    indexes = {
+        index.restaurant_id: index
+        for index in MealCombinationIndex.objects.filter(restaurant_id__in=menus)
+        if index.menu_version == menu_versions[index.restaurant_id]
+    }
+    return menu_versions, menus, indexes
+
+
+def _parse_item_ids(value):
+    """Parse a comma-separated list of menu item IDs from a query parameter."""
+    if not value:
+        return []
+    return [int(item_id) for item_id in value.split(",")]
 
-from .meal_recommender import find_meal_combinations_efficient
-from .models import MenuItem
+
+def _parse_nutrient_limits(query_params):
+    """
+    Parse `min_<nutrient>` / `max_<nutrient>` query parameters into the recommender's
+    nutrient limits, e.g. `?min_protein=40&max_sodium=1500`. Raises ValueError for
+    amounts that are not non-negative numbers.
+    """
+    limits = {}
+    for nutrient in NUTRIENTS:
+        bounds = []
+        for side in ("min", "max"):
+            value = query_params.get(f"{side}_{nutrient}")
+            if value is not None:
+                value = float(value)
+                if not 0 <= value < float("inf"):
+                    raise ValueError(f"Invalid {side}_{nutrient}")
+            bounds.append(value)
+        if bounds != [None, None]:
+            limits[nutrient] = tuple(bounds)
+    return limits
 
 
 class RecommendMealView(APIView):
@@ -16,7 +85,21 @@ class RecommendMealView(APIView):
         
         :param restaurant_id: ID of the restaurant
         :param calorie_limit: Maximum calorie limit for the meal (must be > 0)
+        :query budget_ms: Optional time budget; the search then runs on the process pool
+            and returns the best combinations found in time, with `partial` set when it
+            ran out of time
+        :query include: Optional comma-separated menu item IDs every meal must contain
+        :query exclude: Optional comma-separated menu item IDs no meal may contain
+        :query min_<nutrient>, max_<nutrient>: Optional amounts a whole meal must stay
+            within, for protein, carbohydrate and fat (g) and sodium (mg). Items whose
+            amount of a limited nutrient is unknown are left out of the meals
         :return: JSON response with recommended meal combinations
+
+        Plain requests (no constraints and no `budget_ms`) are served from the
+        recommendation cache, per restaurant menu version. Nearby limits share the entry
+        of their calorie bucket, which holds more meals than a response, so every limit
+        gets exactly the meals a search at that limit would return. Constrained and
+        budgeted requests are never cached.
         """
         # Validate calorie limit
         if calorie_limit <= 0:
@@ -25,27 +108,325 @@ class RecommendMealView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        budget_ms = request.query_params.get("budget_ms")
+        if budget_ms is not None:
+            try:
+                budget_ms = int(budget_ms)
+            except ValueError:
+                budget_ms = 0
+            if not 1 <= budget_ms <= settings.MEAL_RECOMMENDER_MAX_BUDGET_MS:
+                return Response(
+                    {"error": f"budget_ms must be between 1 and {settings.MEAL_RECOMMENDER_MAX_BUDGET_MS}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            include = _parse_item_ids(request.query_params.get("include"))
+            exclude = _parse_item_ids(request.query_params.get("exclude"))
+        except ValueError:
+            return Response(
+                {"error": "include and exclude must be comma-separated menu item IDs"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if set(include) & set(exclude):
+            return Response(
+                {"error": "An item cannot be both included and excluded"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            nutrient_limits = _parse_nutrient_limits(request.query_params)
+        except ValueError:
+            return Response(
+                {"error": "Nutrient limits must be non-negative numbers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        constrained = bool(include or exclude or nutrient_limits)
+        cacheable = not constrained and budget_ms is None
+
         restaurant = get_object_or_404(Restaurant, id=restaurant_id)
-        menu_items = MenuItem.objects.filter(restaurant=restaurant)
+        if cacheable:
+            cached = recommendation_cache.get_recommendations(restaurant, calorie_limit)
+            if cached is not None:
+                return Response({"recommended_meals": cached, "partial": False}, status=status.HTTP_200_OK)
+
+        menu = get_menu(restaurant)
 
-        if not menu_items.exists():
+        if not menu:
             return Response(
                 {"error": "No menu items found for this restaurant."}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+        if any(menu.position_of(item_id) is None for item_id in include):
+            return Response(
+                {"error": "Included items must be on this restaurant's menu"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Serve from the precomputed index when it is current and can answer exactly
+        meal_combinations = None
+        if not constrained:
+            index = MealCombinationIndex.objects.filter(restaurant=restaurant, menu_version=restaurant.menu_version).first()
+            if index is not None:
+                meal_combinations = index.find_meal_combinations(menu, calorie_limit)
+
+        if meal_combinations is None and cacheable:
+            # Fill the calorie bucket's cache entry, and answer from it when it can tell exactly
+            bucket_limit, bucket_count, bucket_efficiency = recommendation_cache.entry_search(calorie_limit)
+            bucket_meals = find_meal_combinations_efficient(
+                menu,
+                calorie_limit=bucket_limit,
+                target_count=bucket_count,
+                min_efficiency=bucket_efficiency,
+                backend=settings.MEAL_RECOMMENDER_BACKEND
+            )
+            recommendation_cache.set_recommendations(restaurant, calorie_limit, bucket_meals)
+            meal_combinations = recommendation_cache.meals_within(bucket_meals, calorie_limit)
+
+        partial = False
+        if meal_combinations is None and budget_ms is not None:
+            meal_combinations, partial = recommend_meals_within_budget(
+                menu,
+                calorie_limit,
+                budget_ms,
+                backend=settings.MEAL_RECOMMENDER_BACKEND,
+                include=include,
+                exclude=exclude,
+                nutrient_limits=nutrient_limits
+            )
+        elif meal_combinations is None:
+            meal_combinations = find_meal_combinations_efficient(
+                menu, 
+                calorie_limit=calorie_limit,
+                backend=settings.MEAL_RECOMMENDER_BACKEND,
+                include=include,
+                exclude=exclude,
+                nutrient_limits=nutrient_limits
+            )
+
+        return Response({"recommended_meals": meal_combinations, "partial": partial}, status=status.HTTP_200_OK)
+
+
+class RecommendationCacheStatsView(APIView):
+    """
+    Hit/miss counters for the recommendation cache, for tuning its calorie bucket width.
+    """
+
+    def get(self, request):
+        return Response(recommendation_cache.get_stats(), status=status.HTTP_200_OK)
+
+
+class RecommendMealPageView(APIView):
+    """
+    Paginated variant of RecommendMealView.
+
+    Returns `page_size` combinations per page in the same rank order, plus an opaque
+    `next_cursor` to pass back as `?cursor=` for the following page. Each page is a
+    fresh bounded search that resumes where the cursor stopped, so later pages cost
+    about the same as the first one.
+    """
+    CURSOR_SALT = "menu_items.recommend_page"
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
+    def get(self, request, restaurant_id, calorie_limit):
+        if calorie_limit <= 0:
+            return Response(
+                {"error": "Calorie limit must be greater than 0"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            page_size = int(request.query_params.get("page_size", self.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            page_size = 0
+        if not 1 <= page_size <= self.MAX_PAGE_SIZE:
+            return Response(
+                {"error": f"page_size must be between 1 and {self.MAX_PAGE_SIZE}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        restaurant = get_object_or_404(Restaurant, id=restaurant_id)
 
-        menu_data = [{
-            "id": item.id,
-            "name": item.name,
-            "calories": item.calories
-        } for item in menu_items]
+        after = None
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                position = signing.loads(cursor, salt=self.CURSOR_SALT)
+            except signing.BadSignature:
+                return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
 
-        meal_combinations = find_meal_combinations_efficient(
-            menu_data, 
-            calorie_limit=calorie_limit
+            # Cursors point into one version of the menu, for one calorie limit
+            if position["menu_version"] != restaurant.menu_version or position["calorie_limit"] != calorie_limit:
+                return Response(
+                    {"error": "The menu has changed since this cursor was issued; start again without a cursor."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            after = (position["total"], position["count"], tuple(position["positions"]))
+
+        menu = get_menu(restaurant)
+        if not menu:
+            return Response(
+                {"error": "No menu items found for this restaurant."}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # One extra combination tells us whether there is a next page
+        page = list(islice(
+            iter_meal_combinations(
+                menu,
+                calorie_limit=calorie_limit,
+                after=after,
+                batch_size=page_size + 1,
+                backend=settings.MEAL_RECOMMENDER_BACKEND
+            ),
+            page_size + 1
+        ))
+
+        next_cursor = None
+        if len(page) > page_size:
+            total, count, positions = page[page_size - 1][0]
+            next_cursor = signing.dumps(
+                {
+                    "menu_version": restaurant.menu_version,
+                    "calorie_limit": calorie_limit,
+                    "total": total,
+                    "count": count,
+                    "positions": list(positions),
+                },
+                salt=self.CURSOR_SALT,
+                compress=True
+            )
+
+        return Response(
+            {
+                "recommended_meals": [meal for _, meal in page[:page_size]],
+                "next_cursor": next_cursor,
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class BatchRecommendMealView(APIView):
+    """
+    Recommend meals for many restaurants and calorie limits in one request.
+
+    Expects a JSON body with `restaurant_ids` and `calorie_limits`. All menus are loaded
+    in a single query, and the searches the meal indexes cannot answer run on the process
+    pool, split across its processes. Results come back in request order, one entry per
+    restaurant; a restaurant that cannot be served gets an `error` instead of failing the
+    whole batch.
+    """
+
+    def post(self, request):
+        serializer = BatchRecommendationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        restaurant_ids = list(dict.fromkeys(serializer.validated_data["restaurant_ids"]))
+        calorie_limits = list(dict.fromkeys(serializer.validated_data["calorie_limits"]))
+
+        menu_versions, menus, indexes = _load_menus(restaurant_ids)
+
+        recommendations_by_restaurant = recommend_meals_for_menus(
+            menus,
+            calorie_limits,
+            indexes=indexes,
+            backend=settings.MEAL_RECOMMENDER_BACKEND
+        )
+
+        results = []
+        for restaurant_id in restaurant_ids:
+            if restaurant_id not in menu_versions:
+                results.append({"restaurant_id": restaurant_id, "error": "Restaurant not found."})
+                continue
+            if restaurant_id not in menus:
+                results.append({"restaurant_id": restaurant_id, "error": "No menu items found for this restaurant."})
+                continue
+
+            recommendations = recommendations_by_restaurant[restaurant_id]
+            if recommendations is None:
+                results.append({"restaurant_id": restaurant_id, "error": "Failed to recommend meals."})
+                continue
+
+            results.append({
+                "restaurant_id": restaurant_id,
+                "recommendations": [
+                    {"calorie_limit": calorie_limit, "recommended_meals": recommendations[calorie_limit]}
+                    for calorie_limit in calorie_limits
+                ],
+            })
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class NearbyBestMealsView(APIView):
+    """
+    Best meals under a calorie limit across every supported restaurant near a location.
+
+    Resolves nearby restaurants the same way as NearbyRestaurantsView, loads all their
+    menus at once, runs the recommender per restaurant (on the process pool, where the
+    meal indexes cannot answer) and merges the results into one ranking: highest total
+    calories first, then fewer items, then the nearer restaurant (in Foursquare's order).
+    """
+    permission_classes = [AllowAny]
+    DEFAULT_COUNT = 20
+    MAX_COUNT = 50
+
+    def get(self, request, calorie_limit):
+        if calorie_limit <= 0:
+            return Response(
+                {"error": "Calorie limit must be greater than 0"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            lat, lng = float(request.query_params["lat"]), float(request.query_params["lng"])
+        except (KeyError, ValueError):
+            return Response({"error": "Latitude and longitude are required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            count = int(request.query_params.get("count", self.DEFAULT_COUNT))
+        except ValueError:
+            count = 0
+        if not 1 <= count <= self.MAX_COUNT:
+            return Response(
+                {"error": f"count must be between 1 and {self.MAX_COUNT}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Chains show up once per location; keep the nearest place for each restaurant
+        places = {}
+        for place in get_nearby_restaurants(lat, lng):
+            places.setdefault(place["id"], place)
+
+        _, menus, indexes = _load_menus(list(places))
+
+        # Each restaurant's own top `count` is enough to fill the global top `count`
+        recommendations = recommend_meals_for_menus(
+            {restaurant_id: menus[restaurant_id] for restaurant_id in places if restaurant_id in menus},
+            [calorie_limit],
+            indexes=indexes,
+            backend=settings.MEAL_RECOMMENDER_BACKEND,
+            target_count=count
         )
 
-        return Response({"recommended_meals": meal_combinations}, status=status.HTTP_200_OK)
+        ranked = []
+        for distance_rank, (restaurant_id, meals_by_limit) in enumerate(recommendations.items()):
+            if meals_by_limit is None:
+                continue
+            meals = meals_by_limit[calorie_limit]
+
+            place = places[restaurant_id]
+            for meal_rank, meal in enumerate(meals):
+                total = sum(item["calories"] for item in meal["items"])
+                ranked.append((-total, len(meal["items"]), distance_rank, meal_rank, {
+                    "restaurant_id": restaurant_id,
+                    "restaurant_name": place["name"],
+                    "formatted_address": place.get("formatted_address"),
+                    "total_calories": total,
+                    "items": meal["items"],
+                }))
+
+        best = [entry[-1] for entry in heapq.nsmallest(count, ranked, key=lambda entry: entry[:4])]
+        return Response({"recommended_meals": best}, status=status.HTTP_200_OK)
 
 
 class MenuItemListView(APIView):
@@ -54,5 +435,71 @@ class MenuItemListView(APIView):
     """
     def get(self, request, restaurant_id):
         restaurant = get_object_or_404(Restaurant, id=restaurant_id)
-        menu_items = MenuItem.objects.filter(restaurant=restaurant).values('id', 'name', 'calories')
+        menu_items = MenuItem.objects.filter(restaurant=restaurant, is_active=True).values('id', 'name', 'calories')
         return Response(menu_items, status=status.HTTP_200_OK)
+
+
+class CalorieHistogramView(APIView):
+    """
+    Distribution of achievable meal totals for a restaurant, so clients can tell which
+    calorie limits will return recommendations without calling the recommender.
+
+    Counts the realistic combinations of 1 to 4 items (following the menu's role rules)
+    by total calories with a bounded subset-sum DP over the menu, grouped into buckets
+    of `bucket_width` kcal (each covering totals in (top - bucket_width, top]); empty
+    buckets are left out. The per-kcal counts are cached per restaurant menu version.
+    """
+    MAX_ITEMS = 4
+    DEFAULT_BUCKET_WIDTH = 50
+    MAX_BUCKET_WIDTH = 500
+
+    def get(self, request, restaurant_id):
+        try:
+            bucket_width = int(request.query_params.get("bucket_width", self.DEFAULT_BUCKET_WIDTH))
+        except ValueError:
+            bucket_width = 0
+        if not 1 <= bucket_width <= self.MAX_BUCKET_WIDTH:
+            return Response(
+                {"error": f"bucket_width must be between 1 and {self.MAX_BUCKET_WIDTH}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        restaurant = get_object_or_404(Restaurant, id=restaurant_id)
+        cache_key = f"meal_hist:{restaurant.id}:v{restaurant.menu_version}:{self.MAX_ITEMS}"
+        counts = cache.get(cache_key)
+        if counts is None:
+            from .meal_recommender_numpy import realistic_total_counts
+
+            menu = get_menu(restaurant)
+            counts = realistic_total_counts(
+                menu.calories, self.MAX_ITEMS, settings.MEAL_HISTOGRAM_MAX_CALORIES, roles=menu.roles
+            ).tolist()
+            cache.set(cache_key, counts, settings.MEAL_HISTOGRAM_CACHE_TIMEOUT)
+
+        max_total = settings.MEAL_HISTOGRAM_MAX_CALORIES
+        buckets = []
+        for top in range(bucket_width, max_total + bucket_width, bucket_width):
+            start = top - bucket_width + 1
+            by_item_count = {
+                num_items: sum(counts[num_items][start:top + 1])
+                for num_items in range(1, self.MAX_ITEMS + 1)
+            }
+            combinations = sum(by_item_count.values())
+            if combinations:
+                buckets.append({
+                    "max_calories": min(top, max_total),
+                    "combinations": combinations,
+                    "by_item_count": {num_items: n for num_items, n in by_item_count.items() if n},
+                })
+
+        return Response(
+            {
+                "restaurant_id": restaurant.id,
+                "menu_version": restaurant.menu_version,
+                "max_items": self.MAX_ITEMS,
+                "max_calories": max_total,
+                "bucket_width": bucket_width,
+                "buckets": buckets,
+            },
+            status=status.HTTP_200_OK
+        )
@@ -0,0 +1,148 @@
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+
+from .meal_recommender import find_meal_combinations_anytime, find_meal_combinations_efficient
+
+logger = logging.getLogger(__name__)
+
+# Extra time to wait on a budgeted search for result transfer and scheduling, in seconds
+BUDGET_GRACE = 0.05
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """
+    Persistent process pool for CPU-heavy recommender runs, so a long search does not
+    hold the GIL (and the Gunicorn worker) of the process serving the request.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=settings.MEAL_RECOMMENDER_PROCESSES)
+    return _process_pool
+
+
+def recommend_meals_within_budget(
+    menu, calorie_limit, budget_ms, backend="python", include=None, exclude=None, nutrient_limits=None
+):
+    """
+    Recommend meals on the process pool, spending at most about `budget_ms` milliseconds.
+    `include`, `exclude` and `nutrient_limits` are passed on to the recommender.
+
+    :return: Tuple of (recommended meals, partial). When the budget runs out, the meals
+             are the best ones the search found in time and `partial` is True.
+    """
+    budget = budget_ms / 1000
+    future = get_process_pool().submit(
+        find_meal_combinations_anytime,
+        menu,
+        calorie_limit,
+        budget,
+        backend=backend,
+        include=include,
+        exclude=exclude,
+        nutrient_limits=nutrient_limits,
+    )
+    try:
+        return future.result(timeout=budget + BUDGET_GRACE)
+    except FutureTimeoutError:
+        # The pool is saturated and the search never got to run in time
+        future.cancel()
+        logger.warning(f"Meal recommendation did not start within its {budget_ms} ms budget")
+        return [], True
+
+
+def recommend_meals(menu, calorie_limits, index=None, backend="python", target_count=20):
+    """
+    Recommend up to `target_count` meals from one menu for every calorie limit.
+
+    :param menu: Menu items as dicts with id, name and calories, or a CompactMenu
+    :param calorie_limits: Calorie limits to recommend for
+    :param index: The restaurant's current MealCombinationIndex, if any
+    :param backend: Search backend used when the index cannot answer
+    :return: Dict mapping each calorie limit to its recommended meals
+    """
+    recommendations = {}
+    for calorie_limit in calorie_limits:
+        meals = None
+        if index is not None:
+            meals = index.find_meal_combinations(menu, calorie_limit, target_count=target_count)
+        if meals is None:
+            meals = find_meal_combinations_efficient(
+                menu, calorie_limit=calorie_limit, target_count=target_count, backend=backend
+            )
+        recommendations[calorie_limit] = meals
+    return recommendations
+
+
+def _recommend_meals_chunk(jobs, backend, target_count):
+    """
+    Run `recommend_meals` for a chunk of (key, menu, calorie limits) jobs in a pool
+    process. A job that fails is logged and comes back as None, so it does not take the
+    rest of the chunk down with it.
+    """
+    results = {}
+    for key, menu, calorie_limits in jobs:
+        try:
+            results[key] = recommend_meals(menu, calorie_limits, backend=backend, target_count=target_count)
+        except Exception:
+            logger.exception(f"Failed to recommend meals for {key}")
+            results[key] = None
+    return results
+
+
+def recommend_meals_for_menus(menus, calorie_limits, indexes=None, backend="python", target_count=20):
+    """
+    Recommend up to `target_count` meals for every calorie limit from many menus at once.
+
+    Limits a menu's current index can answer are served right here, as that is a cheap
+    lookup. The searches left over are CPU-bound, so they are split into one chunk per
+    process of the process pool and run there in parallel, instead of on threads that
+    would take turns on the GIL.
+
+    :param menus: Dict mapping a key (e.g. restaurant ID) to its menu
+    :param indexes: Dict mapping keys to their current MealCombinationIndex, if any
+    :return: Dict mapping each key to a dict of calorie limit to recommended meals, or
+             to None when recommending for that menu failed
+    """
+    indexes = indexes or {}
+    results, jobs = {}, []
+    for key, menu in menus.items():
+        index = indexes.get(key)
+        results[key], missing = {}, []
+        try:
+            for calorie_limit in calorie_limits:
+                meals = None
+                if index is not None:
+                    meals = index.find_meal_combinations(menu, calorie_limit, target_count=target_count)
+                if meals is None:
+                    missing.append(calorie_limit)
+                else:
+                    results[key][calorie_limit] = meals
+        except Exception:
+            logger.exception(f"Failed to recommend meals for {key}")
+            results[key] = None
+            continue
+        if missing:
+            jobs.append((key, menu, missing))
+    if not jobs:
+        return results
+
+    chunk_count = min(settings.MEAL_RECOMMENDER_PROCESSES, len(jobs))
+    chunks = [jobs[i::chunk_count] for i in range(chunk_count)]
+    futures = [get_process_pool().submit(_recommend_meals_chunk, chunk, backend, target_count) for chunk in chunks]
+    for future, chunk in zip(futures, chunks):
+        try:
+            chunk_results = future.result()
+        except Exception:
+            logger.exception(f"Failed to recommend meals for {len(chunk)} menus")
+            chunk_results = {key: None for key, _, _ in chunk}
+        for key, meals in chunk_results.items():
+            results[key] = None if meals is None else {**results[key], **meals}
+    return results
@@ -26,6 +26,9 @@ class Restaurant(models.Model):
     is_active = models.BooleanField(default=True)  # Track whether a brand is still active
     deactivated_at = models.DateTimeField(null=True, blank=True)  # Timestamp when it was marked inactive
     foursquare_chain_id = models.CharField(max_length=50, unique=True, null=True, blank=True)  # Foursquare chain ID
+    menu_version = models.PositiveIntegerField(default=0)  # Bumped whenever the restaurant's menu items change
+    menu_fingerprint = models.CharField(max_length=64, blank=True, default="")  # Hash of the last synced menu
+    menu_changed_at = models.DateTimeField(null=True, blank=True)  # When a sync last changed the menu
 
     def __str__(self):
         return self.name
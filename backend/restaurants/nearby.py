@@ -0,0 +1,41 @@
+import logging
+
+from django.core.cache import cache
+
+from api.foursquare import FoursquareAPI
+
+from .models import Restaurant
+
+
+logger = logging.getLogger(__name__)
+
+NEARBY_CACHE_TIMEOUT = 600   # 600 s = 10 min
+
+
+def get_nearby_restaurants(lat, lng):
+    """
+    Supported restaurants near a location, as Foursquare places matched to our restaurants
+    (dicts with the restaurant `id`, the place `name` and `formatted_address`).
+
+    Results are cached on a ~110 m grid, so nearby lookups do not hit Foursquare again.
+    """
+    cache_key = f"fsq:{round(lat, 3)}:{round(lng, 3)}"   # 110 m grid
+    cached = cache.get(cache_key)
+    if cached:
+        return cached          # ← no outbound API hit
+
+    logger.info("Initializing FoursquareAPI")
+    foursquare = FoursquareAPI()
+
+    # Get all chain restaurant IDs
+    logger.info("Fetching chain restaurant IDs from database")
+    chain_restaurants = Restaurant.objects.exclude(foursquare_chain_id__isnull=True)
+    chain_ids = list(chain_restaurants.values_list("foursquare_chain_id", flat=True))
+
+    # Fetch restaurants using Foursquare API
+    logger.info("Fetching restaurants from FoursquareAPI")
+    all_results = foursquare.fetch_nearby_restaurants(lat, lng, chain_ids)
+    logger.info("Successfully retrieved %d restaurants", len(all_results))
+
+    cache.set(cache_key, all_results, NEARBY_CACHE_TIMEOUT)
+    return all_results
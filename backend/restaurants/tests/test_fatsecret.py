@@ -1,11 +1,16 @@
 import unittest
 from unittest.mock import patch
 
+from django.core.cache import cache
+
 from api.fatsecret import FatSecretAPI
 
 
 class TestFatSecretAPI(unittest.TestCase):
-    @patch("api.fatsecret.requests.post")
+    def setUp(self):
+        cache.clear()  # The access token is shared through the cache
+
+    @patch("api.fatsecret.http_client.post")
     def test_get_access_token(self, mock_post):
         """Ensure the API retrieves an access token successfully."""
         mock_post.return_value.json.return_value = {"access_token": "test_token"}
@@ -13,7 +18,7 @@ class TestFatSecretAPI(unittest.TestCase):
         api = FatSecretAPI()
         self.assertEqual(api.access_token, "test_token")
 
-    @patch("api.fatsecret.requests.get")
+    @patch("api.fatsecret.http_client.get")
     def test_get_restaurants(self, mock_get):
         """Ensure get_restaurants() correctly fetches data."""
         mock_get.return_value.json.return_value = {
@@ -24,7 +29,7 @@ class TestFatSecretAPI(unittest.TestCase):
         restaurants = api.get_restaurants()
         self.assertEqual(restaurants, ["McDonald's", "KFC", "Burger King"])
 
-    @patch("api.fatsecret.requests.get")
+    @patch("api.fatsecret.http_client.get")
     def test_get_restaurants_handles_failure(self, mock_get):
         """Ensure get_restaurants() handles API failures."""
         mock_get.return_value.json.return_value = {}
@@ -66,7 +66,7 @@ class FavoriteRestaurantInfoSerializer(serializers.ModelSerializer):
 class UserMealSerializer(serializers.ModelSerializer):
     menu_items = MenuItemSerializer(many=True, read_only=True)
     menu_item_ids = serializers.PrimaryKeyRelatedField(
-        queryset=MenuItem.objects.all(),
+        queryset=MenuItem.objects.filter(is_active=True),
         many=True,
         source="menu_items",
         write_only=True